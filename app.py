@@ -2,17 +2,25 @@
 Assessment Chat RAG System
 """
 
+import hashlib
+import re
+import uuid
+
 import streamlit as st
 from dotenv import load_dotenv
 
 from config import Config
 from core.loader import PDFLoader
 from core.chunker import SemanticChunker
+from core.ingest import IngestionPipeline
 from core.retriever import UnifiedRetriever
-from core.generator import GroqGenerator
+from core.shards import ShardPool
+from core.generator import GroqGenerator, LLMGenerationError
+from core.answer_cache import AnswerCache, CachedGenerator
 from core.guardrails import HallucinationGuardrails
 from core.memory import ConversationMemory
-from core.utils import get_timestamp, format_context
+from core.context_packer import ContextPacker
+from core.utils import get_timestamp
 
 # ---------------------------------------------------------------------
 # ENV + CONFIG
@@ -53,28 +61,113 @@ st.success("RUNNING VERIFIED RAG PIPELINE — READY FOR ASSESSMENT SUBMISSION")
 # INIT SYSTEM
 # ---------------------------------------------------------------------
 
+@st.cache_resource(show_spinner="Loading indexes...")
+def load_shared_components():
+    """
+    Heavy, thread-safe components shared by every session in this process.
+
+    Streamlit reruns the script on every interaction; caching keeps the
+    FAISS indexes and memory loaded once per process instead of per rerun.
+    """
+    retriever = UnifiedRetriever()
+    return {
+        "loader": PDFLoader(),
+        "retriever": retriever,
+        # Named collections, opened on first use and unloaded when idle
+        "collections": ShardPool(
+            lambda name: UnifiedRetriever(collection=name, embeddings=retriever.embeddings),
+            lambda collection: collection.close(),
+            base_dir=Config.COLLECTIONS_DIR,
+        ),
+        "generator": (
+            CachedGenerator(GroqGenerator(), AnswerCache())
+            if Config.ENABLE_ANSWER_CACHE
+            else GroqGenerator()
+        ),
+        "memory": ConversationMemory(),
+        "packer": ContextPacker(),
+    }
+
+
 def initialize_system():
     valid, msg = Config.validate()
     if not valid:
         st.error(msg)
         st.stop()
 
+    shared = load_shared_components()
+
     return {
-        "loader": PDFLoader(),
+        **shared,
         "chunker": SemanticChunker(
             chunk_size=Config.CHUNK_SIZE,
             overlap=Config.CHUNK_OVERLAP,
+            strategy=Config.CHUNK_STRATEGY,
         ),
-        "retriever": UnifiedRetriever(),
-        "generator": GroqGenerator(),
         "guardrails": HallucinationGuardrails(
             similarity_threshold=Config.SIMILARITY_THRESHOLD
         ),
-        "memory": ConversationMemory(),
     }
 
 system = initialize_system()
 
+# ---------------------------------------------------------------------
+# COLLECTION (each has its own PDFs and memory; queries search only it)
+# ---------------------------------------------------------------------
+
+with st.sidebar:
+    st.header("🗂️ Collection")
+    collection = st.text_input(
+        "Collection name (blank = default)",
+        help="Each collection has its own indexed PDFs and conversation memory",
+    ).strip()
+
+def collection_retriever(name: str) -> UnifiedRetriever:
+    """
+    Retriever of collection ``name`` (blank: the default one).
+
+    The session holds a lease on its collection, so it is never unloaded
+    while one of the session's runs may still use it; switching collection
+    or the session ending releases it.
+    """
+    lease = st.session_state.get("collection_lease")
+    if lease is not None and lease.name != name:
+        lease.release()
+        lease = st.session_state.collection_lease = None
+    if not name:
+        return system["retriever"]
+    if lease is None:
+        lease = st.session_state.collection_lease = system["collections"].lease(name)
+    return lease.shard
+
+
+try:
+    retriever = collection_retriever(collection)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+retriever.refresh_if_changed()
+
+
+def user_namespace() -> str:
+    """
+    Memory namespace of whoever uses the app, the same on every visit: the
+    signed-in user if Streamlit auth is configured, else a ``user`` id kept
+    in the page URL (created on the first visit; bookmark it to come back).
+    """
+    user = getattr(st, "user", None)
+    email = user.get("email") if user is not None and user.get("is_logged_in") else None
+    if email:
+        return hashlib.sha256(email.lower().encode()).hexdigest()[:32]
+    user_id = st.query_params.get("user", "")
+    if not re.fullmatch(r"[0-9a-f]{32}", user_id):
+        user_id = st.query_params["user"] = uuid.uuid4().hex
+    return user_id
+
+
+if "user_namespace" not in st.session_state:
+    st.session_state.user_namespace = user_namespace()
+
 # ---------------------------------------------------------------------
 # SIDEBAR (Configuration Transparency)
 # ---------------------------------------------------------------------
@@ -98,11 +191,62 @@ with st.sidebar:
     st.divider()
     st.header("📊 Vector Statistics")
 
-    stats = system["retriever"].get_stats()
+    stats = retriever.get_stats(namespace=st.session_state.user_namespace)
     st.metric("PDF Vectors", stats["pdf_vectors"])
     st.metric("Memory Vectors", stats["memory_vectors"])
     st.metric("Total Vectors", stats["total_vectors"])
 
+    pdf_index = stats["pdf_index"]
+    st.metric(
+        "Index Memory",
+        f"{(pdf_index['index_bytes'] + stats['memory_index']['index_bytes']) / 2**20:.1f} MB",
+        help=(
+            f"PDF index: {pdf_index['bytes_per_vector']:.0f} bytes/vector; "
+            f"{pdf_index['raw_vector_bytes'] / 2**20:.1f} MB of exact vectors on disk "
+            "for re-ranking"
+        ),
+    )
+
+    if "embedding_cache" in stats:
+        cache = stats["embedding_cache"]
+        st.metric(
+            "Embedding Cache Hit Rate",
+            f"{cache['hit_rate']:.0%}",
+            help=f"{cache['hits']} hits / {cache['misses']} misses",
+        )
+
+    llm = system["generator"].get_stats()
+    if llm["requests"]:
+        st.metric(
+            "Avg Time to First Token",
+            f"{llm['avg_ttft']:.2f} s",
+            help=(
+                f"{llm['avg_tokens_per_sec']:.0f} tokens/s over the last {llm['requests']} "
+                f"answers; {llm['retries']} retries, {llm['hedges']} hedged requests"
+            ),
+        )
+
+    if "answer_cache" in llm:
+        answers = llm["answer_cache"]
+        st.metric(
+            "Answer Cache Hit Rate",
+            f"{answers['hit_rate']:.0%}",
+            help=f"{answers['hits']} hits / {answers['misses']} misses",
+        )
+        st.metric("LLM Time Saved", f"{answers['saved_seconds']:.1f} s")
+
+    packing = system["packer"].get_stats()
+    if packing["requests"]:
+        st.metric(
+            "Avg Prompt Tokens",
+            f"{packing['avg_prompt_tokens']:.0f}",
+            help=(
+                f"Context averages {packing['avg_context_tokens']:.0f} tokens after merging "
+                f"overlapping chunks, vs {packing['avg_raw_tokens']:.0f} retrieved; "
+                f"{packing['tokens_saved']} tokens saved so far"
+            ),
+        )
+
 # ---------------------------------------------------------------------
 # TABS (Renamed for Evaluators)
 # ---------------------------------------------------------------------
@@ -125,39 +269,64 @@ with tab_upload:
         accept_multiple_files=True,
     )
 
-    if uploaded_files and st.button("📥 Process & Index PDFs"):
-        total_chunks = 0
+    replace_existing = st.checkbox(
+        "Replace documents with the same filename",
+        value=True,
+        help="Re-index an updated PDF without rebuilding the whole corpus",
+    )
 
+    if uploaded_files and st.button("📥 Process & Index PDFs"):
+        registry = retriever.registry
+        pdf_paths = []
         for uploaded_file in uploaded_files:
-            pdf_path = Config.PDFS_DIR / uploaded_file.name
+            data = uploaded_file.getbuffer()
+            known = registry.get(hashlib.sha256(data).hexdigest())
+            if known is not None and Config.DUPLICATE_POLICY == "skip":
+                st.info(
+                    f"{uploaded_file.name}: already indexed as "
+                    f"{known['filename']}, skipped"
+                )
+                continue
 
+            pdf_path = Config.PDFS_DIR / uploaded_file.name
             with open(pdf_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+                f.write(data)
+            pdf_paths.append(pdf_path)
 
-            text, filename = system["loader"].load_pdf(str(pdf_path))
+        pipeline = IngestionPipeline(system["chunker"], retriever)
+        with st.spinner(f"Indexing {len(pdf_paths)} PDF(s)..."):
+            results = pipeline.ingest(pdf_paths, replace=replace_existing)
 
-            if not text:
+        total_chunks = 0
+        for filename, added in results.items():
+            if filename in pipeline.skipped:
+                st.info(f"{filename}: already indexed, skipped")
+                continue
+            if filename in pipeline.failed:
+                st.error(f"Failed to index {filename}: {pipeline.failed[filename]}")
+                continue
+            if not added:
                 st.error(f"Failed to extract text from {filename}")
                 continue
 
-            raw_chunks = system["chunker"].chunk(
-                text,
-                metadata={"source": filename},
-            )
-
-            documents = [
-                {"text": t, "metadata": m}
-                for t, m in raw_chunks
-                if t.strip()
-            ]
-
-            added = system["retriever"].add_pdf_documents(documents)
             total_chunks += added
-
             st.success(f"{filename}: {added} chunks indexed")
 
         st.success(f"✅ Total chunks indexed: {total_chunks}")
 
+    documents = retriever.list_documents()
+    if documents:
+        st.subheader("Indexed Documents")
+        for doc in documents:
+            col_name, col_chunks, col_remove = st.columns([4, 1, 1])
+            col_name.write(doc["filename"])
+            col_chunks.write(f"{doc['chunks']} chunks")
+            if col_remove.button("🗑️ Remove", key=f"remove_{doc['doc_hash']}"):
+                # Tombstones are durable already; the compactor snapshots.
+                removed = retriever.remove_document_hash(doc["doc_hash"])
+                st.success(f"Removed {doc['filename']} ({removed} vectors)")
+                st.rerun()
+
 # ---------------------------------------------------------------------
 # CHAT
 # ---------------------------------------------------------------------
@@ -167,6 +336,8 @@ with tab_chat:
 
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
     for msg in st.session_state.messages:
         with st.chat_message(msg["role"]):
@@ -181,28 +352,69 @@ with tab_chat:
 
         with st.chat_message("assistant"):
             # 🔍 RETRIEVE
-            texts, metadata = system["retriever"].retrieve(
+            # Memory is partitioned per user (their own namespace).
+            texts, metadata = retriever.retrieve(
                 query,
                 top_k_pdf=Config.TOP_K_RETRIEVAL,
                 threshold=similarity_threshold,
+                namespace=st.session_state.user_namespace,
             )
 
-            context = format_context(texts) if texts else ""
+            # 📦 CONTEXT: overlapping chunks merged, capped at the token budget
+            context, packing = system["packer"].pack(texts, metadata)
 
             # 🛡️ GUARDED PROMPT
             prompt = system["guardrails"].generate_safe_prompt(
                 query, context
             )
-
-            # 🤖 GENERATE RESPONSE
-            response = system["generator"].generate(prompt)
-            st.markdown(response)
+            prompt_tokens = system["packer"].record(packing, prompt)
+
+            # 🤖 GENERATE RESPONSE (rendered as tokens arrive)
+            generator = system["generator"]
+            cache_args = {}
+            # Chunk ids are per collection, so only the default one is cached.
+            if isinstance(generator, CachedGenerator) and not collection:
+                generator.cache.sync_version(retriever.pdf_store.version)
+                cache_args["cache_key"] = AnswerCache.make_key(
+                    query,
+                    [m["vector_id"] for m in metadata if m["type"] == "pdf"],
+                    memory_ids=[m["vector_id"] for m in metadata if m["type"] == "memory"],
+                    namespace=st.session_state.user_namespace,
+                )
+
+            placeholder = st.empty()
+            stream = generator.stream(prompt, **cache_args)
+            try:
+                for _ in stream:
+                    placeholder.markdown(stream.text + "▌")
+            except LLMGenerationError as e:
+                # Never store or embed a failed answer as if it were one.
+                placeholder.empty()
+                st.error(f"⚠️ The language model is unavailable right now: {e}")
+                st.stop()
+            response = stream.text.strip()
+            placeholder.markdown(response)
+
+            metrics = stream.metrics
+            if stream.cached:
+                st.caption("⚡ Answered from cache")
+            elif metrics["ttft"] is not None:
+                st.caption(
+                    f"⏱️ First token {metrics['ttft']:.2f} s · "
+                    f"{metrics['tokens']} tokens at {metrics['tokens_per_sec']:.0f} tok/s · "
+                    f"prompt ~{prompt_tokens} tokens "
+                    f"(context {packing['tokens']} of {packing['raw_tokens']} retrieved)"
+                )
 
             # 🧠 MEMORY
-            system["memory"].add_turn(query, response, metadata)
-            system["retriever"].add_memory(
+            system["memory"].add_turn(
+                query, response, metadata, session=st.session_state.session_id
+            )
+            retriever.add_memory(
                 f"Q: {query}\nA: {response}",
                 get_timestamp(),
+                session=st.session_state.session_id,
+                namespace=st.session_state.user_namespace,
             )
 
             # 🛡️ EXPLAINABILITY FOR EVALUATORS
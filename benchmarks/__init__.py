@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for the RAG pipeline.
+
+Run from the project root, e.g. ``python -m benchmarks.bench_embeddings``.
+``python -m benchmarks.suite`` times every stage and checks for regressions
+against the baselines in ``benchmarks/baselines/``.
+"""
@@ -0,0 +1,104 @@
+"""
+Benchmark: fixed-window vs. adaptive (sentence / paragraph / heading
+aligned) chunking on a sample corpus of structured documents.
+
+Reports chunk count, words indexed (overlap included), the resulting flat
+index and metadata size, search latency and the prompt tokens of a top-k
+context.
+
+Usage:
+    python -m benchmarks.bench_adaptive_chunking [--documents 100] [--words 5000] [--queries 200]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from core.chunker import STRATEGIES, SemanticChunker
+from core.context_packer import SEPARATOR, count_tokens
+from core.vectorstore import FAISSVectorStore
+from benchmarks.synthetic import make_document
+
+
+def directory_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--words", type=int, default=5_000, help="per document")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=Config.TOP_K_RETRIEVAL)
+    args = parser.parse_args()
+
+    corpus = [make_document(args.words, seed=i) for i in range(args.documents)]
+    words = sum(len(text.split()) for text in corpus)
+    rng = np.random.default_rng(0)
+    questions = rng.standard_normal(
+        (args.queries, 1, Config.EMBEDDING_DIMENSION), dtype=np.float32
+    )
+    print(
+        f"{args.documents} documents, {words} words; fixed {Config.CHUNK_SIZE}/"
+        f"{Config.CHUNK_OVERLAP} words vs adaptive {Config.CHUNK_MIN_WORDS}-"
+        f"{Config.CHUNK_MAX_WORDS} words, {Config.CHUNK_OVERLAP_SENTENCES} sentence overlap"
+    )
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for strategy in STRATEGIES:
+            chunker = SemanticChunker(strategy=strategy)
+            start = time.perf_counter()
+            chunks = [
+                chunk
+                for i, text in enumerate(corpus)
+                for chunk in chunker.iter_chunks(text, {"source": f"doc_{i}.pdf"})
+            ]
+            chunk_ms = (time.perf_counter() - start) * 1000
+
+            # Random vectors: index size and flat search cost only depend on the count.
+            directory = Path(tmp) / strategy
+            store = FAISSVectorStore(
+                directory / "index.faiss", directory / "metadata", index_type="flat"
+            )
+            vectors = rng.standard_normal(
+                (len(chunks), Config.EMBEDDING_DIMENSION), dtype=np.float32
+            )
+            store.add(vectors, [dict(meta, text=text) for text, meta in chunks])
+            store.save()
+
+            timings = []
+            for question in questions:
+                begin = time.perf_counter()
+                store.search_many(question, args.top_k)
+                timings.append((time.perf_counter() - begin) * 1000)
+            contexts = [
+                count_tokens(SEPARATOR.join(
+                    chunks[j][0] for j in rng.choice(len(chunks), args.top_k, replace=False)
+                ))
+                for _ in range(args.queries)
+            ]
+            store.close()
+
+            results[strategy] = {
+                "chunks": len(chunks),
+                "indexed words": sum(len(text.split()) for text, _ in chunks),
+                "on disk MB": directory_bytes(directory) / 2**20,
+                "search p50 ms": statistics.median(timings),
+                "context tokens": statistics.mean(contexts),
+                "chunking ms": chunk_ms,
+            }
+
+    fixed, adaptive = results["fixed"], results["adaptive"]
+    print(f"{'':>16} {'fixed':>10} {'adaptive':>10} {'change':>8}")
+    for name in fixed:
+        change = adaptive[name] / fixed[name] - 1 if fixed[name] else 0.0
+        print(f"{name:>16} {fixed[name]:10.1f} {adaptive[name]:10.1f} {change:+8.1%}")
+
+
+if __name__ == "__main__":
+    main()
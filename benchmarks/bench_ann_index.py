@@ -0,0 +1,81 @@
+"""
+Benchmark: recall@k and query latency for each FAISSVectorStore index type.
+
+Recall is measured against the exact flat index on the same clustered
+synthetic corpus.
+
+Usage:
+    python -m benchmarks.bench_ann_index [--vectors 50000] [--queries 200] [--k 10]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from core.vectorstore import FAISSVectorStore
+
+
+def make_corpus(n: int, dimension: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.random((clusters, dimension), dtype=np.float32) * 4
+    labels = rng.integers(0, clusters, n)
+    noise = rng.standard_normal((n, dimension), dtype=np.float32) * 0.5
+    return centers[labels] + noise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=Config.EMBEDDING_DIMENSION)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.vectors + args.queries, args.dimension)
+    vectors, queries = corpus[:args.vectors], corpus[args.vectors:]
+    metadata = [{"text": f"chunk {i}"} for i in range(args.vectors)]
+
+    truth = None
+    print(f"{args.vectors} vectors x {args.dimension} dims, {args.queries} queries, k={args.k}")
+    print(f"{'index':>10} {'build s':>9} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for index_type in ("flat", "ivf_flat", "hnsw", "ivf_pq"):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            store = FAISSVectorStore(
+                index_path=tmp / "index.faiss",
+                metadata_path=tmp / "metadata.pkl",
+                dimension=args.dimension,
+                index_type=index_type,
+            )
+
+            start = time.perf_counter()
+            store.add(vectors, metadata)
+            store.save()  # trains the ANN index, which add leaves to the compactor
+            build = time.perf_counter() - start
+
+            latencies = []
+            hits = []
+            for query in queries:
+                start = time.perf_counter()
+                results = store.search(query, k=args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits.append({int(idx) for idx, _, _ in results})
+
+            if truth is None:
+                truth = hits
+            recall = np.mean(
+                [len(found & exact) / len(exact) for found, exact in zip(hits, truth)]
+            )
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(
+                f"{store.index_kind:>10} {build:>9.2f} {recall:>9.3f} "
+                f"{p50:>8.3f} {p99:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: cold-start time and resident memory of FAISSVectorStore.
+
+Each load runs in a fresh interpreter, so apart from the OS page cache
+nothing is shared with the process that built the store. A flat search
+still scans every vector, so the mapped pages become resident during the
+first query; the load itself no longer depends on corpus size. ``legacy`` reproduces the
+previous startup (full ``read_index`` plus unpickling every metadata dict).
+
+Usage:
+    python -m benchmarks.bench_cold_start [--sizes 10000 100000]
+"""
+import argparse
+import json
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load(directory: Path, mode: str):
+    import faiss
+    from core.vectorstore import FAISSVectorStore
+
+    query = np.random.default_rng(1).random(Config.EMBEDDING_DIMENSION, dtype=np.float32)
+    before = rss_mb()
+    start = time.perf_counter()
+    if mode == "legacy":
+        index = faiss.read_index(str(directory / "index.faiss"))
+        with open(directory / "metadata.pkl", "rb") as f:
+            metadata = pickle.load(f)
+    else:
+        store = FAISSVectorStore(
+            index_path=directory / "index.faiss",
+            metadata_path=directory / "metadata",
+            index_type="flat",
+        )
+    loaded = time.perf_counter()
+    load_rss = rss_mb() - before
+
+    if mode == "legacy":
+        _, ids = index.search(query.reshape(1, -1), 5)
+        hits = [metadata[i] for i in ids[0]]
+    else:
+        hits = store.search(query, k=5)
+    searched = time.perf_counter()
+
+    print(json.dumps({
+        "load_s": loaded - start,
+        "load_rss_mb": load_rss,
+        "search_s": searched - loaded,
+        "hits": len(hits),
+    }))
+
+
+def build(directory: Path, size: int):
+    import faiss
+    from core.vectorstore import FAISSVectorStore
+
+    rng = np.random.default_rng(0)
+    vectors = rng.random((size, Config.EMBEDDING_DIMENSION), dtype=np.float32)
+    metadata = [
+        {"text": f"chunk {i} " + "lorem ipsum " * 100, "source": f"doc{i % 50}.pdf",
+         "chunk_id": i, "chunk_start": i * 150, "chunk_end": i * 150 + 200}
+        for i in range(size)
+    ]
+    store = FAISSVectorStore(
+        index_path=directory / "index.faiss",
+        metadata_path=directory / "metadata",
+        index_type="flat",
+    )
+    store.add(vectors, metadata)
+    store.save()
+    with open(directory / "metadata.pkl", "wb") as f:
+        pickle.dump(metadata, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--load", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="mmap", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        load(args.load, args.mode)
+        return
+
+    print(f"{'vectors':>10} {'mode':>8} {'load s':>8} {'load RSS MB':>12} {'1st search s':>13}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            build(Path(tmp), size)
+            for mode in ("legacy", "mmap"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_cold_start",
+                     "--load", tmp, "--mode", mode],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                print(
+                    f"{size:>10} {mode:>8} {result['load_s']:>8.3f} "
+                    f"{result['load_rss_mb']:>12.1f} {result['search_s']:>13.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
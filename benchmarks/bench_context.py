@@ -0,0 +1,77 @@
+"""
+Benchmark: prompt context size, joined chunks vs. the context packer.
+
+Each simulated retrieval returns ``--adjacent`` consecutive chunks of one
+document (an answer spanning a passage, so the chunks overlap by
+``CHUNK_OVERLAP`` words) plus unrelated chunks up to ``--top-k``. Compares
+the tokens of every chunk joined (the previous ``format_context``) with the
+packed context.
+
+Usage:
+    python -m benchmarks.bench_context [--queries 500] [--top-k 5] [--adjacent 3]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from core.chunker import SemanticChunker
+from core.context_packer import ContextPacker, SEPARATOR, count_tokens
+from benchmarks.synthetic import make_text
+
+
+def retrieved(chunks, rng, top_k: int, adjacent: int):
+    document = rng.randrange(len(chunks))
+    first = rng.randrange(len(chunks[document]) - adjacent + 1)
+    hits = chunks[document][first:first + adjacent]
+    while len(hits) < top_k:
+        other = rng.randrange(len(chunks))
+        if other != document:
+            hits.append(rng.choice(chunks[other]))
+    rng.shuffle(hits)
+    texts = [text for text, _ in hits]
+    metadata = [dict(meta, type="pdf", document=meta["source"]) for _, meta in hits]
+    return texts, metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--adjacent", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=None)
+    args = parser.parse_args()
+
+    chunker = SemanticChunker()
+    chunks = [
+        chunker.chunk(make_text(3000, seed=i), {"source": f"doc_{i}.pdf"})
+        for i in range(args.documents)
+    ]
+
+    rng = random.Random(0)
+    packer = ContextPacker(args.budget)
+    raw, packed, passages, pack_ms = [], [], [], []
+    for _ in range(args.queries):
+        texts, metadata = retrieved(chunks, rng, args.top_k, args.adjacent)
+        start = time.perf_counter()
+        context, stats = packer.pack(texts, metadata)
+        pack_ms.append((time.perf_counter() - start) * 1000)
+        raw.append(count_tokens(SEPARATOR.join(texts)))
+        packed.append(stats["tokens"])
+        passages.append(stats["passages"])
+
+    print(
+        f"{args.queries} retrievals of {args.top_k} chunks ({args.adjacent} adjacent), "
+        f"budget {packer.token_budget} tokens"
+    )
+    print(f"{'joined chunks':>14}: {statistics.mean(raw):7.0f} context tokens")
+    print(
+        f"{'packed':>14}: {statistics.mean(packed):7.0f} context tokens "
+        f"({1 - sum(packed) / sum(raw):.0%} fewer) in {statistics.mean(passages):.1f} passages, "
+        f"packing {statistics.median(pack_ms):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: vectorized batch embedding vs. the original per-byte loop.
+
+Usage:
+    python -m benchmarks.bench_embeddings [--chunks 2000] [--words 200]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from core.embeddings import EmbeddingGenerator
+
+
+def legacy_embedding(text: str, dimension: int) -> list:
+    """Reference copy of the original scalar implementation."""
+    vec = np.zeros(dimension, dtype=np.float32)
+    for i, b in enumerate(text.encode("utf-8")):
+        vec[i % dimension] += b / 255.0
+    return vec.tolist()
+
+
+def make_chunks(count: int, words: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    vocab = [
+        "assessment", "retrieval", "grounded", "clause", "section", "über",
+        "naïve", "vector", "index", "document", "policy", "réponse", "42",
+    ]
+    return [" ".join(rng.choice(vocab) for _ in range(words)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=200)
+    args = parser.parse_args()
+
+    generator = EmbeddingGenerator()
+    chunks = make_chunks(args.chunks, args.words)
+
+    start = time.perf_counter()
+    legacy = np.array(
+        [legacy_embedding(t, generator.dimension) for t in chunks], dtype=np.float32
+    )
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = generator.embed_texts(chunks)
+    batched_time = time.perf_counter() - start
+
+    identical = np.array_equal(
+        legacy.view(np.uint32), batched.view(np.uint32)
+    )
+
+    print(f"chunks:           {len(chunks)} x {args.words} words")
+    print(f"legacy loop:      {legacy_time * 1000:10.1f} ms")
+    print(f"vectorized batch: {batched_time * 1000:10.1f} ms")
+    print(f"speedup:          {legacy_time / batched_time:10.1f}x")
+    print(f"bit-identical:    {identical}")
+
+    if not identical:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: parallel ingestion pipeline vs. the sequential upload loop.
+
+Usage:
+    python -m benchmarks.bench_ingestion [--files 100] [--pages 20] [--workers 1 2 4 8]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from config import Config
+from core.chunker import SemanticChunker
+from core.ingest import IngestionPipeline
+from core.loader import PDFLoader
+from core.retriever import UnifiedRetriever
+from benchmarks.synthetic import write_corpus
+
+
+def isolated_retriever(directory: Path) -> UnifiedRetriever:
+    Config.FAISS_INDEX_PATH = directory / "pdf_index.faiss"
+    Config.FAISS_METADATA_PATH = directory / "pdf_metadata"
+    Config.MEMORY_INDEX_PATH = directory / "memory_index.faiss"
+    Config.MEMORY_METADATA_PATH = directory / "memory_metadata"
+    Config.DOCUMENT_REGISTRY_DIR = directory / "registry"
+    Config.BM25_INDEX_DIR = directory / "pdf_lexical"
+    Config.PDF_SHARDS_DIR = directory / "pdf_shards"
+    Config.MEMORY_NAMESPACES_DIR = directory / "memory_namespaces"
+    Config.ENABLE_EMBEDDING_CACHE = False
+    return UnifiedRetriever()
+
+
+def sequential(paths, directory: Path) -> int:
+    """The pre-pipeline upload loop from app.py."""
+    loader, chunker = PDFLoader(), SemanticChunker()
+    retriever = isolated_retriever(directory)
+    total = 0
+    for path in paths:
+        text, filename = loader.load_pdf(str(path))
+        if not text:
+            continue
+        documents = [
+            {"text": t, "metadata": m}
+            for t, m in chunker.chunk(text, metadata={"source": filename})
+            if t.strip()
+        ]
+        total += retriever.add_pdf_documents(documents)
+    retriever.pdf_store.save()
+    return total
+
+
+def parallel(paths, directory: Path, workers: int) -> int:
+    pipeline = IngestionPipeline(
+        SemanticChunker(), isolated_retriever(directory), workers=workers
+    )
+    return sum(n or 0 for n in pipeline.ingest(paths).values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = write_corpus(tmp / "pdfs", args.files, args.pages)
+        print(f"{args.files} PDFs x {args.pages} pages")
+
+        start = time.perf_counter()
+        chunks = sequential(paths, tmp / "seq")
+        baseline = time.perf_counter() - start
+        print(f"{'sequential':>14}: {baseline:7.2f} s  ({chunks} chunks)")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            chunks = parallel(paths, tmp / f"par{workers}", workers)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{f'{workers} workers':>14}: {elapsed:7.2f} s  ({chunks} chunks, "
+                f"{baseline / elapsed:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: BM25 lookup latency as the keyword index grows.
+
+Every synthetic chunk mixes words from a small shared vocabulary (so
+common terms have postings in nearly every chunk) with a few identifiers
+that occur in only a handful of chunks, then three kinds of query are
+timed: an identifier alone, an identifier plus common words, and common
+words only.
+
+Usage:
+    python -m benchmarks.bench_lexical [--chunks 1000000] [--words 40] [--queries 500]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from config import Config
+from core.lexical_index import BM25Index
+from benchmarks.synthetic import VOCABULARY, make_words
+
+
+def chunk_text(i: int, words: int) -> str:
+    body = make_words(words, seed=i)
+    return f"Clause {i % 997}.{i % 13} of contract AC-{i // 4:07d} " + " ".join(body)
+
+
+def build(index: BM25Index, chunks: int, words: int, batch: int = 10_000) -> float:
+    start = time.perf_counter()
+    for first in range(0, chunks, batch):
+        ids = range(first, min(chunks, first + batch))
+        index.add(ids, [chunk_text(i, words) for i in ids])
+    index.save()
+    return time.perf_counter() - start
+
+
+def time_queries(index: BM25Index, queries, k: int) -> dict:
+    for query in queries[:20]:
+        index.search(query, k)  # warm the page cache
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(0.99 * len(samples)))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--words", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    ids = [rng.randrange(args.chunks) for _ in range(args.queries)]
+    query_sets = {
+        "identifier": [f"AC-{i // 4:07d}" for i in ids],
+        "identifier + words": [
+            f"what does contract AC-{i // 4:07d} say about {rng.choice(VOCABULARY)} "
+            f"{rng.choice(VOCABULARY)}"
+            for i in ids
+        ],
+        "common words": [" ".join(rng.sample(VOCABULARY, 3)) for _ in ids],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = BM25Index(Path(tmp) / "lexical")
+        seconds = build(index, args.chunks, args.words)
+        stats = index.get_stats()
+        print(
+            f"{args.chunks} chunks x {args.words + 5} words: built in {seconds:.1f} s "
+            f"({args.chunks / seconds:,.0f} chunks/s), {stats['postings']:,} postings "
+            f"in {stats['segments']} segments"
+        )
+        print(f"top-{args.k} lookups (max {Config.BM25_MAX_POSTINGS} postings per term):")
+        for label, queries in query_sets.items():
+            timing = time_queries(index, queries, args.k)
+            print(
+                f"{label:>20}: p50 {timing['p50'] * 1000:6.3f} ms  "
+                f"p99 {timing['p99'] * 1000:6.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
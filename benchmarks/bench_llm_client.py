@@ -0,0 +1,95 @@
+"""
+Benchmark: LLM client resilience against injected errors and tail latency.
+
+Drives the async generator with many concurrent requests against the
+local fake endpoint and compares a single-shot client (no retries, no
+hedging) with retries and with hedging.
+
+Usage:
+    python -m benchmarks.bench_llm_client [--requests 200] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from config import Config
+from core.generator import GroqGenerator, LLMGenerationError
+from benchmarks.fake_llm_server import FakeLLMServer
+
+
+async def drive(base_url: str, requests: int, concurrency: int, warmup: int) -> dict:
+    generator = GroqGenerator(api_key="fake", base_url=base_url)
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await generator.agenerate(f"question {i}")
+                return time.perf_counter() - start
+            except LLMGenerationError:
+                return None
+
+    # Sequential warm-up fills the latency window hedging relies on.
+    for i in range(warmup):
+        await one(-i)
+    generator.hedges = generator.retries = generator.failures = 0
+
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    await generator.client.close()
+
+    latencies = sorted(r for r in results if r is not None)
+    stats = {
+        "ok": len(latencies),
+        "failed": requests - len(latencies),
+        "retries": generator.retries,
+        "hedges": generator.hedges,
+    }
+    for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        stats[name] = latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+    return stats
+
+
+def run(label: str, server_kwargs: dict, client: dict, args) -> None:
+    for name, value in client.items():
+        setattr(Config, name, value)
+    with FakeLLMServer(tokens=20, token_delay=0.0, **server_kwargs) as server:
+        stats = asyncio.run(
+            drive(server.base_url, args.requests, args.concurrency, args.warmup)
+        )
+    print(
+        f"{label:>28}: ok {stats['ok']:4d}  failed {stats['failed']:4d}  "
+        f"retries {stats['retries']:4d}  hedges {stats['hedges']:4d}  "
+        f"p50 {stats['p50'] * 1000:6.0f} ms  p95 {stats['p95'] * 1000:6.0f} ms  "
+        f"p99 {stats['p99'] * 1000:6.0f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=30)
+    args = parser.parse_args()
+
+    Config.LLM_BACKOFF_BASE = 0.05
+    Config.LLM_MAX_CONCURRENCY = args.concurrency
+    single_shot = {"LLM_MAX_RETRIES": 0, "LLM_HEDGE": False}
+    retries = {"LLM_MAX_RETRIES": 3, "LLM_HEDGE": False}
+    hedged = {"LLM_MAX_RETRIES": 3, "LLM_HEDGE": True}
+
+    errors = {"ttft": 0.05, "error_rate": 0.2, "error_status": 503}
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print("20% of requests fail with 503:")
+    run("single shot", errors, single_shot, args)
+    run("retries + backoff", errors, retries, args)
+
+    tail = {"ttft": 0.05, "slow_rate": 0.05, "slow_ttft": 1.0}
+    print("5% of requests take 1 s instead of 50 ms:")
+    run("retries + backoff", tail, retries, args)
+    run("retries + backoff + hedging", tail, hedged, args)
+
+
+if __name__ == "__main__":
+    main()
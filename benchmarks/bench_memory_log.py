@@ -0,0 +1,91 @@
+"""
+Benchmark: conversation memory, rewriting conversations.json per turn vs. the
+append-only SQLite log.
+
+"json" replays the previous store (the whole history in one dict, saved with
+``save_json`` after every ``add_turn``); "sqlite" is ``ConversationMemory``.
+Both are pre-filled to each history size, then timed on new turns and on
+reading the last turns back after a restart.
+
+Usage:
+    python -m benchmarks.bench_memory_log [--history 1000 10000 50000] [--turns 200]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from core.memory import ConversationMemory
+from core.utils import get_timestamp, load_json, save_json
+from benchmarks.synthetic import make_text
+
+
+def turn(i: int) -> dict:
+    return {
+        "timestamp": get_timestamp(),
+        "query": make_text(15, seed=i),
+        "response": make_text(120, seed=-i),
+        "context_used": [{"source": f"doc_{i % 50}.pdf", "type": "pdf", "similarity": 0.7}],
+    }
+
+
+def run_json(path: Path, history: list, turns: int):
+    conversations = {"turns": list(history)}
+    save_json(conversations, path)
+    add_ms = []
+    for i in range(turns):
+        start = time.perf_counter()
+        conversations["turns"].append(turn(i))
+        save_json(conversations, path)
+        add_ms.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    recent = [(t["query"], t["response"]) for t in load_json(path)["turns"][-5:]]
+    return add_ms, (time.perf_counter() - start) * 1000, recent
+
+
+def run_sqlite(path: Path, history: list, turns: int):
+    memory = ConversationMemory(path, legacy_path=None)
+    with memory._db:
+        memory._db.executemany(
+            "INSERT INTO turns (session, timestamp, query, response, context_used)"
+            " VALUES ('default', ?, ?, ?, '[]')",
+            [(t["timestamp"], t["query"], t["response"]) for t in history],
+        )
+    add_ms = []
+    for i in range(turns):
+        t = turn(i)
+        start = time.perf_counter()
+        memory.add_turn(t["query"], t["response"], t["context_used"])
+        add_ms.append((time.perf_counter() - start) * 1000)
+    memory._db.close()
+    start = time.perf_counter()
+    recent = ConversationMemory(path, legacy_path=None).get_last_n_turns(5)
+    return add_ms, (time.perf_counter() - start) * 1000, recent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.history:
+        history = [turn(10**6 + i) for i in range(size)]
+        with tempfile.TemporaryDirectory() as tmp:
+            results = {
+                "json": run_json(Path(tmp) / "conversations.json", history, args.turns),
+                "sqlite": run_sqlite(Path(tmp) / "conversations.sqlite3", history, args.turns),
+            }
+        assert results["json"][2] == results["sqlite"][2]
+        print(f"{size} turns of history, {args.turns} new turns")
+        for label, (add_ms, tail_ms, _) in results.items():
+            print(
+                f"{label:>8}: add_turn p50 {statistics.median(add_ms):8.3f} ms  "
+                f"p99 {sorted(add_ms)[int(len(add_ms) * 0.99)]:8.3f} ms   "
+                f"last 5 turns after restart {tail_ms:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: memory store size and search latency as conversations accumulate,
+unbounded vs. with retention (caps, TTL and roll-up summaries).
+
+Usage:
+    python -m benchmarks.bench_memory_retention [--turns 20000] [--sessions 20] [--checkpoints 5]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from config import Config
+from core.embeddings import EmbeddingGenerator
+from core.memory_retention import MemoryRetention
+from core.vectorstore import FAISSVectorStore
+from benchmarks.synthetic import make_text, make_words
+
+
+def search_ms(store, questions) -> float:
+    timings = []
+    for question in questions:
+        start = time.perf_counter()
+        store.range_search_many(question, Config.SIMILARITY_THRESHOLD, Config.MEMORY_TOP_K)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=20_000)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--checkpoints", type=int, default=5)
+    args = parser.parse_args()
+
+    embeddings = EmbeddingGenerator()
+    questions = [
+        embeddings.embed_texts([" ".join(make_words(10, seed=10**6 + i)) + "?"])
+        for i in range(200)
+    ]
+    start_time = datetime(2024, 1, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            label: FAISSVectorStore(
+                Path(tmp) / f"{label}.faiss", Path(tmp) / f"{label}_metadata", index_type="flat"
+            )
+            for label in ("unbounded", "retention")
+        }
+        retention = MemoryRetention(stores["retention"], embeddings)
+
+        every = args.turns // args.checkpoints
+        for turn in range(args.turns):
+            now = start_time + timedelta(minutes=10 * turn)
+            text = f"Q: {make_text(12, seed=turn)}\nA: {make_text(80, seed=-turn)}"
+            vector = embeddings.embed_texts([text])
+            metadata = {
+                "text": text,
+                "timestamp": now.isoformat(),
+                "source": "conversation",
+                "session": f"s{turn % args.sessions}",
+            }
+            for store in stores.values():
+                store.add(vector, [dict(metadata)])
+            retention._pending += 1
+            if retention._pending >= retention.interval:
+                retention._pending = 0
+                retention.enforce(now)
+
+            if (turn + 1) % every == 0:
+                line = [f"{turn + 1:>7} turns"]
+                for label, store in stores.items():
+                    line.append(
+                        f"{label}: {store.get_size():6d} vectors, "
+                        f"search p50 {search_ms(store, questions):.3f} ms"
+                    )
+                print("   ".join(line))
+
+        stats = retention.get_stats()
+        print(
+            f"retention: {stats['evicted']} turns evicted into {stats['summaries_created']} "
+            f"summaries, last pass {stats['last_enforce_ms']:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: one tenant's query against a shared index of every tenant vs.
+against that tenant's own shard, plus the cost of opening an unloaded shard.
+
+The shared index has to over-fetch and drop other tenants' hits; the shard
+only holds the tenant's vectors.
+
+Usage:
+    python -m benchmarks.bench_namespaces [--tenants 50] [--chunks 2000] [--queries 500]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from core.shards import ShardPool, shard_dir
+from core.vectorstore import FAISSVectorStore
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=2_000, help="per tenant")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-loaded", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dimension = Config.EMBEDDING_DIMENSION
+    tenants = [f"tenant{t}" for t in range(args.tenants)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        shared = FAISSVectorStore(tmp / "shared.faiss", tmp / "shared_metadata", index_type="flat")
+
+        def open_shard(name):
+            directory = shard_dir(tmp / "shards", name)
+            return FAISSVectorStore(
+                directory / "index.faiss", directory / "metadata", index_type="flat"
+            )
+
+        for name in tenants:
+            vectors = rng.standard_normal((args.chunks, dimension), dtype=np.float32)
+            metadata = [{"text": "", "source": name} for _ in range(args.chunks)]
+            shared.add(vectors, [dict(meta) for meta in metadata])
+            store = open_shard(name)
+            store.add(vectors, metadata)
+            store.save()
+        shared.save()
+
+        pool = ShardPool(
+            open_shard, lambda store: store.close(), max_loaded=args.max_loaded,
+            base_dir=tmp / "shards",
+        )
+        questions = rng.standard_normal((args.queries, 1, dimension), dtype=np.float32)
+        owners = [tenants[i % len(tenants)] for i in range(args.queries)]
+
+        def shared_query(question, owner):
+            # Over-fetch until k of the tenant's own hits survive.
+            fetch = args.k * len(tenants)
+            hits = [h for h in shared.search_many(question, fetch)[0] if h[2]["source"] == owner]
+            return hits[:args.k]
+
+        shared_ms = [timed(shared_query, q, o) for q, o in zip(questions, owners)]
+        unfiltered_ms = [timed(shared.search_many, q, args.k) for q in questions]
+        for name in tenants[:args.max_loaded]:
+            pool.get(name)
+        warm_ms = [
+            timed(lambda q, o: pool.get(o).search_many(q, args.k), q, o)
+            for q, o in zip(questions, owners)
+            if o in tenants[:args.max_loaded]
+        ]
+        cold_ms = [timed(pool.get, name) for name in tenants[args.max_loaded:]]
+
+        print(
+            f"{args.tenants} tenants x {args.chunks} chunks, top-{args.k}, "
+            f"{args.max_loaded} shards kept loaded"
+        )
+        print(f"{'shared index':>22}: p50 {statistics.median(shared_ms):7.3f} ms/query")
+        print(
+            f"{'(no tenant filter)':>22}: p50 {statistics.median(unfiltered_ms):7.3f} ms/query"
+        )
+        print(f"{'own shard (loaded)':>22}: p50 {statistics.median(warm_ms):7.3f} ms/query")
+        print(f"{'open unloaded shard':>22}: p50 {statistics.median(cold_ms):7.3f} ms")
+        print(f"pool: {pool.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
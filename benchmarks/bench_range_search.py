@@ -0,0 +1,73 @@
+"""
+Benchmark: how many hits survive the similarity threshold, before and after
+switching to cosine scores.
+
+"before" replays the previous scoring (top-k L2 over raw embeddings,
+``1 / (1 + distance)``, filtered afterwards); "after" is the store's range
+search over unit vectors with the threshold applied inside FAISS.
+
+Usage:
+    python -m benchmarks.bench_range_search [--chunks 20000] [--queries 1000] [--threshold 0.6]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from core.embeddings import EmbeddingGenerator
+from core.vectorstore import FAISSVectorStore
+from benchmarks.synthetic import make_text, make_words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    embeddings = EmbeddingGenerator()
+    vectors = embeddings.embed_texts([make_text(60, seed=i) for i in range(args.chunks)])
+    questions = embeddings.embed_texts(
+        [" ".join(make_words(10, seed=10**6 + i)) + "?" for i in range(args.queries)]
+    )
+
+    legacy = faiss.IndexFlatL2(embeddings.dimension)
+    legacy.add(vectors)
+    start = time.perf_counter()
+    distances, _ = legacy.search(questions, args.k)
+    legacy_time = time.perf_counter() - start
+    legacy_scores = 1.0 / (1.0 + distances)
+    kept = (legacy_scores >= args.threshold).sum(axis=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FAISSVectorStore(
+            Path(tmp) / "index.faiss", Path(tmp) / "metadata", index_type="flat"
+        )
+        store.add(vectors, [{"text": "", "source": "bench"} for _ in range(args.chunks)])
+        start = time.perf_counter()
+        results = store.range_search_many(questions, args.threshold, max_results=args.k)
+        range_time = time.perf_counter() - start
+        best = [hits[0][1] for hits in store.search_many(questions, 1)]
+    hits = np.array([len(r) for r in results])
+
+    print(f"{args.chunks} chunks, {args.queries} questions, threshold {args.threshold}")
+    for label, counts, top, seconds in (
+        ("L2 top-k, 1/(1+d)", kept, legacy_scores[:, 0], legacy_time),
+        ("cosine range search", hits, best, range_time),
+    ):
+        print(
+            f"{label:>20}: best score p5/p50/p95 "
+            f"{' / '.join(f'{p:.4f}' for p in np.percentile(top, [5, 50, 95]))}, "
+            f"{counts.mean():5.2f} hits/question (cap {args.k}), "
+            f"{(counts > 0).mean():6.1%} with context, "
+            f"{seconds / args.queries * 1000:.3f} ms/question"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: question throughput, one retrieve() per question vs. retrieve_many().
+
+Usage:
+    python -m benchmarks.bench_retrieval [--chunks 20000] [--queries 10000] [--batch 1000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from config import Config
+from benchmarks.bench_ingestion import isolated_retriever
+from benchmarks.synthetic import make_text, make_words
+
+
+def populate(retriever, chunks: int, memories: int, batch: int = 5000):
+    for first in range(0, chunks, batch):
+        retriever.add_pdf_documents(
+            [
+                {"text": make_text(60, seed=i), "metadata": {"source": f"doc_{i // 100}.pdf"}}
+                for i in range(first, min(chunks, first + batch))
+            ]
+        )
+    for i in range(memories):
+        retriever.add_memory(f"Q: {' '.join(make_words(8, seed=-i))}\nA: answer", str(i))
+    retriever.pdf_store.save()
+    retriever.memory_store.save()
+
+
+def hits(metadata):
+    return [(m["type"], m.get("vector_id"), m.get("timestamp")) for m in metadata]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--memories", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=1_000)
+    args = parser.parse_args()
+
+    questions = [" ".join(make_words(10, seed=10**6 + i)) + "?" for i in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        retriever = isolated_retriever(Path(tmp))
+        populate(retriever, args.chunks, args.memories)
+        print(
+            f"{args.chunks} PDF chunks ({retriever.pdf_store.index_kind}), "
+            f"{args.memories} memories, {args.queries} questions"
+        )
+
+        for hybrid in (False, True):
+            Config.ENABLE_HYBRID_SEARCH = hybrid
+            label = "vector + BM25" if hybrid else "vector only"
+
+            start = time.perf_counter()
+            looped = [retriever.retrieve(q) for q in questions]
+            loop_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            batched = []
+            for i in range(0, len(questions), args.batch):
+                batched.extend(retriever.retrieve_many(questions[i:i + args.batch]))
+            batch_time = time.perf_counter() - start
+
+            # Batched FAISS distances can differ in the last float bits.
+            same = sum(hits(a) == hits(b) for (_, a), (_, b) in zip(looped, batched))
+            print(
+                f"{label:>14}: loop {args.queries / loop_time:8.0f} q/s   "
+                f"retrieve_many {args.queries / batch_time:8.0f} q/s   "
+                f"({loop_time / batch_time:.1f}x, same hits for {same / args.queries:.2%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
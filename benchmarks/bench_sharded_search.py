@@ -0,0 +1,89 @@
+"""
+Benchmark: single-query latency of one FAISS store vs. the sharded store
+searching its shards in parallel.
+
+FAISS runs one query on one core, so a single store cannot use more; the
+sharded store's fan-out can, up to one core per shard. Expect a speedup
+close to min(shards, cores) on large corpora, and none on one core.
+
+Usage:
+    python -m benchmarks.bench_sharded_search [--vectors 100000] [--shards 2 4 8] [--queries 200]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from core.sharded_store import ShardedVectorStore
+from core.vectorstore import FAISSVectorStore
+
+
+def latency_ms(store, questions, k: int) -> float:
+    timings = []
+    for question in questions:
+        start = time.perf_counter()
+        store.search_many(question, k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--documents", type=int, default=2_000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-type", default="flat")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, Config.EMBEDDING_DIMENSION), dtype=np.float32)
+    metadata = [
+        {"text": "", "source": f"doc_{i % args.documents}.pdf"} for i in range(args.vectors)
+    ]
+    questions = rng.standard_normal(
+        (args.queries, 1, Config.EMBEDDING_DIMENSION), dtype=np.float32
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        single = FAISSVectorStore(
+            tmp / "single.faiss", tmp / "single_metadata", index_type=args.index_type
+        )
+        single.add(vectors, metadata)
+        single.save()
+        baseline = latency_ms(single, questions, args.k)
+        print(
+            f"{args.vectors} vectors ({single.index_kind}), {os.cpu_count()} CPU cores, "
+            f"top-{args.k}, single-query latency p50"
+        )
+        print(f"{'1 store':>10}: {baseline:8.3f} ms")
+
+        for shards in args.shards:
+            sharded = ShardedVectorStore(
+                tmp / f"shards_{shards}", num_shards=shards,
+                index_type=args.index_type, import_from=single,
+            )
+            same = sum(
+                [h[2]["vector_id"] for h in a] == [h[2]["vector_id"] for h in b]
+                for a, b in zip(
+                    sharded.search_many(questions[:, 0], args.k),
+                    single.search_many(questions[:, 0], args.k),
+                )
+            )
+            latency = latency_ms(sharded, questions, args.k)
+            print(
+                f"{f'{shards} shards':>10}: {latency:8.3f} ms  ({baseline / latency:.2f}x, "
+                f"same top-{args.k} for {same / args.queries:.0%})"
+            )
+            sharded.close()
+
+
+if __name__ == "__main__":
+    main()
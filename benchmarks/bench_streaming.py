@@ -0,0 +1,61 @@
+"""
+Benchmark: time until the user sees text, blocking vs. streaming generation.
+
+Runs against the local fake endpoint, so the numbers reflect client-side
+overhead plus the configured server latency profile.
+
+Usage:
+    python -m benchmarks.bench_streaming [--requests 10] [--ttft 0.3] [--tokens 300]
+"""
+import argparse
+import statistics
+import time
+
+from config import Config
+from core.generator import GroqGenerator
+from benchmarks.fake_llm_server import FakeLLMServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=300)
+    args = parser.parse_args()
+
+    Config.LLM_MAX_TOKENS = args.tokens
+    with FakeLLMServer(args.ttft, args.token_delay, args.tokens) as server:
+        generator = GroqGenerator(api_key="fake", base_url=server.base_url)
+        generator.generate("warm up")
+
+        blocking = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            generator.generate("question")
+            blocking.append(time.perf_counter() - start)
+
+        first_text, totals, rates = [], [], []
+        for _ in range(args.requests):
+            stream = generator.stream("question")
+            for _ in stream:
+                pass
+            first_text.append(stream.metrics["ttft"])
+            totals.append(stream.metrics["total_time"])
+            rates.append(stream.metrics["tokens_per_sec"])
+        generator.close()
+
+    print(
+        f"{args.requests} requests, {args.tokens} tokens, server TTFT {args.ttft:.2f} s, "
+        f"{args.token_delay * 1000:.1f} ms/token"
+    )
+    print(f"{'blocking':>10}: first text after {statistics.median(blocking):6.3f} s")
+    print(
+        f"{'streaming':>10}: first text after {statistics.median(first_text):6.3f} s "
+        f"(complete after {statistics.median(totals):.3f} s, "
+        f"{statistics.median(rates):.0f} tokens/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: index memory, recall and latency of each vector encoding, with
+and without exact re-ranking from the vectors kept on disk.
+
+Recall@k is measured against exact float32 search. The corpus is clustered
+(like real embeddings), since quantizing uniform noise is unrepresentative.
+
+Usage:
+    python -m benchmarks.bench_vector_encoding [--vectors 50000] [--index-type flat] [--rerank-factor 4]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from core.vectorstore import ENCODINGS, FAISSVectorStore
+
+
+def clustered(rng, count: int, dimension: int, clusters: int = 200) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dimension), dtype=np.float32)
+    noise = rng.standard_normal((count, dimension), dtype=np.float32)
+    return centers[rng.integers(0, clusters, count)] + 0.6 * noise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--encodings", nargs="+", default=list(ENCODINGS))
+    parser.add_argument("--rerank-factor", type=int, default=Config.RERANK_FACTOR)
+    args = parser.parse_args()
+    Config.RERANK_FACTOR = args.rerank_factor
+
+    rng = np.random.default_rng(0)
+    dimension = Config.EMBEDDING_DIMENSION
+    vectors = clustered(rng, args.vectors, dimension)
+    questions = clustered(rng, args.queries, dimension)
+    metadata = [{"text": "", "source": f"doc_{i % 500}.pdf"} for i in range(args.vectors)]
+
+    units = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    query_units = questions / np.linalg.norm(questions, axis=1, keepdims=True)
+    truth = np.argsort(-(query_units @ units.T), axis=1)[:, :args.k]
+
+    print(
+        f"{args.vectors} x {dimension}-d vectors, {args.index_type}, top-{args.k}, "
+        f"rerank factor {Config.RERANK_FACTOR}"
+    )
+    print(
+        f"{'encoding':>9} {'rerank':>6} {'bytes/vec':>9} {'index MB':>9} "
+        f"{'disk MB':>8} {'recall':>7} {'p50 ms':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for encoding in args.encodings:
+            for rerank in (False, True):
+                name = f"{encoding}_{int(rerank)}"
+                store = FAISSVectorStore(
+                    tmp / f"{name}.faiss", tmp / f"{name}_metadata", dimension=dimension,
+                    index_type=args.index_type, encoding=encoding, rerank=rerank,
+                )
+                for start in range(0, args.vectors, 10_000):
+                    store.add(
+                        vectors[start:start + 10_000],
+                        [dict(meta) for meta in metadata[start:start + 10_000]],
+                    )
+                store.save()
+
+                timings, found = [], 0
+                for question, expected in zip(questions, truth):
+                    start = time.perf_counter()
+                    hits = store.search(question, args.k)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    # Ids were handed out in insertion order, starting at 0.
+                    found += len({hit[0] for hit in hits} & set(expected.tolist()))
+
+                stats = store.get_stats()
+                print(
+                    f"{stats['encoding']:>9} {str(rerank):>6} {stats['bytes_per_vector']:9.0f} "
+                    f"{stats['index_bytes'] / 2**20:9.1f} {stats['raw_vector_bytes'] / 2**20:8.1f} "
+                    f"{found / truth.size:7.3f} {statistics.median(timings):8.3f}"
+                )
+                store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: per-add persistence cost as the vector store grows.
+
+Compares the write-ahead log (``add`` appends a delta record) against the
+previous behaviour of rewriting the full snapshot after every add. Only the
+persistence step is timed: ``IndexFlat.add`` itself reallocates its code
+buffer on every call, which is an in-memory cost shared by both modes.
+
+Usage:
+    python -m benchmarks.bench_vectorstore_wal [--sizes 1000 10000 50000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from core.vectorstore import FAISSVectorStore
+
+
+def persist_ms_per_add(store: FAISSVectorStore, adds: int, full_save: bool) -> float:
+    rng = np.random.default_rng(0)
+    elapsed = 0.0
+    append_wal = store._append_wal
+
+    def timed_append(*args):
+        nonlocal elapsed
+        start = time.perf_counter()
+        append_wal(*args)
+        elapsed += time.perf_counter() - start
+
+    store._append_wal = timed_append
+    for i in range(adds):
+        vector = rng.random((1, store.dimension), dtype=np.float32)
+        store.add(vector, [{"text": f"Q: turn {i}\nA: answer", "source": "conversation"}])
+        if full_save:
+            start = time.perf_counter()
+            store.save()
+            elapsed += time.perf_counter() - start
+    store._append_wal = append_wal
+    return elapsed * 1000 / adds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--adds", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    dimension = Config.EMBEDDING_DIMENSION
+
+    print(f"{'vectors':>10} {'wal persist ms':>16} {'full-save ms':>14}")
+    for size in args.sizes:
+        results = []
+        for full_save in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                tmp = Path(tmp)
+                store = FAISSVectorStore(
+                    index_path=tmp / "index.faiss",
+                    metadata_path=tmp / "metadata.pkl",
+                    dimension=dimension,
+                )
+                store.add(
+                    rng.random((size, dimension), dtype=np.float32),
+                    [{"text": f"chunk {i}", "source": "bench.pdf"} for i in range(size)],
+                )
+                store.save()
+                Config.WAL_MAX_RECORDS = args.adds + 1  # keep compaction out of the timing
+                results.append(persist_ms_per_add(store, args.adds, full_save))
+                store.save()
+        print(f"{size:>10} {results[0]:>16.3f} {results[1]:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
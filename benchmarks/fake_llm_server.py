@@ -0,0 +1,253 @@
+"""
+Local stand-in for the Groq chat completions endpoint.
+
+Speaks the OpenAI-compatible protocol the Groq SDK uses, including
+server-sent-event streaming, with configurable latency, tail latency and
+injected errors so generation code can be exercised and timed without
+network access or an API key:
+
+    with FakeLLMServer(ttft=0.3, token_delay=0.01) as server:
+        generator = GroqGenerator(api_key="test", base_url=server.base_url)
+
+Usage (standalone, e.g. GROQ_BASE_URL=http://127.0.0.1:8765 streamlit run app.py):
+    python -m benchmarks.fake_llm_server [--port 8765] [--ttft 0.3] [--tokens 200]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import make_words
+
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+class FakeLLMServer:
+    """
+    Threaded HTTP server answering chat completions with synthetic text.
+
+    - ``ttft``: seconds before the first token (or the whole response)
+    - ``token_delay``: seconds between streamed tokens
+    - ``tokens``: completion length, capped by the request's ``max_tokens``
+    - ``slow_rate`` / ``slow_ttft``: fraction of requests that instead wait
+      ``slow_ttft`` before answering (tail latency)
+    - ``error_rate`` / ``error_status``: fraction of requests answered with
+      that HTTP error; ``failures`` lists statuses for the next requests
+    - ``retry_after``: ``Retry-After`` seconds sent with 429 responses
+    """
+
+    def __init__(
+        self,
+        ttft: float = 0.2,
+        token_delay: float = 0.01,
+        tokens: int = 200,
+        slow_rate: float = 0.0,
+        slow_ttft: float = 2.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        failures=(),
+        retry_after: float = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+    ):
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.slow_rate = slow_rate
+        self.slow_ttft = slow_ttft
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.failures = list(failures)
+        self.retry_after = retry_after
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(_CompletionsHandler):
+            owner = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def plan(self, body: dict):
+        """(error status or None, first-token delay, words) for one request."""
+        with self._lock:
+            self.requests += 1
+            seed = self.requests
+            if self.failures:
+                status = self.failures.pop(0)
+            elif self._rng.random() < self.error_rate:
+                status = self.error_status
+            else:
+                status = None
+            slow = self._rng.random() < self.slow_rate
+            if status is not None:
+                self.errors += 1
+        count = min(self.tokens, body.get("max_tokens") or self.tokens)
+        delay = self.slow_ttft if slow else self.ttft
+        return status, delay, make_words(count, seed=seed)
+
+
+class _CompletionsHandler(BaseHTTPRequestHandler):
+    owner: FakeLLMServer = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        try:
+            self._complete()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up, e.g. the losing half of a hedged request
+
+    def _complete(self):
+        if self.path != COMPLETIONS_PATH:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        status, delay, words = self.owner.plan(body)
+        model = body.get("model", "fake")
+
+        time.sleep(delay)
+        if status is not None:
+            headers = {}
+            if status == 429 and self.owner.retry_after is not None:
+                headers["Retry-After"] = str(self.owner.retry_after)
+            self._send_json(status, {"error": {"message": f"injected {status}"}}, headers)
+        elif body.get("stream"):
+            self._stream(words, model)
+        else:
+            # A blocking call only answers once every token is generated.
+            time.sleep(self.owner.token_delay * max(0, len(words) - 1))
+            self._send_json(200, _completion(" ".join(words), model, len(words)))
+
+    def _stream(self, words: list, model: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.owner.token_delay)
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            self._event(_chunk(delta, model, None))
+
+        final = _chunk({}, model, "stop")
+        final["x_groq"] = {"usage": _usage(len(words))}
+        self._event(final)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _event(self, payload: dict):
+        self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _usage(completion_tokens: int) -> dict:
+    return {
+        "prompt_tokens": 0,
+        "completion_tokens": completion_tokens,
+        "total_tokens": completion_tokens,
+    }
+
+
+def _completion(text: str, model: str, tokens: int) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": _usage(tokens),
+    }
+
+
+def _chunk(delta: dict, model: str, finish_reason) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        ttft=args.ttft,
+        token_delay=args.token_delay,
+        tokens=args.tokens,
+        slow_rate=args.slow_rate,
+        error_rate=args.error_rate,
+        port=args.port,
+    )
+    print(f"Fake LLM endpoint on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Benchmark suite: times every pipeline stage on synthetic corpora and checks
+the results against a stored baseline.
+
+Stages: PDF loading, chunking, embedding, vector store add / search / save /
+load, retrieval, and answering end to end with ``GroqGenerator`` pointed at
+the local fake endpoint (no network, zero server latency, so only our side
+is timed). Every metric is in milliseconds, lower is better, and is the
+median over ``--repeat`` runs (per-query metrics: the median query).
+
+Results go to ``benchmarks/results/<size>-<commit>.json`` with the commit
+and environment. Against ``benchmarks/baselines/<size>.json``, a metric
+slower by more than ``--threshold`` (and ``--min-delta-ms``) is a
+regression, and the exit status is 1. Baselines are only comparable on
+similar hardware; refresh one with ``--update-baseline``.
+
+Usage:
+    python -m benchmarks.suite [--size small] [--stages loader chunker ...] [--threshold 0.25]
+    python -m benchmarks.suite --size small --update-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from config import Config
+from core.chunker import STRATEGIES, SemanticChunker
+from core.context_packer import ContextPacker
+from core.embeddings import EmbeddingGenerator
+from core.generator import GroqGenerator
+from core.guardrails import HallucinationGuardrails
+from core.loader import PDFLoader
+from core.vectorstore import FAISSVectorStore
+from benchmarks.bench_ingestion import isolated_retriever
+from benchmarks.fake_llm_server import FakeLLMServer
+from benchmarks.synthetic import make_document, make_words, write_corpus
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# pdfs x pages: PDF corpus; words: text corpus, in documents of
+# document_words; queries: searches / retrievals; answers: end-to-end runs
+SIZES = {
+    "small": {
+        "pdfs": 4, "pages": 10, "words": 200_000, "document_words": 5_000,
+        "queries": 200, "answers": 30,
+    },
+    "medium": {
+        "pdfs": 20, "pages": 25, "words": 1_000_000, "document_words": 5_000,
+        "queries": 500, "answers": 100,
+    },
+    "large": {
+        "pdfs": 50, "pages": 50, "words": 5_000_000, "document_words": 10_000,
+        "queries": 1_000, "answers": 200,
+    },
+}
+STAGES = ("loader", "chunker", "embeddings", "vectorstore", "retriever", "answer")
+
+
+def elapsed_ms(function: Callable, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def median_ms(function: Callable, repeat: int) -> float:
+    return statistics.median(elapsed_ms(function) for _ in range(repeat))
+
+
+def per_item_ms(function: Callable, items) -> float:
+    """Median time of ``function(item)`` over ``items``, after one warm-up call."""
+    items = list(items)
+    function(items[0])
+    return statistics.median(elapsed_ms(function, item) for item in items)
+
+
+class Corpus:
+    """Synthetic inputs shared by the stages, built once per run."""
+
+    def __init__(self, directory: Path, size: dict):
+        self.size = size
+        self.pdfs = write_corpus(directory / "pdfs", size["pdfs"], size["pages"])
+        self.documents = [
+            make_document(size["document_words"], seed=i)
+            for i in range(max(1, size["words"] // size["document_words"]))
+        ]
+        self.questions = [
+            " ".join(make_words(10, seed=10**6 + i)) + "?" for i in range(size["queries"])
+        ]
+        chunker = SemanticChunker()
+        self.chunks = [
+            {"text": text, "metadata": meta}
+            for i, document in enumerate(self.documents)
+            for text, meta in chunker.iter_chunks(document, {"source": f"doc_{i}.pdf"})
+        ]
+
+
+# ----------------------------------------------------------------------
+# STAGES
+# ----------------------------------------------------------------------
+
+def bench_loader(corpus: Corpus, directory: Path, repeat: int) -> Dict[str, float]:
+    loader = PDFLoader()
+    return {
+        "loader.load_pdf_ms": statistics.median(
+            median_ms(lambda: loader.load_pdf(str(path)), repeat) for path in corpus.pdfs
+        ),
+    }
+
+
+def bench_chunker(corpus: Corpus, directory: Path, repeat: int) -> Dict[str, float]:
+    metrics = {}
+    for strategy in STRATEGIES:
+        chunker = SemanticChunker(strategy=strategy)
+        metrics[f"chunker.chunk_{strategy}_ms"] = median_ms(
+            lambda: [chunker.chunk(document, {"source": "doc.pdf"}) for document in corpus.documents],
+            repeat,
+        )
+    return metrics
+
+
+def bench_embeddings(corpus: Corpus, directory: Path, repeat: int) -> Dict[str, float]:
+    embeddings = EmbeddingGenerator()
+    texts = [chunk["text"] for chunk in corpus.chunks]
+    return {
+        "embeddings.embed_texts_ms": median_ms(lambda: embeddings.embed_texts(texts), repeat),
+        "embeddings.embed_query_ms": per_item_ms(embeddings.embed_query, corpus.questions),
+    }
+
+
+def bench_vectorstore(corpus: Corpus, directory: Path, repeat: int) -> Dict[str, float]:
+    embeddings = EmbeddingGenerator()
+    vectors = embeddings.embed_texts([chunk["text"] for chunk in corpus.chunks])
+    metadata = [dict(chunk["metadata"], text=chunk["text"]) for chunk in corpus.chunks]
+    questions = embeddings.embed_texts(corpus.questions)
+    batch = Config.INGEST_BATCH_SIZE
+
+    runs = []
+    for run in range(repeat):
+        paths = (directory / f"store_{run}.faiss", directory / f"store_{run}_metadata")
+        store = FAISSVectorStore(*paths)
+
+        def add():
+            for start in range(0, len(vectors), batch):
+                store.add(vectors[start:start + batch], metadata[start:start + batch])
+
+        timings = {"vectorstore.add_ms": elapsed_ms(add)}
+        timings["vectorstore.save_ms"] = elapsed_ms(store.save)
+        timings["vectorstore.search_ms"] = per_item_ms(
+            lambda question: store.search(question, Config.TOP_K_RETRIEVAL), questions
+        )
+        store.close()
+        timings["vectorstore.load_index_ms"] = elapsed_ms(lambda: FAISSVectorStore(*paths).close())
+        runs.append(timings)
+    return {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+
+
+def indexed_retriever(corpus: Corpus, directory: Path):
+    retriever = isolated_retriever(directory)
+    retriever.add_pdf_documents(corpus.chunks)
+    for i, question in enumerate(corpus.questions[:corpus.size["answers"]]):
+        retriever.add_memory(f"Q: {question}\nA: {' '.join(make_words(30, seed=-i))}", str(i))
+    retriever.pdf_store.save()
+    retriever.memory_store.save()
+    return retriever
+
+
+def bench_retriever(corpus: Corpus, directory: Path, repeat: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    retriever = indexed_retriever(corpus, directory / "retriever")
+    index_ms = (time.perf_counter() - start) * 1000
+    search_ms = statistics.median(
+        per_item_ms(
+            lambda question: retriever.retrieve(question, top_k_pdf=Config.TOP_K_RETRIEVAL),
+            corpus.questions,
+        )
+        for _ in range(repeat)
+    )
+    retriever.close()
+    return {"retriever.index_ms": index_ms, "retriever.retrieve_ms": search_ms}
+
+
+def bench_answer(corpus: Corpus, directory: Path, repeat: int) -> Dict[str, float]:
+    retriever = indexed_retriever(corpus, directory / "answer")
+    packer, guardrails = ContextPacker(), HallucinationGuardrails(Config.SIMILARITY_THRESHOLD)
+    questions = corpus.questions[:corpus.size["answers"]]
+
+    with FakeLLMServer(ttft=0.0, token_delay=0.0, tokens=Config.LLM_MAX_TOKENS // 4) as server:
+        generator = GroqGenerator(api_key="benchmark", base_url=server.base_url)
+
+        def answer(question: str) -> str:
+            texts, metadata = retriever.retrieve(question, top_k_pdf=Config.TOP_K_RETRIEVAL)
+            context, _ = packer.pack(texts, metadata)
+            return generator.generate(guardrails.generate_safe_prompt(question, context))
+
+        metrics = {
+            "answer.generate_ms": statistics.median(
+                per_item_ms(generator.generate, questions) for _ in range(repeat)
+            ),
+            "answer.end_to_end_ms": statistics.median(
+                per_item_ms(answer, questions) for _ in range(repeat)
+            ),
+        }
+        generator.close()
+    retriever.close()
+    return metrics
+
+
+BENCHMARKS = {
+    "loader": bench_loader,
+    "chunker": bench_chunker,
+    "embeddings": bench_embeddings,
+    "vectorstore": bench_vectorstore,
+    "retriever": bench_retriever,
+    "answer": bench_answer,
+}
+
+
+# ----------------------------------------------------------------------
+# RESULTS & BASELINES
+# ----------------------------------------------------------------------
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=Config.PROJECT_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=Config.PROJECT_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": faiss.__version__,
+    }
+
+
+def compare(
+    metrics: Dict[str, float], baseline: Dict[str, float], threshold: float, min_delta_ms: float
+) -> List[str]:
+    """Print current vs. baseline per metric; returns the regressed metric names."""
+    regressions = []
+    print(f"{'metric':<34} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, value in metrics.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<34} {'-':>10} {value:10.3f} {'new':>8}")
+            continue
+        change = value / before - 1 if before else 0.0
+        regressed = change > threshold and value - before > min_delta_ms
+        if regressed:
+            regressions.append(name)
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<34} {before:10.3f} {value:10.3f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="results JSON (default: benchmarks/results/)")
+    parser.add_argument("--baseline", type=Path, help="default: benchmarks/baselines/<size>.json")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore smaller slowdowns")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    size = SIZES[args.size]
+    commit = git_commit()
+    metrics: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        corpus = Corpus(tmp, size)
+        print(
+            f"{args.size}: {size['pdfs']} PDFs x {size['pages']} pages, "
+            f"{len(corpus.documents)} documents ({len(corpus.chunks)} chunks), "
+            f"{size['queries']} queries, {args.repeat} runs"
+        )
+        for stage in args.stages:
+            directory = tmp / stage
+            directory.mkdir()
+            start = time.perf_counter()
+            metrics.update(BENCHMARKS[stage](corpus, directory, args.repeat))
+            print(f"  {stage} done in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    results = {
+        "size": args.size,
+        "parameters": size,
+        "repeat": args.repeat,
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "metrics": {name: round(value, 4) for name, value in metrics.items()},
+    }
+    output = args.output or RESULTS_DIR / f"{args.size}-{(commit or 'unknown')[:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+
+    baseline_path = args.baseline or BASELINES_DIR / f"{args.size}.json"
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        compare(results["metrics"], {}, args.threshold, args.min_delta_ms)
+        print(f"No baseline at {baseline_path}; results in {output}")
+        return
+
+    baseline = json.loads(baseline_path.read_text())
+    if baseline.get("environment", {}).get("cpus") != results["environment"]["cpus"]:
+        print("⚠️ Baseline was recorded on different hardware; expect differences")
+    regressions = compare(
+        results["metrics"], baseline["metrics"], args.threshold, args.min_delta_ms
+    )
+    print(f"Results in {output} (baseline: {baseline.get('commit')})")
+    if regressions:
+        print(f"❌ {len(regressions)} metric(s) slower than baseline by > {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
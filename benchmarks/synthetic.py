@@ -0,0 +1,117 @@
+"""
+Synthetic corpora for benchmarks: word streams and minimal text PDFs.
+"""
+import random
+from pathlib import Path
+from typing import List
+
+VOCABULARY = (
+    "assessment retrieval grounded clause section policy document vector index "
+    "candidate evaluation criteria score rubric response question answer context "
+    "memory threshold embedding latency throughput compliance audit report annex "
+    "article paragraph schedule appendix obligation party agreement term notice"
+).split()
+
+
+def make_words(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+
+def make_text(words: int, seed: int = 0, sentence_length: int = 18) -> str:
+    """Plain text with sentences and blank-line paragraphs."""
+    tokens = make_words(words, seed)
+    sentences = []
+    for i in range(0, len(tokens), sentence_length):
+        sentence = " ".join(tokens[i:i + sentence_length])
+        sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+    paragraphs = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return "\n\n".join(paragraphs)
+
+
+def make_pages(pages: int, words_per_page: int = 400, seed: int = 0) -> List[str]:
+    return [make_text(words_per_page, seed=seed * 100003 + i) for i in range(pages)]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, pages: List[str], line_words: int = 12) -> Path:
+    """
+    Write a minimal single-font PDF with one text page per entry.
+
+    Only what PyPDF2 needs to extract text: catalog, page tree, Helvetica
+    and one content stream per page, plus a correct xref table.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for text in pages:
+        words = text.split()
+        lines = [" ".join(words[i:i + line_words]) for i in range(0, len(words), line_words)]
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        ops += [f"({_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref
+    )
+
+    path = Path(path)
+    path.write_bytes(bytes(out))
+    return path
+
+
+def write_corpus(directory: Path, files: int, pages: int, words_per_page: int = 400) -> List[Path]:
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    return [
+        write_pdf(directory / f"doc_{i:04d}.pdf", make_pages(pages, words_per_page, seed=i))
+        for i in range(files)
+    ]
+
+
+def make_document(words: int, seed: int = 0) -> str:
+    """
+    Structured text: numbered section headings, paragraphs of 2-8
+    sentences of 6-40 words.
+    """
+    rng = random.Random(seed)
+    tokens = make_words(words, seed)
+    blocks, position, section = [], 0, 0
+    while position < len(tokens):
+        if section == 0 or rng.random() < 0.25:
+            section += 1
+            blocks.append(f"{section}. {rng.choice(VOCABULARY).title()} {rng.choice(VOCABULARY)}")
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            length = rng.randint(6, 40)
+            sentence = " ".join(tokens[position:position + length])
+            position += length
+            if sentence:
+                sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+        blocks.append(" ".join(sentences))
+    return "\n\n".join(blocks)
@@ -16,6 +16,7 @@ class Config:
     # ------------------------------------------------------------------
 
     GROQ_API_KEY: Optional[str] = None
+    GROQ_BASE_URL: Optional[str] = None  # None = Groq cloud; set for a local endpoint
     GEMINI_API_KEY: Optional[str] = None
 
     # ------------------------------------------------------------------
@@ -34,11 +35,83 @@ class Config:
     # ------------------------------------------------------------------
 
     FAISS_INDEX_PATH = VECTORS_DIR / "pdf_index.faiss"
-    FAISS_METADATA_PATH = VECTORS_DIR / "pdf_metadata.pkl"
+    FAISS_METADATA_PATH = VECTORS_DIR / "pdf_metadata"
 
     MEMORY_INDEX_PATH = MEMORY_DIR / "memory_index.faiss"
-    MEMORY_METADATA_PATH = MEMORY_DIR / "memory_metadata.pkl"
+    MEMORY_METADATA_PATH = MEMORY_DIR / "memory_metadata"
+    # Append-only conversation log (SQLite, WAL), partitioned by session;
+    # the older single-file JSON store is imported from MEMORY_STORE_PATH once
+    MEMORY_LOG_PATH = MEMORY_DIR / "conversations.sqlite3"
     MEMORY_STORE_PATH = MEMORY_DIR / "conversations.json"
+    DEFAULT_SESSION = "default"
+
+    # Named collections (own PDF + memory indexes each) and per-user memory
+    # namespaces are separate shards, opened on first use; past this many
+    # open ones, the least recently used is unloaded
+    COLLECTIONS_DIR = DATA_DIR / "collections"
+    MEMORY_NAMESPACES_DIR = MEMORY_DIR / "namespaces"
+    MAX_LOADED_SHARDS = 16
+    # A memory namespace nothing was written to for this long is deleted
+    # (checked at most hourly, on memory adds); None keeps them all
+    MEMORY_NAMESPACE_IDLE_DAYS = 90
+
+    # Open FAISS indexes memory-mapped (copied into RAM on first write)
+    MMAP_INDEX = True
+
+    # Content-hash registry of indexed PDFs; re-uploads are skipped or
+    # replace the earlier copy ("skip" | "replace")
+    DOCUMENT_REGISTRY_DIR = VECTORS_DIR / "registry"
+    DUPLICATE_POLICY = "skip"
+
+    # PDF corpus split by document hash across this many FAISS indexes
+    # (core/sharded_store.py); 1 keeps the single FAISS_INDEX_PATH store
+    # (an already sharded corpus stays sharded). A
+    # shard past SHARD_MAX_VECTORS is split in two. Searches use one thread
+    # per shard unless SHARD_SEARCH_WORKERS caps them.
+    PDF_SHARDS = 1
+    PDF_SHARDS_DIR = VECTORS_DIR / "pdf_shards"
+    SHARD_MAX_VECTORS = 2_000_000
+    SHARD_SEARCH_WORKERS = None
+
+    # Vector store write-ahead log: compact into a snapshot past either limit
+    WAL_MAX_RECORDS = 500
+    WAL_MAX_BYTES = 64 * 1024 * 1024
+    # Deleted vectors are only tombstoned; the index is rebuilt without them
+    # once this fraction of it is dead
+    TOMBSTONE_COMPACT_RATIO = 0.2
+
+    # ------------------------------------------------------------------
+    # ANN INDEX
+    # ------------------------------------------------------------------
+
+    # flat | ivf_flat | hnsw | ivf_pq | auto (pick by corpus size)
+    INDEX_TYPE = "auto"
+    ANN_AUTO_IVF_THRESHOLD = 20_000  # auto: flat -> ivf_flat
+    ANN_AUTO_PQ_THRESHOLD = 1_000_000  # auto: ivf_flat -> ivf_pq
+    ANN_MIN_TRAIN_SIZE = 2_000  # IVF types stay flat until this many vectors
+    # Retrain IVF / PQ once the corpus would call for this many times the
+    # lists it was trained with (nlist ~ 4 * sqrt(n): 2 means ~4x the vectors),
+    # or for more PQ bits
+    ANN_RETRAIN_GROWTH = 2
+
+    IVF_NPROBE = 16
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 80
+    HNSW_EF_SEARCH = 64
+    PQ_M = 64  # sub-quantizers; must divide the embedding dimension
+    PQ_NBITS = 8
+
+    # How flat / hnsw / ivf_flat indexes store vectors: float32 | fp16 |
+    # int8 (scalar quantized, 2x / 4x smaller) | pq (PQ_M bytes; ivf_flat
+    # becomes ivf_pq, hnsw uses int8). int8 and pq train first, so stay
+    # float32 until ANN_MIN_TRAIN_SIZE (pq: 39 * 2**PQ_NBITS) vectors.
+    VECTOR_ENCODING = "float32"
+    # Keep exact vectors on disk (memory-mapped) and re-score compressed
+    # results with them: top-k from k * RERANK_FACTOR candidates, range
+    # searches from threshold - RERANK_MARGIN
+    RERANK_EXACT = False
+    RERANK_FACTOR = 4
+    RERANK_MARGIN = 0.05
 
     # ------------------------------------------------------------------
     # EMBEDDINGS (Gemini)
@@ -47,6 +120,11 @@ class Config:
     EMBEDDING_MODEL = "models/embedding-001"
     EMBEDDING_DIMENSION = 768
 
+    ENABLE_EMBEDDING_CACHE = True
+    EMBEDDING_CACHE_SIZE = 10000  # in-memory LRU entries
+    EMBEDDING_CACHE_DIR = VECTORS_DIR / "embedding_cache"
+    EMBEDDING_CACHE_DISK_ENTRIES = 100_000  # disk rows; compacted to half past this
+
     # ------------------------------------------------------------------
     # LLM (Groq)
     # ------------------------------------------------------------------
@@ -55,6 +133,26 @@ class Config:
     LLM_TEMPERATURE = 0.3
     LLM_MAX_TOKENS = 1024
 
+    # Client (core/generator.py): pooled connections, bounded concurrency,
+    # jittered exponential backoff on retryable errors, hedged requests
+    LLM_POOL_SIZE = 20
+    LLM_MAX_CONCURRENCY = 8
+    LLM_TIMEOUT = 60.0
+    LLM_MAX_RETRIES = 3
+    LLM_BACKOFF_BASE = 0.5  # seconds; doubles per attempt
+    LLM_BACKOFF_MAX = 8.0
+    LLM_HEDGE = True
+    LLM_HEDGE_QUANTILE = 0.95  # hedge once a request is slower than this
+    LLM_HEDGE_MIN_SAMPLES = 20  # latencies needed before hedging starts
+
+    # Answer cache (core/answer_cache.py): keyed on the normalized query and
+    # the retrieved PDF chunk ids; any PDF index change invalidates it
+    ENABLE_ANSWER_CACHE = True
+    ANSWER_CACHE_SIZE = 1000  # in-memory LRU entries
+    ANSWER_CACHE_DISK_SIZE = 50_000  # persistent entries
+    ANSWER_CACHE_TTL = 24 * 60 * 60  # seconds
+    ANSWER_CACHE_PATH = VECTORS_DIR / "answer_cache.sqlite3"
+
     # ------------------------------------------------------------------
     # RAG SETTINGS
     # ------------------------------------------------------------------
@@ -62,10 +160,55 @@ class Config:
     CHUNK_SIZE = 200
     CHUNK_OVERLAP = 50
 
-    SIMILARITY_THRESHOLD = 0.6
+    # Chunking (core/chunker.py): "fixed" CHUNK_SIZE-word windows overlapping
+    # by CHUNK_OVERLAP words, or "adaptive" chunks ending on heading,
+    # paragraph or sentence boundaries, CHUNK_MIN_WORDS..CHUNK_MAX_WORDS
+    # long and overlapping by whole sentences (none across paragraphs)
+    CHUNK_STRATEGY = "fixed"
+    CHUNK_MIN_WORDS = 100
+    CHUNK_MAX_WORDS = 250
+    CHUNK_OVERLAP_SENTENCES = 1
+
+    # Parallel ingestion (core/ingest.py); None workers = one per CPU core
+    INGEST_WORKERS = None
+    INGEST_PAGES_PER_TASK = 16
+    INGEST_BATCH_SIZE = 1024  # chunks per embed / store commit
+    INGEST_QUEUE_SIZE = 8
+
+    SIMILARITY_THRESHOLD = 0.6  # cosine similarity, applied inside the FAISS search
     TOP_K_RETRIEVAL = 5
     MEMORY_TOP_K = 3
 
+    # Memory vector retention (core/memory_retention.py): evicted turns are
+    # rolled up into summary vectors; None disables the TTL / session cap
+    MEMORY_MAX_VECTORS = 2000  # turns + summaries
+    MEMORY_MAX_SUMMARIES = 200
+    MEMORY_SESSION_MAX_TURNS = 500
+    MEMORY_TTL_DAYS = 90
+    MEMORY_ROLLUP_TURNS = 20  # turns per summary
+    MEMORY_SUMMARY_TOKENS = 300
+    MEMORY_RETENTION_INTERVAL = 50  # added turns between retention passes
+
+    # Prompt context (core/context_packer.py): overlapping chunks merged,
+    # best passages first, capped at this many (estimated) tokens
+    CONTEXT_TOKEN_BUDGET = 3000
+    CONTEXT_MIN_PASSAGE_TOKENS = 50  # shorter leftovers are dropped, not cut
+
+    # Hybrid retrieval: BM25 over chunk text (core/lexical_index.py) fused
+    # with vector hits by reciprocal rank fusion
+    ENABLE_HYBRID_SEARCH = True
+    HYBRID_CANDIDATES = 20  # hits taken from each ranking before fusion
+    RRF_K = 60
+    BM25_INDEX_DIR = VECTORS_DIR / "pdf_lexical"
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    BM25_FLUSH_DOCS = 50_000  # buffered chunks written as a segment
+    BM25_MAX_SEGMENTS = 8  # smallest segments are merged past this
+    BM25_MAX_POSTINGS = 1024  # strongest postings scored per query term
+    # Keyword-only hits skip SIMILARITY_THRESHOLD; this BM25 floor gates them
+    # instead (0 lets every keyword match through)
+    BM25_MIN_SCORE = 1.0
+
     # ------------------------------------------------------------------
     # GUARDRAILS
     # ------------------------------------------------------------------
@@ -84,6 +227,8 @@ class Config:
             or st.secrets.get("GROQ_API_KEY", "").strip()
         )
 
+        cls.GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "").strip() or None
+
         cls.GEMINI_API_KEY = (
             os.getenv("GEMINI_API_KEY", "").strip()
             or st.secrets.get("GEMINI_API_KEY", "").strip()
@@ -0,0 +1,238 @@
+"""
+Answer cache (in-memory LRU + SQLite tier) in front of the LLM generator.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from config import Config
+from core.generator import GenerationStream, GroqGenerator
+from core.utils import ensure_dir
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, spacing and trailing punctuation do not change the question."""
+    return _WHITESPACE.sub(" ", query).strip().rstrip("?!.").strip().lower()
+
+
+class AnswerCache:
+    """
+    Two-tier cache of generated answers.
+
+    A key covers everything the answer depends on: the normalized query,
+    the ids of the retrieved PDF chunks (stable and never reused, so they
+    pin the chunk text), the memory namespace and ids of the retrieved
+    memory vectors (so one user's conversation never answers another's)
+    and the model. Entries also
+    carry the PDF index ``version`` they were generated under; once the
+    index changes, ``sync_version`` drops every older entry.
+
+    - memory: LRU of ``max_entries`` answers
+    - disk: SQLite table (WAL mode, shared by processes), capped at
+      ``disk_entries`` rows
+    - both tiers expire entries ``ttl`` seconds after they were written
+    """
+
+    def __init__(
+        self,
+        path: Path = None,
+        max_entries: int = Config.ANSWER_CACHE_SIZE,
+        disk_entries: int = Config.ANSWER_CACHE_DISK_SIZE,
+        ttl: float = Config.ANSWER_CACHE_TTL,
+    ):
+        self.path = path or Config.ANSWER_CACHE_PATH
+        self.max_entries = max_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+
+        # key -> (answer, seconds it took to generate, created, version)
+        self._memory: "OrderedDict[str, Tuple[str, float, float, str]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+        ensure_dir(self.path.parent)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, answer TEXT NOT NULL, latency REAL NOT NULL,"
+            " created REAL NOT NULL, version TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_created ON answers (created)")
+        self._db.commit()
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def make_key(
+        query: str,
+        chunk_ids: Iterable[int],
+        model: str = None,
+        memory_ids: Iterable[int] = (),
+        namespace: str = None,
+    ) -> str:
+        ids = ",".join(str(i) for i in sorted(set(chunk_ids)))
+        memory = ",".join(str(i) for i in sorted(set(memory_ids)))
+        payload = (
+            f"{model or Config.LLM_MODEL}\0{normalize_query(query)}\0{ids}"
+            f"\0{namespace or ''}\0{memory}"
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def sync_version(self, version: str):
+        """Forget answers generated against any other index version."""
+        with self._lock:
+            if version == self._version:
+                return
+            self._version = version
+            for key in [k for k, e in self._memory.items() if e[3] != version]:
+                del self._memory[key]
+            self._db.execute("DELETE FROM answers WHERE version != ?", (version,))
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            now = time.time()
+            entry = self._memory.get(key)
+            from_disk = False
+            if entry is None:
+                row = self._db.execute(
+                    "SELECT answer, latency, created, version FROM answers WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                entry, from_disk = (tuple(row) if row else None), True
+
+            if entry is not None and (
+                now - entry[2] > self.ttl
+                or (self._version is not None and entry[3] != self._version)
+            ):
+                self._forget(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._remember(key, entry)
+            self.hits += 1
+            self.disk_hits += from_disk
+            self.saved_seconds += entry[1]
+            return entry[0]
+
+    def put(self, key: str, answer: str, latency: float):
+        """Store ``answer``, which took ``latency`` seconds to generate."""
+        with self._lock:
+            entry = (answer, latency, time.time(), self._version or "")
+            self._remember(key, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)", (key, *entry)
+            )
+            self._prune(entry[2])
+            self._db.commit()
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key: str):
+        self._memory.pop(key, None)
+        self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+        self._db.commit()
+
+    def _prune(self, now: float):
+        self._db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM answers WHERE key IN ("
+            " SELECT key FROM answers ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.disk_entries,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+
+class CachedGenerator:
+    """
+    GroqGenerator front-end that answers from ``AnswerCache`` when it can.
+
+    Callers pass the ``cache_key`` from ``AnswerCache.make_key``; without
+    one, requests go straight to the generator.
+    """
+
+    def __init__(self, generator: GroqGenerator = None, cache: AnswerCache = None):
+        self.generator = generator or GroqGenerator()
+        self.cache = cache or AnswerCache()
+
+    def generate(self, prompt: str, cache_key: str = None) -> str:
+        if cache_key is not None:
+            answer = self.cache.get(cache_key)
+            if answer is not None:
+                return answer
+
+        start = time.perf_counter()
+        answer = self.generator.generate(prompt)
+        if cache_key is not None:
+            self.cache.put(cache_key, answer, time.perf_counter() - start)
+        return answer
+
+    def stream(self, prompt: str, cache_key: str = None) -> GenerationStream:
+        """
+        Like ``GroqGenerator.stream``; a cached answer arrives as one delta
+        and the returned stream has ``cached`` set.
+        """
+        if cache_key is not None:
+            answer = self.cache.get(cache_key)
+            if answer is not None:
+                stream = GenerationStream(iter([(answer, None)]))
+                stream.cached = True
+                return stream
+
+        stream = self.generator.stream(prompt)
+        if cache_key is not None:
+
+            def store(done: GenerationStream):
+                if done.completed and done.text.strip():
+                    self.cache.put(cache_key, done.text.strip(), done.metrics["total_time"])
+
+            stream.add_done_callback(store)
+        return stream
+
+    def close(self):
+        self.generator.close()
+
+    def get_stats(self) -> dict:
+        stats = self.generator.get_stats()
+        stats["answer_cache"] = self.cache.get_stats()
+        return stats
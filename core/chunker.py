@@ -2,22 +2,87 @@
 Semantic text chunking for RAG.
 """
 
-from typing import List, Tuple
+import math
+import re
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
 from config import Config
 
+STRATEGIES = ("fixed", "adaptive")
+
+# Structure boundaries for adaptive chunking, found in one scan: heading
+# lines (markdown, numbered "2.1 Scope", ALL CAPS), blank-line paragraph
+# breaks and sentence ends (. ! ? then a capitalized word). Every branch
+# starts with "\n" or . ! ?, so the regex engine skips other characters
+# without trying the branches.
+_HEADING = (
+    r"[ \t]*(?:"
+    r"\#{1,6}[ \t]+[^\n]+"
+    r"|(?:\d+(?:\.\d+)*\.?|[IVX]+\.)[ \t]+[A-Z][^\n.!?]{0,80}"
+    r"|[A-Z][A-Z0-9 \t,:;&/'()-]{2,80}"
+    r")[ \t]*$"
+)
+_HEADING_LINE = re.compile(_HEADING, re.MULTILINE)
+_BOUNDARY = re.compile(
+    r"\n(?:(?P<heading>" + _HEADING + r")|(?=[ \t]*\n))"
+    r"|[.!?][\"')\]]*(?=\s+[\"'(\[]?[A-Z0-9])",
+    re.MULTILINE,
+)
+
+# Strength of the break before a segment; chunks end at the strongest
+# break in their size range. A heading is glued to what follows it.
+_GLUED, _SENTENCE, _PARAGRAPH, _SECTION = 0, 1, 2, 3
+
+
+@lru_cache(maxsize=None)
+def _word_runs(words: int) -> "re.Pattern":
+    """
+    Regex matching runs of up to ``words`` words (non-whitespace, as with
+    str.split()). Scanning whole runs keeps per-word work inside the regex
+    engine; only the last run of a text can be short.
+    """
+    return re.compile(r"\S+(?:\s+\S+){0,%d}" % (words - 1))
+
 
 class SemanticChunker:
     """
     Splits text into overlapping chunks suitable for embedding & retrieval.
+
+    Word boundaries are found in one regex scan; each chunk is a slice of
+    the source text (original whitespace kept), located by ``char_start`` /
+    ``char_end`` besides its word span ``chunk_start`` / ``chunk_end``.
+    The offsets point into the text given here; the retriever still stores
+    each chunk's text, since the extracted PDF text is not kept.
+
+    ``strategy="adaptive"`` instead ends chunks on heading, paragraph or
+    sentence boundaries: each holds ``min_words`` to ``max_words`` words
+    (sentences over ``chunk_size`` words are cut up) and repeats the last
+    ``overlap_sentences`` sentences of the previous chunk, unless a
+    paragraph or section starts fresh.
     """
 
     def __init__(
         self,
         chunk_size: int = Config.CHUNK_SIZE,
         overlap: int = Config.CHUNK_OVERLAP,
+        strategy: str = Config.CHUNK_STRATEGY,
+        min_words: int = Config.CHUNK_MIN_WORDS,
+        max_words: int = Config.CHUNK_MAX_WORDS,
+        overlap_sentences: int = Config.CHUNK_OVERLAP_SENTENCES,
     ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown chunking strategy: {strategy}")
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.strategy = strategy
+        self.min_words = min_words
+        self.max_words = max_words
+        self.overlap_sentences = overlap_sentences
 
     def chunk(self, text: str, metadata: dict) -> List[Tuple[str, dict]]:
         """
@@ -26,30 +91,353 @@ class SemanticChunker:
         Returns:
             List of (chunk_text, metadata)
         """
-        if not text or not text.strip():
-            return []
+        return list(self.iter_chunks(text, metadata))
 
-        words = text.split()
-        chunks = []
+    def iter_chunks(self, text: str, metadata: dict) -> Iterator[Tuple[str, dict]]:
+        """
+        Lazy ``chunk``: yields each (chunk_text, metadata) as its window fills.
 
-        start = 0
-        chunk_id = 0
+        Only the offsets of the current window are held, so memory does not
+        grow with the document (adaptive chunking keeps one offset per
+        sentence).
+        """
+        if self.strategy == "adaptive":
+            windows, _ = _adaptive_windows(text or "", 0, 0, _SECTION, self, final=True)
+            for chunk_id, (char_start, char_end, word_start, words) in enumerate(windows):
+                meta = metadata.copy()
+                meta["chunk_id"] = chunk_id
+                meta["chunk_start"] = word_start
+                meta["chunk_end"] = word_start + words
+                meta["char_start"] = char_start
+                meta["char_end"] = char_end
+                yield text[char_start:char_end], meta
+            return
 
-        while start < len(words):
-            end = start + self.chunk_size
-            chunk_words = words[start:end]
+        step = self.chunk_size - self.overlap
+        # Windows start every ``step`` words and span ``chunk_size``, so
+        # both are whole numbers of ``run``-word runs.
+        run = math.gcd(self.chunk_size, step)
+        size, stride = self.chunk_size // run, step // run
+        spans: Deque[Tuple[int, int]] = deque()
+        chunk_id = 0
 
-            chunk_text = " ".join(chunk_words).strip()
-            if chunk_text:
+        def windows(final: bool):
+            nonlocal chunk_id
+            for first, last in _windows(spans, size, stride, final):
                 meta = metadata.copy()
                 meta["chunk_id"] = chunk_id
-                meta["chunk_start"] = start
-                meta["chunk_end"] = end
-
-                chunks.append((chunk_text, meta))
+                meta["chunk_start"] = chunk_id * step
+                meta["chunk_end"] = chunk_id * step + self.chunk_size
+                meta["char_start"] = first[0]
+                meta["char_end"] = last[1]
                 chunk_id += 1
+                yield text[first[0]:last[1]], meta
+
+        for match in _word_runs(run).finditer(text or ""):
+            spans.append(match.span())
+            if len(spans) == size:
+                yield from windows(final=False)
+        yield from windows(final=True)
+
+    def chunk_pages(
+        self, pages: Iterable[Tuple[int, str]], metadata: dict
+    ) -> Iterator[Tuple[str, dict]]:
+        """
+        Chunk a stream of (page_number, text) without joining the pages.
+
+        Produces the same windows as ``chunk`` over the pages joined with
+        newlines, plus ``page_start`` / ``page_end`` for the pages each
+        chunk spans. Only the current window and the incoming page are held
+        in memory.
+        """
+        stream = self.stream(metadata)
+        for page_number, text in pages:
+            yield from stream.feed(page_number, text)
+        yield from stream.close()
+
+    def stream(self, metadata: dict) -> "ChunkStream":
+        """Push-style counterpart of chunk_pages for pipelined callers."""
+        if self.strategy == "adaptive":
+            return AdaptiveChunkStream(self, metadata)
+        return ChunkStream(self.chunk_size, self.overlap, metadata)
+
+
+class ChunkStream:
+    """
+    Incremental windowing state for one document.
+
+    ``feed`` returns every window that is complete after adding a page;
+    ``close`` returns the trailing partial windows. Character offsets are
+    into the pages joined with newlines.
+    """
+
+    def __init__(self, chunk_size: int, overlap: int, metadata: dict):
+        self.chunk_size = chunk_size
+        self.step = chunk_size - overlap
+        self.metadata = metadata
+
+        self._run = math.gcd(chunk_size, self.step)
+        self._pattern = _word_runs(self._run)
+
+        self._text = ""  # document text from self._base on
+        self._base = 0
+        self._length = 0  # characters fed so far, page separators included
+        self._scanned = 0  # document offset the next regex scan starts at
+        # Document offset and number of each page still in self._text
+        self._page_starts: List[int] = []
+        self._page_numbers: List[Optional[int]] = []
+        # Document (char_start, char_end) of each word run from the next window on
+        self._spans: Deque[Tuple[int, int]] = deque()
+        self._chunk_id = 0
+
+    def feed(self, page_number: Optional[int], text: str) -> List[Tuple[str, dict]]:
+        if self._page_starts:
+            text = "\n" + text
+        self._page_starts.append(self._length)
+        self._page_numbers.append(page_number)
+        self._length += len(text)
+        self._text += text
+        self._scan(final=False)
+        return self._drain(final=False)
+
+    def close(self) -> List[Tuple[str, dict]]:
+        self._scan(final=True)
+        return self._drain(final=True)
+
+    def _scan(self, final: bool):
+        spans = [
+            match.span()
+            for match in self._pattern.finditer(self._text, self._scanned - self._base)
+        ]
+        self._scanned = self._length
+        # A short last run may go on with the next page's words.
+        if spans and not final:
+            start, end = spans[-1]
+            if len(self._text[start:end].split()) < self._run:
+                spans.pop()
+                self._scanned = self._base + start
+        self._spans.extend((self._base + start, self._base + end) for start, end in spans)
 
-            start += self.chunk_size - self.overlap
+    def _page_at(self, offset: int) -> Optional[int]:
+        return self._page_numbers[bisect_right(self._page_starts, offset) - 1]
 
+    def _drain(self, final: bool) -> List[Tuple[str, dict]]:
+        chunks = []
+        size, stride = self.chunk_size // self._run, self.step // self._run
+        for first, last in _windows(self._spans, size, stride, final):
+            start = self._chunk_id * self.step
+            meta = self.metadata.copy()
+            meta["chunk_id"] = self._chunk_id
+            meta["chunk_start"] = start
+            meta["chunk_end"] = start + self.chunk_size
+            meta["char_start"] = first[0]
+            meta["char_end"] = last[1]
+            meta["page_start"] = self._page_at(first[0])
+            meta["page_end"] = self._page_at(last[1] - 1)
+
+            chunks.append((self._text[first[0] - self._base:last[1] - self._base], meta))
+            self._chunk_id += 1
+
+        # Keep text (and pages) only from the first word still to be chunked.
+        keep = self._spans[0][0] if self._spans else self._scanned
+        self._text = self._text[keep - self._base:]
+        self._base = keep
+        pages = bisect_right(self._page_starts, keep) - 1
+        if pages > 0:
+            del self._page_starts[:pages]
+            del self._page_numbers[:pages]
+
+        return chunks
+
+
+def _windows(
+    spans: Deque[tuple], size: int, step: int, final: bool
+) -> Iterator[Tuple[tuple, tuple]]:
+    """
+    Pop windows off a deque of spans; yields the (first, last) span of each.
+
+    Only full windows are taken unless ``final``, when the trailing partial
+    ones are too (one per ``step`` spans left, like slicing a word list).
+    """
+    while spans and (final or len(spans) >= size):
+        yield spans[0], spans[min(size, len(spans)) - 1]
+        for _ in range(min(step, len(spans))):
+            spans.popleft()
+
+
+class AdaptiveChunkStream:
+    """
+    ``ChunkStream`` for adaptive chunking.
+
+    Pages are buffered until the next chunk's whole size range has been
+    seen, so chunks match ``SemanticChunker.chunk`` over the joined pages;
+    only text from the next chunk on is kept.
+    """
+
+    def __init__(self, chunker: SemanticChunker, metadata: dict):
+        self.chunker = chunker
+        self.metadata = metadata
+
+        self._text = ""  # document text from self._base on
+        self._base = 0
+        self._length = 0
+        self._resume = (0, 0, _SECTION)  # (char offset, word, break) of the next chunk
+        self._page_starts: List[int] = []
+        self._page_numbers: List[Optional[int]] = []
+        self._chunk_id = 0
+
+    def feed(self, page_number: Optional[int], text: str) -> List[Tuple[str, dict]]:
+        if self._page_starts:
+            text = "\n" + text
+        self._page_starts.append(self._length)
+        self._page_numbers.append(page_number)
+        self._length += len(text)
+        self._text += text
+        return self._drain(final=False)
+
+    def close(self) -> List[Tuple[str, dict]]:
+        return self._drain(final=True)
+
+    def _page_at(self, offset: int) -> Optional[int]:
+        return self._page_numbers[bisect_right(self._page_starts, offset) - 1]
+
+    def _drain(self, final: bool) -> List[Tuple[str, dict]]:
+        offset, word, strength = self._resume
+        windows, resume = _adaptive_windows(
+            self._text, offset - self._base, word, strength, self.chunker, final
+        )
+        chunks = []
+        for char_start, char_end, word_start, words in windows:
+            start, end = self._base + char_start, self._base + char_end
+            meta = self.metadata.copy()
+            meta["chunk_id"] = self._chunk_id
+            meta["chunk_start"] = word_start
+            meta["chunk_end"] = word_start + words
+            meta["char_start"] = start
+            meta["char_end"] = end
+            meta["page_start"] = self._page_at(start)
+            meta["page_end"] = self._page_at(end - 1)
+            chunks.append((self._text[char_start:char_end], meta))
+            self._chunk_id += 1
+
+        if resume is not None:
+            offset, word, strength = resume
+            self._resume = (self._base + offset, word, strength)
+            # From the start of its line, so heading lines are still recognized.
+            keep = self._text.rfind("\n", 0, offset) + 1
+            self._text = self._text[keep:]
+            self._base += keep
+            pages = bisect_right(self._page_starts, self._base) - 1
+            if pages > 0:
+                del self._page_starts[:pages]
+                del self._page_numbers[:pages]
         return chunks
 
+
+def _segments(text: str, pos: int, lead: int, piece_words: int):
+    """
+    Split ``text[pos:]`` at structure boundaries.
+
+    Returns numpy arrays (char_start, char_end, words, break before) per
+    segment, trimmed to its first and last word. ``lead`` is the break
+    before the first segment. Longer sentences are cut into
+    ``piece_words``-word pieces (the same ones when resumed at a piece).
+    """
+    cuts = [(pos, lead)]
+    scan = pos
+    # Boundaries start at a newline, so a heading line that ``pos`` starts
+    # (or resumes inside) is matched from the start of its line.
+    line = text.rfind("\n", 0, pos) + 1
+    heading = _HEADING_LINE.match(text, line)
+    if heading and heading.end() > pos:
+        scan = heading.end()
+        cuts.append((scan, _GLUED))
+    for match in _BOUNDARY.finditer(text, scan):
+        if match.group("heading"):
+            cuts.append((match.start(), _SECTION))
+            cuts.append((match.end(), _GLUED))
+        elif match.group().startswith("\n"):
+            cuts.append((match.start(), _PARAGRAPH))
+        else:
+            cuts.append((match.end(), _SENTENCE))
+    cuts.append((len(text), _SECTION))
+
+    starts, ends, counts, breaks = [], [], [], []
+    pending = _GLUED
+    for (start, strength), (end, _) in zip(cuts, cuts[1:]):
+        pending = max(pending, strength)
+        segment = text[start:end]
+        words = len(segment.split())
+        if not words:
+            continue
+        if words > piece_words:
+            for piece in _word_runs(piece_words).finditer(text, start, end):
+                starts.append(piece.start())
+                ends.append(piece.end())
+                counts.append(len(piece.group().split()))
+                breaks.append(pending)
+                pending = _SENTENCE
+        else:
+            starts.append(start + len(segment) - len(segment.lstrip()))
+            ends.append(end - len(segment) + len(segment.rstrip()))
+            counts.append(words)
+            breaks.append(pending)
+        pending = _GLUED
+    return (
+        np.asarray(starts, dtype=np.int64),
+        np.asarray(ends, dtype=np.int64),
+        np.asarray(counts, dtype=np.int64),
+        np.asarray(breaks, dtype=np.int8),
+    )
+
+
+def _adaptive_windows(
+    text: str, pos: int, word: int, lead: int, chunker: SemanticChunker, final: bool
+):
+    """
+    Adaptive chunks of ``text[pos:]``, whose first word is document word ``word``.
+
+    Returns ([(char_start, char_end, first word, words)], resume). Unless
+    ``final``, chunking stops where a chunk's size range would reach the
+    last (possibly incomplete) segment; ``resume`` is then the (char
+    offset, word, break) to continue from, else None.
+    """
+    max_words = max(chunker.max_words, 1)
+    min_words = min(chunker.min_words, max_words)
+    starts, ends, counts, breaks = _segments(
+        text, pos, lead, max(min(chunker.chunk_size, max_words), 1)
+    )
+    total = len(counts)
+    # before[i]: words ahead of segment i; a chunk of segments i..e-1 ends
+    # at the break before segment e (the end of the text is a hard break).
+    before = np.concatenate(([0], np.cumsum(counts)))
+    strength = np.append(breaks, _SECTION)
+    limit = total if final else total - 1
+
+    windows = []
+    i = 0
+    while i < limit:
+        if not final and before[i] + max_words > before[limit]:
+            break
+        lo = max(int(np.searchsorted(before, before[i] + min_words)), i + 1)
+        hi = max(int(np.searchsorted(before, before[i] + max_words, side="right")) - 1, i + 1)
+        hi = min(hi, limit if final else total)
+        lo = min(lo, hi)
+        # Strongest break in range, the latest of equals (fewer chunks).
+        candidates = strength[lo:hi + 1]
+        end = hi - int(np.argmax(candidates[::-1]))
+        windows.append((
+            int(starts[i]), int(ends[end - 1]), word + int(before[i]),
+            int(before[end] - before[i]),
+        ))
+
+        following = end
+        if strength[end] == _SENTENCE:
+            following = max(end - chunker.overlap_sentences, i + 1)
+            while following > i + 1 and strength[following] == _GLUED:
+                following -= 1  # never start between a heading and its text
+        i = following
+
+    if final or i >= total:
+        return windows, None
+    return windows, (int(starts[i]), word + int(before[i]), int(breaks[i]))
@@ -0,0 +1,156 @@
+"""
+Token-budgeted prompt context from retrieved chunks.
+"""
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+
+SEPARATOR = "\n---\n"
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Fast local estimate of LLM tokens.
+
+    Every punctuation mark is a token and words cost one token per four
+    characters, which tracks BPE tokenizers (Llama 3, GPT) on English prose
+    closely enough for budgeting.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _PIECE.findall(text))
+
+
+class ContextPacker:
+    """
+    Assemble the context for ``generate_safe_prompt`` within a token budget.
+
+    - PDF chunks from the same document whose word spans (``chunk_start``
+      plus their word count) overlap or touch become one passage, so the
+      words chunk overlap repeats are sent once
+    - passages are ranked by their best chunk's retrieval rank and added
+      in that order until ``token_budget`` is spent; a passage that no
+      longer fits is cut at a word boundary when at least
+      ``Config.CONTEXT_MIN_PASSAGE_TOKENS`` remain, otherwise skipped
+
+    Shared by every session: ``get_stats`` reports per-request averages.
+    """
+
+    def __init__(self, token_budget: int = None):
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.raw_tokens = 0
+        self.packed_tokens = 0
+        self.prompt_tokens = 0
+
+    def pack(self, texts: List[str], metadata: List[dict]) -> Tuple[str, dict]:
+        """
+        Returns:
+            (context, stats): the joined passages and, for this request,
+            ``chunks``, ``passages``, ``raw_tokens`` (what joining every
+            chunk would have cost), ``tokens`` and ``dropped`` passages
+        """
+        passages = self._merge(texts, metadata)
+
+        parts: List[str] = []
+        used = 0
+        dropped = 0
+        separator_tokens = count_tokens(SEPARATOR)
+        for text in passages:
+            cost = count_tokens(text) + (separator_tokens if parts else 0)
+            remaining = self.token_budget - used
+            if cost > remaining:
+                text = self._cut(text, remaining - (separator_tokens if parts else 0))
+                if text is None:
+                    dropped += 1
+                    continue
+                cost = count_tokens(text) + (separator_tokens if parts else 0)
+            parts.append(text)
+            used += cost
+
+        context = SEPARATOR.join(parts)
+        stats = {
+            "chunks": len(texts),
+            "passages": len(parts),
+            "raw_tokens": count_tokens(SEPARATOR.join(texts)),
+            "tokens": count_tokens(context),
+            "dropped": dropped,
+        }
+        return context, stats
+
+    def record(self, stats: dict, prompt: str) -> int:
+        """Count one request; returns the prompt's token estimate."""
+        prompt_tokens = count_tokens(prompt)
+        with self._lock:
+            self.requests += 1
+            self.raw_tokens += stats["raw_tokens"]
+            self.packed_tokens += stats["tokens"]
+            self.prompt_tokens += prompt_tokens
+        return prompt_tokens
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _merge(texts: List[str], metadata: List[dict]) -> List[str]:
+        """Passages best first, with overlapping chunks of one document joined."""
+        # document -> [(chunk_start, rank, words)]
+        spans: Dict[str, List[Tuple[int, int, List[str]]]] = {}
+        # (rank, text) of finished passages
+        passages: List[Tuple[int, str]] = []
+        seen = set()
+
+        for rank, (text, meta) in enumerate(zip(texts, metadata)):
+            if text in seen:
+                continue
+            seen.add(text)
+            start = meta.get("chunk_start")
+            document = meta.get("document")
+            if meta.get("type") != "pdf" or start is None or document is None:
+                passages.append((rank, text))
+                continue
+            spans.setdefault(document, []).append((start, rank, text.split()))
+
+        for chunks in spans.values():
+            chunks.sort(key=lambda chunk: chunk[0])
+            start, rank, words = chunks[0]
+            for next_start, next_rank, next_words in chunks[1:]:
+                end = start + len(words)
+                if next_start <= end:
+                    words = words + next_words[end - next_start:]
+                    rank = min(rank, next_rank)
+                else:
+                    passages.append((rank, " ".join(words)))
+                    start, rank, words = next_start, next_rank, next_words
+            passages.append((rank, " ".join(words)))
+
+        passages.sort(key=lambda passage: passage[0])
+        return [text for _, text in passages]
+
+    @staticmethod
+    def _cut(text: str, budget: int) -> Optional[str]:
+        """Longest word prefix of ``text`` within ``budget`` tokens, if worth keeping."""
+        if budget < Config.CONTEXT_MIN_PASSAGE_TOKENS:
+            return None
+        words = text.split()
+        costs = np.cumsum([count_tokens(word) for word in words])
+        keep = int(np.searchsorted(costs, budget, side="right"))
+        return " ".join(words[:keep]) if keep else None
+
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            requests = self.requests or 1
+            return {
+                "requests": self.requests,
+                "avg_raw_tokens": self.raw_tokens / requests,
+                "avg_context_tokens": self.packed_tokens / requests,
+                "avg_prompt_tokens": self.prompt_tokens / requests,
+                "tokens_saved": self.raw_tokens - self.packed_tokens,
+            }
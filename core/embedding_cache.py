@@ -0,0 +1,332 @@
+"""
+Content-addressed embedding cache (in-memory LRU + memory-mapped disk tier).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from core.embeddings import EmbeddingGenerator
+from core.utils import ensure_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache mapping content hashes to embedding vectors.
+
+    Disk layout (append-only, under ``cache_dir``):
+    - ``vectors.f32``: raw float32 rows, read through ``np.memmap``
+    - ``keys.bin``: 32-byte SHA-256 digests, row ``i`` belongs to key ``i``
+    - ``generation``: which pair is current; compaction writes the pair
+      again as ``vectors.{n}.f32`` / ``keys.{n}.bin`` and bumps it
+
+    Past ``max_disk_entries`` rows the disk tier is compacted to the newest
+    half, recently used rows first. Appends and compaction hold an
+    exclusive lock on ``lock``, so several processes can share the cache;
+    each picks up the others' rows when it next writes.
+    """
+
+    KEY_SIZE = 32
+
+    def __init__(
+        self,
+        cache_dir: Path = None,
+        dimension: int = Config.EMBEDDING_DIMENSION,
+        max_entries: int = Config.EMBEDDING_CACHE_SIZE,
+        max_disk_entries: int = Config.EMBEDDING_CACHE_DISK_ENTRIES,
+    ):
+        self.cache_dir = cache_dir or Config.EMBEDDING_CACHE_DIR
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+
+        self.lock_path = self.cache_dir / "lock"
+        self.generation_path = self.cache_dir / "generation"
+        self._generation = 0
+        self.vectors_path, self.keys_path = self._files(0)
+
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._disk_rows: Dict[bytes, int] = {}
+        self._rows = 0  # complete rows of the current pair seen so far
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._load_index()
+
+    # ------------------------------------------------------------------
+
+    def _files(self, generation: int) -> Tuple[Path, Path]:
+        if generation == 0:
+            return self.cache_dir / "vectors.f32", self.cache_dir / "keys.bin"
+        return (
+            self.cache_dir / f"vectors.{generation}.f32",
+            self.cache_dir / f"keys.{generation}.bin",
+        )
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with other processes using ``cache_dir``."""
+        with open(self.lock_path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        ensure_dir(self.cache_dir)
+        with self._lock, self._file_lock():
+            self._sync()
+            # A torn append can leave one file longer than the other.
+            if self.keys_path.exists() and self.vectors_path.exists():
+                self._truncate(self._rows)
+
+    def _sync(self):
+        """
+        Catch up with the disk tier: rows appended since the last sync, or a
+        fresh index after another process compacted or cleared it. Called
+        under the file lock.
+        """
+        generation = 0
+        if self.generation_path.exists():
+            generation = int(self.generation_path.read_text())
+        if generation != self._generation:
+            self._generation = generation
+            self.vectors_path, self.keys_path = self._files(generation)
+            self._reset()
+
+        try:
+            key_bytes = self.keys_path.stat().st_size
+            vector_bytes = self.vectors_path.stat().st_size
+        except FileNotFoundError:
+            key_bytes = vector_bytes = 0
+        rows = min(key_bytes // self.KEY_SIZE, vector_bytes // (self.dimension * 4))
+        if rows < self._rows:  # removed behind our back
+            self._reset()
+        if rows == self._rows:
+            return
+
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._rows * self.KEY_SIZE)
+            keys = f.read((rows - self._rows) * self.KEY_SIZE)
+        for offset in range(0, len(keys), self.KEY_SIZE):
+            self._disk_rows[keys[offset:offset + self.KEY_SIZE]] = self._rows
+            self._rows += 1
+        self._map()
+
+    def _reset(self):
+        self._disk_rows.clear()
+        self._rows = 0
+        self._mmap = None
+
+    def _map(self):
+        """Map the current rows; the mapping outlives a later compaction."""
+        self._mmap = None
+        if self._rows:
+            self._mmap = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self._rows, self.dimension),
+            )
+
+    def _truncate(self, rows: int):
+        with open(self.keys_path, "r+b") as f:
+            f.truncate(rows * self.KEY_SIZE)
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(rows * self.dimension * 4)
+
+    def _disk_vector(self, row: int) -> np.ndarray:
+        return np.array(self._mmap[row])
+
+    def _compact(self):
+        """
+        Rewrite the disk tier as a new generation holding the newest
+        ``max_disk_entries // 2`` rows, those in the memory LRU counting as
+        newest. Called under the file lock.
+        """
+        keep = self.max_disk_entries // 2
+        ranked = dict.fromkeys(sorted(self._disk_rows, key=self._disk_rows.__getitem__))
+        for key in self._memory:  # least recently used first
+            if key in ranked:
+                del ranked[key]
+                ranked[key] = None
+        survivors = list(ranked)[len(ranked) - keep:] if keep else []
+        rows = np.fromiter(
+            (self._disk_rows[key] for key in survivors), dtype=np.int64, count=len(survivors)
+        )
+
+        generation = self._generation + 1
+        vectors_path, keys_path = self._files(generation)
+        with open(vectors_path, "wb") as f:
+            for first in range(0, len(rows), 65536):
+                f.write(np.ascontiguousarray(self._mmap[rows[first:first + 65536]]).tobytes())
+        with open(keys_path, "wb") as f:
+            f.write(b"".join(survivors))
+        self._set_generation(generation)
+
+        old = self._files(generation - 1)
+        self.vectors_path, self.keys_path = vectors_path, keys_path
+        self._disk_rows = {key: row for row, key in enumerate(survivors)}
+        self._rows = len(survivors)
+        self._map()
+        for path in old:
+            path.unlink(missing_ok=True)
+
+    def _set_generation(self, generation: int):
+        tmp = self.generation_path.with_suffix(".tmp")
+        tmp.write_text(str(generation))
+        os.replace(tmp, self.generation_path)
+        self._generation = generation
+
+    # ------------------------------------------------------------------
+
+    def make_key(self, text: str, model: str) -> bytes:
+        payload = f"{model}\0{self.dimension}\0{text}".encode("utf-8")
+        return hashlib.sha256(payload).digest()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            row = self._disk_rows.get(key)
+            if row is not None:
+                vector = self._disk_vector(row)
+                self._remember(key, vector)
+                self.hits += 1
+                self.disk_hits += 1
+                return vector
+
+            self.misses += 1
+            return None
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+
+            with self._file_lock():
+                self._sync()  # rows other processes added are not appended again
+                new_rows: Dict[bytes, np.ndarray] = {}
+                for key, vector in zip(keys, vectors):
+                    if key not in self._disk_rows:
+                        new_rows.setdefault(key, vector)
+                if not new_rows:
+                    return
+
+                block = np.ascontiguousarray(list(new_rows.values()), dtype=np.float32)
+                with open(self.vectors_path, "ab") as f:
+                    f.write(block.tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.write(b"".join(new_rows))
+                for key in new_rows:
+                    self._disk_rows[key] = self._rows
+                    self._rows += 1
+                self._map()
+
+                if self._rows > self.max_disk_entries:
+                    self._compact()
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock, self._file_lock():
+            self._memory.clear()
+            old = (self.vectors_path, self.keys_path)
+            # A new generation, so other processes drop their index too.
+            self._set_generation(self._generation + 1)
+            self.vectors_path, self.keys_path = self._files(self._generation)
+            self._reset()
+            for path in old:
+                path.unlink(missing_ok=True)
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk_rows),
+        }
+
+
+class CachedEmbeddingGenerator:
+    """EmbeddingGenerator front-end that only embeds texts it has not seen."""
+
+    def __init__(
+        self,
+        generator: EmbeddingGenerator = None,
+        cache: EmbeddingCache = None,
+        model: str = Config.EMBEDDING_MODEL,
+    ):
+        self.generator = generator or EmbeddingGenerator()
+        self.dimension = self.generator.dimension
+        self.model = model
+        self.cache = cache or EmbeddingCache(dimension=self.dimension)
+
+    def embed_text(self, text: str) -> Optional[np.ndarray]:
+        if not text or not text.strip():
+            return None
+        return self.embed_texts([text])[0]
+
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        return self.embed_text(query)
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        texts = [t for t in texts if t.strip()]
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return out
+
+        keys = [self.cache.make_key(t, self.model) for t in texts]
+        pending: Dict[bytes, List[int]] = {}
+        for i, key in enumerate(keys):
+            if key in pending:
+                pending[key].append(i)
+                continue
+            vector = self.cache.get(key)
+            if vector is None:
+                pending[key] = [i]
+            else:
+                out[i] = vector
+
+        if pending:
+            missing_keys = list(pending)
+            vectors = self.generator.embed_texts(
+                [texts[pending[k][0]] for k in missing_keys]
+            )
+            self.cache.put_many(missing_keys, vectors)
+            for key, vector in zip(missing_keys, vectors):
+                out[pending[key]] = vector
+
+        return out
+
+    def get_stats(self) -> dict:
+        return self.cache.get_stats()
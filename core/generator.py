@@ -1,34 +1,418 @@
 """
 Groq LLM response generator.
 """
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple
 
-from groq import Groq
+import groq
+import httpx
+from groq import AsyncGroq
 from config import Config
 
 
+SYSTEM_PROMPT = (
+    "You are an AI assistant answering strictly based on the provided document context. "
+    "If information is missing, answer conservatively."
+)
+
+# Status codes worth retrying besides 5xx: timeout, conflict, rate limit.
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMGenerationError(RuntimeError):
+    """The LLM did not produce an answer (after any retries)."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, groq.APIConnectionError):  # includes timeouts
+        return True
+    if isinstance(error, httpx.TransportError):  # raised while reading a stream
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+class LatencyWindow:
+    """Recent latencies, for picking the hedge delay."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class GenerationStream:
+    """
+    Iterator over the text deltas of one streamed completion.
+
+    Timing is measured from creation of the stream (just before the request
+    is sent); ``metrics`` is complete once iteration ends:
+
+    - ``ttft``: seconds until the first non-empty delta
+    - ``total_time``: seconds until the stream ended
+    - ``tokens``: completion tokens (server usage if reported, else deltas)
+    - ``tokens_per_sec``: tokens over the time spent after the first token
+
+    ``completed`` tells a stream that ran to its end from one cut short by an
+    error or by the caller; ``cached`` marks answers served from a cache.
+    """
+
+    def __init__(self, deltas: Iterator[Tuple[str, Optional[int]]], on_finish=None):
+        self._source = deltas
+        self._callbacks = [on_finish] if on_finish is not None else []
+        self._start = time.perf_counter()
+        self._first = None
+        self._count = 0
+        self._usage_tokens = None
+        self.parts: List[str] = []
+        self.metrics: Optional[dict] = None
+        self.completed = False
+        self.cached = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for delta, usage_tokens in self._source:
+                if usage_tokens is not None:
+                    self._usage_tokens = usage_tokens
+                if not delta:
+                    continue
+                if self._first is None:
+                    self._first = time.perf_counter()
+                self._count += 1
+                self.parts.append(delta)
+                yield delta
+            self.completed = True
+        finally:
+            close = getattr(self._source, "close", None)
+            if close is not None:
+                close()  # an abandoned stream frees its request now, not at GC
+            self._finish()
+
+    def add_done_callback(self, callback):
+        """Call ``callback(stream)`` once iteration ends, however it ends."""
+        self._callbacks.append(callback)
+
+    def _finish(self):
+        if self.metrics is not None:
+            return
+        end = time.perf_counter()
+        tokens = self._usage_tokens or self._count
+        ttft = (self._first - self._start) if self._first is not None else None
+        decode_time = end - self._first if self._first is not None else 0.0
+        self.metrics = {
+            "ttft": ttft,
+            "total_time": end - self._start,
+            "tokens": tokens,
+            "tokens_per_sec": tokens / decode_time if decode_time > 0 else 0.0,
+        }
+        for callback in self._callbacks:
+            callback(self)
+
+
 class GroqGenerator:
-    def __init__(self):
-        self.client = Groq(api_key=Config.GROQ_API_KEY)
+    """
+    asyncio-based Groq client shared by every session in the process.
+
+    - one pooled HTTP client (``Config.LLM_POOL_SIZE`` connections) and at
+      most ``Config.LLM_MAX_CONCURRENCY`` requests in flight; a stream
+      counts until it is closed
+    - retries with full-jitter exponential backoff, only for connection
+      errors, timeouts, 408/409/429 and 5xx (``Retry-After`` is honoured)
+    - optional hedging: if no answer (or, when streaming, no first token)
+      arrived after the recent ``Config.LLM_HEDGE_QUANTILE`` latency, a
+      duplicate request is sent and whichever finishes first wins
+
+    ``agenerate`` / ``astream`` are the async API and must all run on one
+    event loop. ``generate`` / ``stream`` are blocking wrappers for
+    synchronous callers such as Streamlit; they run on a private loop in a
+    background thread, so do not mix both styles on one instance.
+
+    Failures raise ``LLMGenerationError`` instead of returning text, so an
+    error message can never be mistaken for an answer.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None):
+        # base_url lets tests and benchmarks point at a local fake endpoint.
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Config.LLM_POOL_SIZE,
+                max_keepalive_connections=Config.LLM_POOL_SIZE,
+            ),
+            timeout=httpx.Timeout(Config.LLM_TIMEOUT, connect=10.0),
+        )
+        self.client = AsyncGroq(
+            api_key=api_key or Config.GROQ_API_KEY,
+            base_url=base_url or Config.GROQ_BASE_URL,
+            max_retries=0,  # retries are ours, so only retryable errors repeat
+            http_client=self.http_client,
+        )
+        self._semaphore = asyncio.Semaphore(Config.LLM_MAX_CONCURRENCY)
+        self._latency = LatencyWindow()
+        self._ttft = LatencyWindow()
+
+        self._recent = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.hedges = 0
+        self.failures = 0
+
+        self._loop = None
+        self._loop_thread = None
+
+    @staticmethod
+    def _messages(prompt: str) -> List[dict]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _request(self, prompt: str, stream: bool):
+        return self.client.chat.completions.create(
+            model=Config.LLM_MODEL,
+            messages=self._messages(prompt),
+            temperature=Config.LLM_TEMPERATURE,
+            max_tokens=Config.LLM_MAX_TOKENS,
+            stream=stream,
+        )
+
+    # ------------------------------------------------------------------
+    # ASYNC API
+    # ------------------------------------------------------------------
+
+    async def agenerate(self, prompt: str) -> str:
+        async def attempt():
+            start = time.perf_counter()
+            response = await self._with_retries(lambda: self._request(prompt, False))
+            self._latency.add(time.perf_counter() - start)
+            content = response.choices[0].message.content if response.choices else None
+            if content is None:
+                self.failures += 1
+                raise LLMGenerationError("LLM generation failed: response has no content")
+            return content.strip()
+
+        return await self._hedged(attempt, self._latency)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield text deltas as they are generated."""
+        async for delta, _ in self._astream_deltas(prompt):
+            if delta:
+                yield delta
+
+    async def _astream_deltas(self, prompt: str) -> AsyncIterator[Tuple[str, Optional[int]]]:
+        """(text delta, completion tokens if the chunk reports usage) pairs."""
+
+        async def open_stream():
+            # Read up to the first token here: hedging races on it, and an
+            # error before it is retried like a failed request.
+            response = await self._request(prompt, True)
+            try:
+                head, chunks = [], _stream_pairs(response)
+                async for pair in chunks:
+                    head.append(pair)
+                    if pair[0]:
+                        break
+            except BaseException:
+                await response.close()
+                raise
+            return head, chunks, response
+
+        async def attempt():
+            start = time.perf_counter()
+            result = await self._with_retries(open_stream, hold=True)
+            self._ttft.add(time.perf_counter() - start)
+            return result
+
+        async def discard(result):
+            await self._close_stream(result[2])
+
+        head, chunks, response = await self._hedged(attempt, self._ttft, discard)
+        try:
+            for pair in head:
+                yield pair
+            async for pair in chunks:
+                yield pair
+        except (groq.APIError, httpx.HTTPError) as e:
+            self.failures += 1
+            raise LLMGenerationError(f"LLM stream interrupted: {e}") from e
+        finally:
+            await self._close_stream(response)
+
+    async def _with_retries(self, call: Callable[[], Awaitable], hold: bool = False):
+        """
+        ``await call()`` with retries; each attempt holds a concurrency permit.
+
+        With ``hold``, the permit of the successful attempt is kept, since its
+        result is a stream still to be read; ``_close_stream`` gives it back.
+        """
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            await self._semaphore.acquire()
+            release = True
+            try:
+                result = await call()
+                release = not hold
+                return result
+            except Exception as e:
+                if attempt == Config.LLM_MAX_RETRIES or not is_retryable(e):
+                    self.failures += 1
+                    raise LLMGenerationError(f"LLM generation failed: {e}") from e
+                self.retries += 1
+                delay = self._backoff(attempt, e)
+            finally:
+                if release:
+                    self._semaphore.release()
+            await asyncio.sleep(delay)
+
+    async def _close_stream(self, response):
+        """Close a streamed response and release its concurrency permit."""
+        try:
+            await response.close()
+        finally:
+            self._semaphore.release()
+
+    @staticmethod
+    def _backoff(attempt: int, error: BaseException) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), Config.LLM_BACKOFF_MAX)
+            except ValueError:
+                pass
+        ceiling = min(Config.LLM_BACKOFF_MAX, Config.LLM_BACKOFF_BASE * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    async def _hedged(self, attempt, window: LatencyWindow, discard=None):
+        """Run ``attempt``; race a duplicate if it is slower than usual."""
+        delay = None
+        if Config.LLM_HEDGE and len(window) >= Config.LLM_HEDGE_MIN_SAMPLES:
+            delay = window.quantile(Config.LLM_HEDGE_QUANTILE)
+
+        first = asyncio.ensure_future(attempt())
+        if delay is None:
+            return await first
+
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(attempt()))
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                winners = [t for t in done if t.exception() is None]
+                error = error or next((t.exception() for t in done if t.exception()), None)
+                if winners:
+                    for extra in winners[1:]:
+                        if discard is not None:
+                            await discard(extra.result())
+                    return winners[0].result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # ------------------------------------------------------------------
+    # BLOCKING API
+    # ------------------------------------------------------------------
+
+    def _run(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="llm-client", daemon=True
+                )
+                self._loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
 
     def generate(self, prompt: str) -> str:
+        return self._run(self.agenerate(prompt))
+
+    def stream(self, prompt: str) -> GenerationStream:
+        """
+        Stream the answer as it is generated.
+
+        Yields text deltas; the returned ``GenerationStream`` also exposes the
+        full ``text`` and, once exhausted, per-request ``metrics``.
+        """
+        return GenerationStream(self._iterate(self._astream_deltas(prompt)), self._record)
+
+    def _iterate(self, agen) -> Iterator:
         try:
-            response = self.client.chat.completions.create(
-                model=Config.LLM_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an AI assistant answering strictly based on the provided document context. "
-                            "If information is missing, answer conservatively."
-                        ),
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=Config.LLM_TEMPERATURE,
-                max_tokens=Config.LLM_MAX_TOKENS,
+            while True:
+                try:
+                    yield self._run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._run(agen.aclose())
+
+    def close(self):
+        if self._loop is not None:
+            self._run(self.client.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+
+    # ------------------------------------------------------------------
+    # STATS
+    # ------------------------------------------------------------------
+
+    def _record(self, stream: GenerationStream):
+        if stream.metrics["ttft"] is None:
+            return
+        with self._lock:
+            self._recent.append(stream.metrics)
+
+    def get_stats(self) -> dict:
+        """Averages over the most recent streamed requests, plus counters."""
+        with self._lock:
+            recent = list(self._recent)
+        stats = {
+            "requests": len(recent),
+            "avg_ttft": 0.0,
+            "avg_tokens_per_sec": 0.0,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "failures": self.failures,
+        }
+        if recent:
+            stats["avg_ttft"] = sum(m["ttft"] for m in recent) / len(recent)
+            stats["avg_tokens_per_sec"] = (
+                sum(m["tokens_per_sec"] for m in recent) / len(recent)
             )
+        return stats
 
-            return response.choices[0].message.content.strip()
 
-        except Exception as e:
-            return f"LLM generation failed: {str(e)}"
+async def _stream_pairs(response) -> AsyncIterator[Tuple[str, Optional[int]]]:
+    async for chunk in response:
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        yield delta or "", usage.completion_tokens if usage else None
@@ -0,0 +1,282 @@
+"""
+Parallel multi-PDF ingestion pipeline.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import Config
+from core.chunker import SemanticChunker
+from core.loader import count_pages, extract_page_range
+from core.registry import file_sha256
+from core.retriever import UnifiedRetriever
+
+
+_DONE = object()
+
+
+class IngestionPipeline:
+    """
+    Ingest many PDFs with every stage running concurrently.
+
+    Stages, connected by bounded queues so a fast stage cannot run ahead
+    and hold the whole upload in memory:
+
+    1. extract: page ranges of every file fan out to a process pool
+    2. chunk: pages stream in order into a per-file ``ChunkStream``, so
+       chunks can span page boundaries without joining whole documents
+    3. embed: chunks are embedded in large vectorized batches
+    4. commit: batches are appended to the PDF store, with a single full
+       snapshot once everything is in
+    """
+
+    def __init__(
+        self,
+        chunker: SemanticChunker,
+        retriever: UnifiedRetriever,
+        workers: int = None,
+        pages_per_task: int = Config.INGEST_PAGES_PER_TASK,
+        batch_size: int = Config.INGEST_BATCH_SIZE,
+        queue_size: int = Config.INGEST_QUEUE_SIZE,
+    ):
+        self.chunker = chunker
+        self.retriever = retriever
+        self.workers = workers or Config.INGEST_WORKERS or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.skipped: List[str] = []
+        self.failed: Dict[str, str] = {}
+
+    # ------------------------------------------------------------------
+
+    def ingest(self, paths: List[Path], replace: bool = False) -> Dict[str, Optional[int]]:
+        """
+        Index every PDF in ``paths``.
+
+        With ``replace``, a file whose name is already indexed is treated as
+        a new version: the old version's vectors are removed once the new
+        one is indexed, and kept if it fails or has no text.
+
+        Files whose bytes are already indexed are handled according to
+        ``Config.DUPLICATE_POLICY``: "skip" leaves them out (their names are
+        listed in ``self.skipped``), "replace" removes the old copy first.
+
+        A file with a page range that fails to extract is rolled back as a
+        whole (any old version is kept) and its error is recorded in
+        ``self.failed``.
+
+        Returns:
+            filename -> chunks indexed, or None if it failed or no text was
+            extracted
+        """
+        registry = self.retriever.registry
+        results: Dict[str, Optional[int]] = {}
+        hashes: Dict[str, str] = {}
+        replaced: List[str] = []
+        self.skipped = []
+        self.failed = {}
+
+        pending = []
+        for path in (Path(p) for p in paths):
+            doc_hash = file_sha256(path)
+            known = registry.get(doc_hash)
+            if doc_hash in hashes.values():
+                self.skipped.append(path.name)  # same file twice in one upload
+                continue
+            if known is not None:
+                if Config.DUPLICATE_POLICY != "replace":
+                    self.skipped.append(path.name)
+                    results[path.name] = len(known["ids"])
+                    continue
+                self.retriever.remove_document_hash(doc_hash)
+            if replace:
+                replaced.append(path.name)
+            registry.register(doc_hash, path.name, path.stat().st_size)
+            hashes[path.name] = doc_hash
+            results[path.name] = None
+            pending.append(path)
+        paths = pending
+        self._hashes = hashes
+
+        errors: List[BaseException] = []
+
+        text_queue = queue.Queue(maxsize=self.queue_size)
+        chunk_queue = queue.Queue(maxsize=self.queue_size)
+        embed_queue = queue.Queue(maxsize=self.queue_size)
+
+        stages = [
+            threading.Thread(target=self._stage, args=(self._extract, paths, text_queue, errors)),
+            threading.Thread(target=self._stage, args=(self._chunk, text_queue, chunk_queue, errors)),
+            threading.Thread(target=self._stage, args=(self._embed, chunk_queue, embed_queue, errors)),
+        ]
+        for stage in stages:
+            stage.daemon = True
+            stage.start()
+
+        while True:
+            item = embed_queue.get()
+            if item is _DONE:
+                break
+            if errors:
+                continue  # keep draining so upstream stages can exit
+            embeddings, metadata_list = item
+            if self.failed:
+                keep = [i for i, meta in enumerate(metadata_list) if meta["source"] not in self.failed]
+                embeddings, metadata_list = embeddings[keep], [metadata_list[i] for i in keep]
+                if not metadata_list:
+                    continue
+            try:
+                self.retriever.add_embedded_documents(embeddings, metadata_list)
+            except BaseException as e:
+                errors.append(e)
+                continue
+            for meta in metadata_list:
+                results[meta["source"]] = (results[meta["source"]] or 0) + 1
+
+        for stage in stages:
+            stage.join()
+
+        if errors:
+            # Drop partially indexed files too, so a retry indexes them again.
+            for doc_hash in hashes.values():
+                self.retriever.remove_document_hash(doc_hash)
+            raise errors[0]
+        for name, doc_hash in hashes.items():
+            if name in self.failed:
+                # Chunks already committed before the failure go too: a
+                # partial copy would be skipped as a duplicate on re-upload.
+                self.retriever.remove_document_hash(doc_hash)
+                results[name] = None
+            elif results[name] is None:
+                registry.unregister(doc_hash)
+        for name in replaced:
+            if results[name] is not None:
+                self.retriever.remove_document(name, keep=hashes[name])
+
+        self.retriever.pdf_store.save()
+        registry.save()
+        self.retriever.lexical.save()
+        return results
+
+    # ------------------------------------------------------------------
+    # STAGES
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _stage(target, source, sink: queue.Queue, errors: List[BaseException]):
+        try:
+            target(source, sink, errors)
+        except BaseException as e:
+            errors.append(e)
+            if isinstance(source, queue.Queue):
+                while source.get() is not _DONE:
+                    pass
+        finally:
+            sink.put(_DONE)
+
+    def _extract(self, paths: List[Path], sink: queue.Queue, errors: List[BaseException]):
+        tasks = []
+        expected: Dict[str, int] = {}
+        for path in paths:
+            pages = count_pages(path)
+            ranges = range(0, pages, self.pages_per_task)
+            expected[path.name] = len(ranges)
+            tasks.extend((path, start) for start in ranges)
+
+        # Completed ranges wait here until every earlier range of the same
+        # file has been forwarded, so pages reach the chunker in order.
+        received: Dict[str, Dict[int, list]] = {name: {} for name in expected}
+        next_range: Dict[str, int] = {name: 0 for name in expected}
+
+        def forward(name: str):
+            ready = received[name]
+            while next_range[name] in ready:
+                sink.put((name, ready.pop(next_range[name])))
+                next_range[name] += 1
+            if next_range[name] == expected[name]:
+                received.pop(name)
+                sink.put((name, None))
+
+        for name in [n for n, count in expected.items() if count == 0]:
+            received.pop(name)  # no readable pages
+
+        in_flight = {}
+        max_in_flight = self.workers * 2
+        # Spawned, not forked: this process runs threads (pipeline stages,
+        # the LLM event loop, compactors) whose locks a fork could copy held.
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            task_iter = iter(tasks)
+            while True:
+                while len(in_flight) < max_in_flight and not errors:
+                    task = next(task_iter, None)
+                    if task is None:
+                        break
+                    path, start = task
+                    future = pool.submit(
+                        extract_page_range, path, start, start + self.pages_per_task
+                    )
+                    in_flight[future] = (path.name, start // self.pages_per_task)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, position = in_flight.pop(future)
+                    if name not in received:
+                        continue
+                    try:
+                        received[name][position] = future.result()
+                    except Exception as e:
+                        print(f"❌ Error loading PDF {name}: {e}")
+                        self.failed[name] = str(e)
+                        received.pop(name)
+                        sink.put((name, None))
+                        continue
+                    forward(name)
+
+    def _chunk(self, source: queue.Queue, sink: queue.Queue, errors: List[BaseException]):
+        streams = {}
+        batch = []
+        while True:
+            item = source.get()
+            if item is _DONE:
+                break
+
+            name, pages = item
+            stream = streams.get(name)
+            if stream is None:
+                stream = streams[name] = self.chunker.stream(
+                    {"source": name, "doc_hash": self._hashes[name]}
+                )
+
+            if name in self.failed:
+                streams.pop(name, None)  # rolled back; nothing more to emit
+                continue
+            if pages is None:
+                chunks = stream.close()
+                del streams[name]
+            else:
+                chunks = [c for number, text in pages for c in stream.feed(number, text)]
+
+            batch.extend({"text": t, "metadata": m} for t, m in chunks if t.strip())
+            while len(batch) >= self.batch_size:
+                sink.put(batch[:self.batch_size])
+                batch = batch[self.batch_size:]
+        if batch:
+            sink.put(batch)
+
+    def _embed(self, source: queue.Queue, sink: queue.Queue, errors: List[BaseException]):
+        while True:
+            documents = source.get()
+            if documents is _DONE:
+                break
+            embeddings, metadata_list = self.retriever.embed_documents(documents)
+            if metadata_list:
+                sink.put((embeddings, metadata_list))
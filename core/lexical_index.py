@@ -0,0 +1,397 @@
+"""
+Incremental BM25 inverted index over PDF chunk text.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from config import Config
+from core.utils import ensure_dir
+
+
+# Words joined by . - / : _ stay one term ("4.2.1", "iso-27001", "a/b"); their
+# parts are indexed as well, so "27001" alone still matches.
+_TOKEN = re.compile(r"[a-z0-9]+(?:[._/:-][a-z0-9]+)*")
+_SEPARATORS = re.compile(r"[._/:-]")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is it "
+    "its of on or our she so than that the their them then there these they this "
+    "to was we were what when where which who will with you your".split()
+)
+
+_POSTING_FIELDS = ("docs", "tfs", "lens")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased index terms of ``text``, stopwords dropped."""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token not in STOPWORDS:
+            terms.append(token)
+        if not token.isalnum():
+            terms.extend(
+                part for part in _SEPARATORS.split(token) if part and part not in STOPWORDS
+            )
+    return terms
+
+
+@lru_cache(maxsize=1 << 18)
+def term_key(term: str) -> int:
+    """64-bit key of a term (leading bytes of its BLAKE2b digest)."""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class _Segment:
+    """
+    One immutable, memory-mapped slice of the index.
+
+    ``terms`` holds the sorted term keys; postings of ``terms[i]`` are
+    ``docs/tfs/lens[starts[i]:starts[i + 1]]``, strongest match first.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Plain ndarray views of the maps: np.memmap adds overhead per slice.
+        for name in ("terms", "starts") + _POSTING_FIELDS:
+            array = np.load(path / f"{name}.npy", mmap_mode="r")
+            setattr(self, name, np.asarray(array))
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def postings(self, key: int) -> Tuple[int, int]:
+        """(start, end) of a term's postings; empty when absent."""
+        i = int(np.searchsorted(self.terms, key))
+        if i < len(self.terms) and self.terms[i] == key:
+            return int(self.starts[i]), int(self.starts[i + 1])
+        return 0, 0
+
+
+class BM25Index:
+    """
+    BM25 over chunk text, keyed by the PDF store's stable vector ids.
+
+    Layout (log-structured, like the store's snapshot + WAL):
+
+    - chunks added since the last ``save`` sit in an in-memory buffer
+    - ``save`` turns the buffer into a segment directory of ``.npy`` arrays:
+      sorted term keys, posting offsets, and per posting the vector id,
+      term frequency and chunk length
+    - past ``Config.BM25_MAX_SEGMENTS`` the smallest segments are merged,
+      dropping deleted chunks
+    - ``manifest.json`` lists live segments and corpus statistics and is
+      replaced atomically last, so a crash leaves the previous state
+
+    A lookup is one binary search per query term and segment. Postings are
+    stored strongest match first and at most ``Config.BM25_MAX_POSTINGS``
+    are scored per query term (split across segments), which bounds the
+    cost of very common terms without touching rare ones (ids, clause
+    numbers, names).
+
+    ``last_id`` is the highest vector id indexed; chunks added after the
+    last ``save`` are re-indexed from the vector store on startup.
+    """
+
+    def __init__(self, path: Path = None, k1: float = None, b: float = None):
+        self.path = path or Config.BM25_INDEX_DIR
+        self.manifest_path = self.path / "manifest.json"
+        self.deleted_path = self.path / "deleted.npy"
+        self.k1 = k1 if k1 is not None else Config.BM25_K1
+        self.b = b if b is not None else Config.BM25_B
+
+        self._lock = threading.RLock()
+        self._retired: List[Path] = []  # merged away, deleted after the next manifest
+        self._load()
+
+    def reload(self):
+        """Re-read the index after another process changed it."""
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        manifest = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        self._segments = [_Segment(self.path / name) for name in manifest.get("segments", [])]
+        self._next_segment = manifest.get("next_segment", 0)
+        self._docs = manifest.get("docs", 0)
+        self._tokens = manifest.get("tokens", 0)
+        self.last_id = manifest.get("last_id", -1)
+
+        self._deleted = np.empty(0, dtype=np.int64)
+        if self.deleted_path.exists():
+            self._deleted = np.load(self.deleted_path)
+        self._pending_deleted: set = set()
+        # term key -> [(vector id, term frequency, chunk length)]
+        self._buffer: Dict[int, List[Tuple[int, int, int]]] = {}
+        self._buffered_docs = 0
+
+    # ------------------------------------------------------------------
+    # WRITES
+    # ------------------------------------------------------------------
+
+    def add(self, ids: Iterable[int], texts: Iterable[str]):
+        """Index chunk texts under their vector ids (ascending)."""
+        with self._lock:
+            for vector_id, text in zip(ids, texts):
+                vector_id = int(vector_id)
+                if vector_id <= self.last_id:
+                    continue  # already indexed, e.g. replayed after a crash
+                terms = tokenize(text)
+                counts: Dict[str, int] = {}
+                for term in terms:
+                    counts[term] = counts.get(term, 0) + 1
+                length = len(terms)
+                for term, tf in counts.items():
+                    self._buffer.setdefault(term_key(term), []).append(
+                        (vector_id, tf, length)
+                    )
+                self._docs += 1
+                self._tokens += length
+                self._buffered_docs += 1
+                self.last_id = vector_id
+
+            if self._buffered_docs >= Config.BM25_FLUSH_DOCS:
+                self._flush_buffer()
+
+    def remove(self, ids: Iterable[int]):
+        """Stop returning these vector ids."""
+        with self._lock:
+            ids = np.fromiter((int(i) for i in ids), dtype=np.int64)
+            new = set(ids[~np.isin(ids, self._deleted)].tolist()) - self._pending_deleted
+            if not new:
+                return
+            # Chunk lengths are not kept per id; assume an average chunk.
+            avg = self._tokens / self._docs if self._docs else 0
+            self._docs = max(0, self._docs - len(new))
+            self._tokens = max(0, self._tokens - int(avg * len(new)))
+            self._pending_deleted |= new
+
+    def save(self):
+        """Persist buffered chunks and deletions."""
+        with self._lock:
+            if not self._buffer and not self._pending_deleted and self.manifest_path.exists():
+                return
+            ensure_dir(self.path)
+            self._flush_buffer(write_manifest=False)
+            if self._pending_deleted:
+                self._deleted = np.union1d(
+                    self._deleted, np.fromiter(self._pending_deleted, dtype=np.int64)
+                )
+                self._pending_deleted.clear()
+            np.save(self.deleted_path, self._deleted)
+            self._write_manifest()
+
+    def _flush_buffer(self, write_manifest: bool = True):
+        if not self._buffer:
+            return
+        keys, docs, tfs, lens = [], [], [], []
+        for key, postings in self._buffer.items():
+            keys.append(np.full(len(postings), key, dtype=np.int64))
+            block = np.asarray(postings, dtype=np.int64)
+            docs.append(block[:, 0])
+            tfs.append(block[:, 1])
+            lens.append(block[:, 2])
+        self._write_segment(
+            np.concatenate(keys), np.concatenate(docs),
+            np.concatenate(tfs), np.concatenate(lens),
+        )
+        self._buffer.clear()
+        self._buffered_docs = 0
+
+        if len(self._segments) > Config.BM25_MAX_SEGMENTS:
+            self._merge_smallest()
+        if write_manifest:
+            self._write_manifest()
+
+    def _write_segment(self, keys, docs, tfs, lens) -> _Segment:
+        """Sort postings by term, strongest first, and write a new segment."""
+        avgdl = self._tokens / self._docs if self._docs else 1.0
+        impact = self._term_weight(tfs, lens, avgdl)
+        order = np.lexsort((docs, -impact, keys))
+        keys = keys[order]
+        terms, starts = np.unique(keys, return_index=True)
+
+        name = f"seg_{self._next_segment:06d}"
+        self._next_segment += 1
+        path = self.path / name
+        tmp = self.path / (name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        ensure_dir(tmp)
+        np.save(tmp / "terms.npy", terms)
+        np.save(tmp / "starts.npy", np.append(starts, len(keys)).astype(np.int64))
+        np.save(tmp / "docs.npy", docs[order].astype(np.int64))
+        np.save(tmp / "tfs.npy", np.minimum(tfs[order], 65535).astype(np.uint16))
+        np.save(tmp / "lens.npy", lens[order].astype(np.uint32))
+        os.replace(tmp, path)
+
+        segment = _Segment(path)
+        self._segments.append(segment)
+        return segment
+
+    def _merge_smallest(self):
+        """Merge the smallest segments into one, dropping deleted chunks."""
+        count = len(self._segments) - Config.BM25_MAX_SEGMENTS + 2
+        victims = sorted(self._segments, key=len)[:count]
+        keys, docs, tfs, lens = [], [], [], []
+        for segment in victims:
+            counts = np.diff(segment.starts)
+            keys.append(np.repeat(np.asarray(segment.terms), counts))
+            docs.append(np.asarray(segment.docs))
+            tfs.append(np.asarray(segment.tfs, dtype=np.int64))
+            lens.append(np.asarray(segment.lens, dtype=np.int64))
+        keys, docs = np.concatenate(keys), np.concatenate(docs)
+        tfs, lens = np.concatenate(tfs), np.concatenate(lens)
+
+        deleted = np.union1d(
+            self._deleted, np.fromiter(self._pending_deleted, dtype=np.int64)
+        )
+        live = ~np.isin(docs, deleted)
+        self._segments = [s for s in self._segments if s not in victims]
+        self._write_segment(keys[live], docs[live], tfs[live], lens[live])
+        self._retired.extend(s.path for s in victims)
+
+    def _write_manifest(self):
+        manifest = {
+            "segments": [s.path.name for s in self._segments],
+            "next_segment": self._next_segment,
+            "docs": self._docs,
+            "tokens": self._tokens,
+            "last_id": self.last_id,
+        }
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.manifest_path)
+        for path in self._retired:
+            shutil.rmtree(path, ignore_errors=True)
+        self._retired.clear()
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._load()
+
+    # ------------------------------------------------------------------
+    # SEARCH
+    # ------------------------------------------------------------------
+
+    def _term_weight(self, tfs: np.ndarray, lens: np.ndarray, avgdl: float) -> np.ndarray:
+        tfs = tfs.astype(np.float32)
+        norm = self.k1 * (1.0 - self.b + self.b * lens.astype(np.float32) / avgdl)
+        return tfs * (self.k1 + 1.0) / (tfs + norm)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Top ``k`` (vector id, BM25 score) pairs, best first."""
+        keys = sorted({term_key(t) for t in tokenize(query)})
+        if not keys or k <= 0:
+            return []
+
+        with self._lock:
+            if not self._docs:
+                return []
+            avgdl = max(self._tokens / self._docs, 1.0)
+            deleted = self._deleted
+            if self._pending_deleted:
+                deleted = np.union1d(
+                    deleted, np.fromiter(self._pending_deleted, dtype=np.int64)
+                )
+            parts, idfs = [], []
+            for key in keys:
+                ranges = [(segment, *segment.postings(key)) for segment in self._segments]
+                ranges = [(segment, start, end) for segment, start, end in ranges if end > start]
+                buffered = self._buffer.get(key, [])
+                df = sum(end - start for _, start, end in ranges) + len(buffered)
+                if not df:
+                    continue
+
+                # Split the posting budget across segments by their share of df;
+                # the cut counts live postings only.
+                budget = Config.BM25_MAX_POSTINGS / df
+                idf = math.log(1.0 + (self._docs - df + 0.5) / (df + 0.5))
+                for segment, start, end in ranges:
+                    rows = _live_rows(
+                        segment.docs, start, end, math.ceil((end - start) * budget), deleted
+                    )
+                    parts.append((segment.docs[rows], segment.tfs[rows], segment.lens[rows]))
+                    idfs.append(np.full(len(rows), idf, dtype=np.float32))
+                if buffered:
+                    block = np.asarray(buffered, dtype=np.int64)
+                    parts.append((block[:, 0], block[:, 1], block[:, 2]))
+                    idfs.append(np.full(len(block), idf, dtype=np.float32))
+
+            if not parts:
+                return []
+
+        docs, tfs, lens = (np.concatenate(column) for column in zip(*parts))
+        scores = np.concatenate(idfs) * self._term_weight(tfs, lens, avgdl)
+        if len(keys) > 1:
+            docs, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=scores)
+        if len(deleted):
+            pos = np.minimum(np.searchsorted(deleted, docs), len(deleted) - 1)
+            live = deleted[pos] != docs
+            docs, scores = docs[live], scores[live]
+
+        if len(docs) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(docs[i]), float(scores[i])) for i in order]
+
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "chunks": self._docs,
+                "segments": len(self._segments),
+                "postings": sum(len(s) for s in self._segments),
+                "buffered_chunks": self._buffered_docs,
+            }
+
+
+def _live_rows(
+    docs: np.ndarray, start: int, end: int, want: int, deleted: np.ndarray
+) -> np.ndarray:
+    """
+    Positions of the first ``want`` postings in ``docs[start:end]`` whose chunk
+    is not in ``deleted`` (sorted). The window doubles past deleted postings,
+    so tombstoned chunks never crowd live ones out of a pruned list.
+    """
+    stop = min(end, start + want)
+    while True:
+        rows = np.arange(start, stop)
+        if len(deleted):
+            window = docs[start:stop]
+            pos = np.minimum(np.searchsorted(deleted, window), len(deleted) - 1)
+            rows = rows[deleted[pos] != window]
+        if len(rows) >= want or stop == end:
+            return rows[:want]
+        stop = min(end, start + 2 * (stop - start))
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = None) -> List[Tuple[int, float]]:
+    """
+    Fuse ranked id lists: each list adds ``1 / (k + rank)`` to an id's score.
+
+    Returns (id, fused score) pairs, best first.
+    """
+    k = Config.RRF_K if k is None else k
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
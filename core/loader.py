@@ -2,10 +2,79 @@
 PDF document loading and processing.
 """
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
 from config import Config
 
 
+def count_pages(filepath: Path) -> int:
+    """Number of pages in a PDF (0 if it cannot be parsed)."""
+    try:
+        import PyPDF2
+        with open(filepath, "rb") as f:
+            return len(PyPDF2.PdfReader(f).pages)
+    except Exception:
+        pass
+    try:
+        import pdfplumber
+        with pdfplumber.open(filepath) as pdf:
+            return len(pdf.pages)
+    except Exception:
+        return 0
+
+
+def iter_page_texts(
+    filepath: Path, start: int = 0, stop: Optional[int] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for pages ``[start, stop)``, one at a time.
+
+    Page numbers are 1-based; pages without text are skipped. PyPDF2 is
+    tried first; if it fails part-way, pdfplumber picks up from the next
+    page, and if it yields no text at all pdfplumber rereads the range.
+    """
+    next_page = start
+    found_text = False
+    try:
+        import PyPDF2
+        with open(filepath, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            last = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+            for number in range(start, last):
+                page_text = reader.pages[number].extract_text()
+                next_page = number + 1
+                if page_text and page_text.strip():
+                    found_text = True
+                    yield number + 1, page_text
+        if found_text:
+            return
+    except Exception:
+        pass
+
+    if not found_text:
+        next_page = start
+
+    try:
+        import pdfplumber
+    except ImportError:
+        return
+
+    with pdfplumber.open(filepath) as pdf:
+        last = len(pdf.pages) if stop is None else min(stop, len(pdf.pages))
+        for number in range(next_page, last):
+            page_text = pdf.pages[number].extract_text()
+            if page_text and page_text.strip():
+                yield number + 1, page_text
+
+
+def extract_page_range(filepath: Path, start: int, stop: int) -> List[Tuple[int, str]]:
+    """
+    Extract pages ``[start, stop)`` as (page_number, text), 1-based.
+
+    Module-level so it can run in a process pool.
+    """
+    return list(iter_page_texts(filepath, start, stop))
+
+
 class PDFLoader:
     """Load and extract text from PDF files."""
 
@@ -39,35 +108,31 @@ class PDFLoader:
             print(f"❌ Error loading PDF: {e}")
             return None, None
 
-    def _extract_text(self, filepath: Path) -> str:
-        # Attempt 1: PyPDF2
+    def iter_pages(self, filepath: str) -> Iterator[Tuple[int, str]]:
+        """
+        Stream (page_number, text) one page at a time.
+
+        Unlike load_pdf, only one page of text is held at once, so callers
+        such as SemanticChunker.chunk_pages can process documents of any
+        length in bounded memory.
+        """
+        path = Path(filepath)
+
+        if not path.exists():
+            print(f"❌ File not found: {filepath}")
+            return
+
+        if path.suffix.lower() not in self.supported_formats:
+            print(f"❌ Unsupported file format: {path.suffix}")
+            return
+
         try:
-            import PyPDF2
-            text = []
-            with open(filepath, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text.append(page_text)
-            combined = "\n".join(text).strip()
-            if combined:
-                return combined
-        except Exception:
-            pass
-
-        # Attempt 2: pdfplumber (fallback)
+            yield from iter_page_texts(path)
+        except Exception as e:
+            print(f"❌ Error loading PDF: {e}")
+
+    def _extract_text(self, filepath: Path) -> str:
         try:
-            import pdfplumber
-            text = []
-            with pdfplumber.open(filepath) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text.append(page_text)
-            combined = "\n".join(text).strip()
-            if combined:
-                return combined
-            return ""
+            return "\n".join(text for _, text in iter_page_texts(filepath)).strip()
         except Exception as e:
             raise Exception(f"PDF extraction failed: {e}")
@@ -1,32 +1,86 @@
 """
 Persistent conversational memory management.
 """
-from typing import List, Optional, Dict
+import json
+import sqlite3
+import threading
+from typing import List, Optional
 from pathlib import Path
 from config import Config
-from core.utils import save_json, load_json, get_timestamp
+from core.utils import ensure_dir, get_timestamp, load_json
 
 class ConversationMemory:
-    """Manage persistent conversation history with timestamps."""
-    
-    def __init__(self, store_path: Path = Config.MEMORY_STORE_PATH):
+    """
+    Persistent conversation history, partitioned by session.
+
+    Turns live in an append-only SQLite table (WAL mode, so several
+    processes can share it): ``add_turn`` is a single insert and reads
+    walk the ``(session, id)`` index backwards from the newest turn, so
+    neither depends on how long the history is. A ``conversations.json``
+    from older releases is imported once, into ``Config.DEFAULT_SESSION``.
+    """
+
+    def __init__(
+        self,
+        store_path: Path = Config.MEMORY_LOG_PATH,
+        legacy_path: Path = Config.MEMORY_STORE_PATH,
+    ):
         self.store_path = store_path
-        self.conversations = self._load_conversations()
-    
-    def _load_conversations(self) -> Dict[str, list]:
-        """Load existing conversations from disk."""
-        data = load_json(self.store_path)
-        return data if data else {"turns": []}
-    
-    def add_turn(self, query: str, response: str, context_used: Optional[List[str]] = None) -> dict:
+        self._lock = threading.Lock()  # shared by every Streamlit session
+
+        ensure_dir(self.store_path.parent)
+        self._db = sqlite3.connect(str(self.store_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, session TEXT NOT NULL,"
+            " timestamp TEXT NOT NULL, query TEXT NOT NULL, response TEXT NOT NULL,"
+            " context_used TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns (session, id)")
+        self._db.commit()
+        self._import_legacy(legacy_path)
+
+    def _import_legacy(self, legacy_path: Path):
+        """Move turns from the old single-file JSON store, once."""
+        if legacy_path is None or not legacy_path.exists():
+            return
+        turns = (load_json(legacy_path) or {}).get("turns", [])
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO turns (session, timestamp, query, response, context_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        Config.DEFAULT_SESSION,
+                        turn.get("timestamp", ""),
+                        turn.get("query", ""),
+                        turn.get("response", ""),
+                        json.dumps(turn.get("context_used", []), default=str),
+                    )
+                    for turn in turns
+                ],
+            )
+        legacy_path.rename(legacy_path.with_suffix(".json.bak"))
+        print(f"🔁 Imported {len(turns)} turns from {legacy_path.name}")
+
+    def add_turn(
+        self,
+        query: str,
+        response: str,
+        context_used: Optional[List] = None,
+        session: str = None,
+    ) -> dict:
         """
         Add a conversation turn to memory.
-        
+
         Args:
             query: User query
             response: Assistant response
             context_used: List of context sources used
-        
+            session: Session or user the turn belongs to
+
         Returns:
             Turn metadata
         """
@@ -36,75 +90,112 @@ class ConversationMemory:
             'response': response,
             'context_used': context_used or []
         }
-        
-        if 'turns' not in self.conversations:
-            self.conversations['turns'] = []
-        
-        self.conversations['turns'].append(turn)
-        self._save_conversations()
-        
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO turns (session, timestamp, query, response, context_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    session or Config.DEFAULT_SESSION,
+                    turn['timestamp'],
+                    query,
+                    response,
+                    json.dumps(turn['context_used'], default=str),
+                ),
+            )
+
         return turn
-    
-    def get_history(self, limit: Optional[int] = None) -> List[dict]:
+
+    def get_history(self, limit: Optional[int] = None, session: str = None) -> List[dict]:
         """
         Get conversation history.
-        
+
         Args:
-            limit: Maximum number of turns to return
-        
+            limit: Maximum number of turns to return (newest ones)
+            session: Session or user to read
+
         Returns:
-            List of conversation turns
+            List of conversation turns, oldest first
         """
-        turns = self.conversations.get('turns', [])
-        if limit:
-            return turns[-limit:]
-        return turns
-    
-    def get_last_n_turns(self, n: int = 5) -> List[tuple[str, str]]:
+        rows = self._tail(
+            "timestamp, query, response, context_used", limit, session
+        )
+        return [
+            {
+                'timestamp': timestamp,
+                'query': query,
+                'response': response,
+                'context_used': json.loads(context_used),
+            }
+            for timestamp, query, response, context_used in rows
+        ]
+
+    def get_last_n_turns(self, n: int = 5, session: str = None) -> List[tuple[str, str]]:
         """
         Get last n query-response pairs.
-        
+
         Args:
             n: Number of turns
-        
+            session: Session or user to read
+
         Returns:
             List of (query, response) tuples
         """
-        turns = self.conversations.get('turns', [])
-        pairs = []
-        for turn in turns[-n:]:
-            pairs.append((turn['query'], turn['response']))
-        return pairs
-    
-    def get_context_string(self, limit: int = 3) -> str:
+        return [tuple(row) for row in self._tail("query, response", n, session)]
+
+    def _tail(self, columns: str, limit: Optional[int], session: Optional[str]) -> list:
+        """Newest ``limit`` rows of a session (all if None), oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {columns} FROM turns WHERE session = ?"
+                " ORDER BY id DESC LIMIT ?",
+                (session or Config.DEFAULT_SESSION, limit if limit else -1),
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def get_context_string(self, limit: int = 3, session: str = None) -> str:
         """
         Get formatted context from recent turns.
-        
+
         Args:
             limit: Number of turns
-        
+            session: Session or user to read
+
         Returns:
             Formatted context string
         """
-        turns = self.get_last_n_turns(limit)
+        turns = self.get_last_n_turns(limit, session)
         if not turns:
             return ""
-        
+
         context = "Recent conversation:\n"
         for i, (query, response) in enumerate(turns, 1):
             context += f"{i}. Q: {query}\n   A: {response[:100]}...\n"
-        
+
         return context
-    
-    def clear(self):
-        """Clear all conversations."""
-        self.conversations = {"turns": []}
-        self._save_conversations()
-    
-    def _save_conversations(self):
-        """Save conversations to disk."""
-        save_json(self.conversations, self.store_path)
-    
-    def get_size(self) -> int:
-        """Get number of turns in memory."""
-        return len(self.conversations.get('turns', []))
+
+    def sessions(self) -> List[str]:
+        """Sessions that have at least one turn."""
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT session FROM turns").fetchall()
+        return [session for (session,) in rows]
+
+    def clear(self, session: str = None):
+        """Clear one session's turns, or every session's if None."""
+        with self._lock, self._db:
+            if session is None:
+                self._db.execute("DELETE FROM turns")
+            else:
+                self._db.execute("DELETE FROM turns WHERE session = ?", (session,))
+
+    def get_size(self, session: str = None) -> int:
+        """Get number of turns in memory (one session's, or all)."""
+        with self._lock:
+            if session is None:
+                row = self._db.execute("SELECT COUNT(*) FROM turns").fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT COUNT(*) FROM turns WHERE session = ?", (session,)
+                ).fetchone()
+        return row[0]
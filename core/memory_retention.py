@@ -0,0 +1,231 @@
+"""
+Retention for the conversation-memory vector store: caps, TTL and roll-ups.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from core.context_packer import count_tokens
+from core.vectorstore import FAISSVectorStore
+
+
+SUMMARY = "summary"
+
+
+def _parse_time(timestamp: str) -> datetime:
+    try:
+        return datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return datetime.min  # unreadable timestamps are treated as oldest
+
+
+def summarize_turns(texts: List[str], token_budget: int = None) -> str:
+    """
+    Extractive roll-up of memory texts: each question with the first line
+    of its answer, oldest first, until ``token_budget`` tokens are used.
+    """
+    budget = token_budget or Config.MEMORY_SUMMARY_TOKENS
+    lines: List[str] = []
+    used = 0
+    for text in texts:
+        if text.startswith("Earlier conversation"):  # a previous roll-up
+            entries = text.splitlines()[1:]
+        else:
+            question, _, answer = text.partition("\nA: ")
+            answer = answer.strip().split("\n", 1)[0]
+            entries = [f"- {question.removeprefix('Q: ').strip()} → {answer[:200]}"]
+        for entry in entries:
+            cost = count_tokens(entry)
+            if used + cost > budget:
+                return "\n".join(lines)
+            lines.append(entry)
+            used += cost
+    return "\n".join(lines)
+
+
+class MemoryRetention:
+    """
+    Keep the memory vector store at a bounded size.
+
+    Every ``interval`` added turns, ``enforce`` scans the store (bounded by
+    the same caps, so the scan is too; one pass runs at a time) and evicts
+    turns that are
+
+    - older than ``ttl_days``
+    - beyond the newest ``session_turns`` of their session
+    - the oldest, while more than ``max_vectors - max_summaries`` remain
+
+    Evicted turns are not simply lost: each session's evicted turns are
+    rolled up, ``rollup_turns`` at a time, into summary vectors (text from
+    ``summarize``, extractive by default). Past ``max_summaries``, the oldest
+    summaries are rolled up into one. Deletions are tombstones, which the
+    store compacts away, so index size and search time stay flat.
+    """
+
+    def __init__(
+        self,
+        store: FAISSVectorStore,
+        embeddings,
+        max_vectors: int = Config.MEMORY_MAX_VECTORS,
+        max_summaries: int = Config.MEMORY_MAX_SUMMARIES,
+        session_turns: Optional[int] = Config.MEMORY_SESSION_MAX_TURNS,
+        ttl_days: Optional[float] = Config.MEMORY_TTL_DAYS,
+        rollup_turns: int = Config.MEMORY_ROLLUP_TURNS,
+        interval: int = Config.MEMORY_RETENTION_INTERVAL,
+        summarize: Callable[[List[str]], str] = summarize_turns,
+    ):
+        self.store = store
+        self.embeddings = embeddings
+        self.max_vectors = max_vectors
+        self.max_summaries = max_summaries
+        self.session_turns = session_turns
+        self.ttl_days = ttl_days
+        self.rollup_turns = rollup_turns
+        self.interval = interval
+        self.summarize = summarize
+
+        self._lock = threading.Lock()
+        self._enforce_lock = threading.Lock()  # one pass at a time
+        self._pending = 0
+        self.evicted = 0
+        self.summaries_created = 0
+        self.last_enforce_ms = 0.0
+
+    def record_added(self, count: int = 1) -> Optional[dict]:
+        """Count new turns; runs ``enforce`` once ``interval`` have arrived."""
+        with self._lock:
+            self._pending += count
+            if self._pending < self.interval and self.store.get_size() <= self.max_vectors:
+                return None
+        # A pass already running would roll up the same turns; the pending
+        # count is kept, so a later add runs the next pass.
+        if not self._enforce_lock.acquire(blocking=False):
+            return None
+        try:
+            with self._lock:
+                self._pending = 0
+            return self._enforce()
+        finally:
+            self._enforce_lock.release()
+
+    def enforce(self, now: datetime = None) -> dict:
+        """Apply every policy once; returns what was evicted and created."""
+        with self._enforce_lock:
+            return self._enforce(now)
+
+    def _enforce(self, now: datetime = None) -> dict:
+        start = time.perf_counter()
+        now = now or datetime.now()
+        turns: List[dict] = []
+        summaries: List[dict] = []
+        for records in self.store.iter_records():
+            for meta in records:
+                (summaries if meta.get("kind") == SUMMARY else turns).append(meta)
+        turns.sort(key=lambda meta: (_parse_time(meta.get("timestamp")), meta["vector_id"]))
+        summaries.sort(key=lambda meta: meta["vector_id"])
+
+        evict = set()
+        if self.ttl_days is not None:
+            cutoff = now - timedelta(days=self.ttl_days)
+            evict.update(
+                meta["vector_id"] for meta in turns if _parse_time(meta.get("timestamp")) < cutoff
+            )
+        if self.session_turns is not None:
+            by_session: Dict[str, List[dict]] = {}
+            for meta in turns:
+                by_session.setdefault(meta.get("session") or Config.DEFAULT_SESSION, []).append(meta)
+            for session_turns in by_session.values():
+                excess = len(session_turns) - self.session_turns
+                evict.update(meta["vector_id"] for meta in session_turns[:max(0, excess)])
+        kept = [meta for meta in turns if meta["vector_id"] not in evict]
+        excess = len(kept) - (self.max_vectors - self.max_summaries)
+        evict.update(meta["vector_id"] for meta in kept[:max(0, excess)])
+
+        evicted = [meta for meta in turns if meta["vector_id"] in evict]
+        new_summaries = self._rollup_turns(evicted)
+        merged, merged_summary = self._rollup_summaries(summaries + new_summaries)
+        if merged_summary:
+            new_summaries = [merged_summary] + [
+                meta for meta in new_summaries if not any(meta is m for m in merged)
+            ]
+
+        # Summaries created in this pass have no vector id yet.
+        removed = [meta["vector_id"] for meta in evicted + merged if "vector_id" in meta]
+        if removed:
+            self.store.delete(removed)
+        if new_summaries:
+            texts = [meta["text"] for meta in new_summaries]
+            self.store.add(self.embeddings.embed_texts(texts), new_summaries)
+
+        with self._lock:
+            self.evicted += len(evicted)
+            self.summaries_created += len(new_summaries)
+            self.last_enforce_ms = (time.perf_counter() - start) * 1000
+        return {"evicted": len(evicted), "summaries": len(new_summaries), "merged": len(merged)}
+
+    # ------------------------------------------------------------------
+
+    def _rollup_turns(self, evicted: List[dict]) -> List[dict]:
+        """
+        Summary records for evicted turns: full groups per session, then
+        the sessions' leftovers pooled, so small passes make few summaries.
+        """
+        by_session: Dict[str, List[dict]] = {}
+        for meta in evicted:
+            by_session.setdefault(meta.get("session") or Config.DEFAULT_SESSION, []).append(meta)
+        summaries = []
+        leftovers: List[dict] = []
+        for session, session_turns in by_session.items():
+            full = len(session_turns) - len(session_turns) % self.rollup_turns
+            for first in range(0, full, self.rollup_turns):
+                group = session_turns[first:first + self.rollup_turns]
+                summaries.append(self._summary(group, session, len(group)))
+            leftovers.extend(session_turns[full:])
+        if len(by_session) == 1 and leftovers:
+            summaries.append(self._summary(leftovers, session, len(leftovers)))
+            return summaries
+        leftovers.sort(key=lambda meta: _parse_time(meta.get("timestamp")))
+        for first in range(0, len(leftovers), self.rollup_turns):
+            group = leftovers[first:first + self.rollup_turns]
+            summaries.append(self._summary(group, None, len(group)))
+        return summaries
+
+    def _rollup_summaries(self, summaries: List[dict]):
+        """Oldest summaries to fold into one, so at most ``max_summaries`` remain."""
+        excess = len(summaries) - self.max_summaries
+        if excess <= 0:
+            return [], None
+        count = min(len(summaries), max(excess + 1, self.rollup_turns))
+        if count < 2:
+            return [], None
+        merged = summaries[:count]
+        turns = sum(int(meta.get("turns", 1)) for meta in merged)
+        return merged, self._summary(merged, None, turns)
+
+    def _summary(self, group: List[dict], session: Optional[str], turns: int) -> dict:
+        first = group[0].get("first_timestamp") or group[0].get("timestamp", "")
+        last = group[-1].get("timestamp", "")
+        body = self.summarize([meta.get("text", "") for meta in group])
+        metadata = {
+            "text": f"Earlier conversation ({turns} turns, {first[:10]} to {last[:10]}):\n{body}",
+            "timestamp": last,
+            "first_timestamp": first,
+            "source": "conversation",
+            "kind": SUMMARY,
+            "turns": turns,
+        }
+        if session is not None:
+            metadata["session"] = session
+        return metadata
+
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "evicted": self.evicted,
+                "summaries_created": self.summaries_created,
+                "last_enforce_ms": self.last_enforce_ms,
+            }
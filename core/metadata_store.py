@@ -0,0 +1,407 @@
+"""
+Columnar, append-only on-disk store for vector metadata.
+"""
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.utils import ensure_dir
+
+
+class ColumnarMetadataStore:
+    """
+    List-like metadata store addressed by vector position.
+
+    Records committed to disk live in a directory of flat files that are
+    memory-mapped on demand, so opening a store costs the same for ten
+    records or ten million and a lookup only touches the rows requested:
+
+    - ``<field>.i64``: fixed-width integer columns (``INT_FIELDS``); the
+      ``vector_id`` column holds each record's stable id, always ascending
+    - ``source.i32``: dictionary-coded ``source`` (names in ``header.json``)
+    - ``text.bin`` / ``text.end``: chunk text blob and per-record end offsets
+    - ``extra.bin`` / ``extra.end``: remaining fields as JSON, same layout
+    - ``header.json``: committed record count, next free vector id and how
+      many records were ever removed; rewritten atomically last
+
+    Records appended since the last ``flush`` are held in memory.
+    """
+
+    INT_FIELDS = (
+        "vector_id", "chunk_id", "chunk_start", "chunk_end", "char_start", "char_end",
+        "page_start", "page_end",
+    )
+    BLOBS = ("text", "extra")
+    MISSING = np.iinfo(np.int64).min
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.header_path = path / "header.json"
+
+        self._count = 0
+        self._next_id = 0
+        self._removed = 0
+        self._sources: List[str] = []
+        self._source_codes: Dict[str, int] = {}
+        self._pending: List[dict] = []
+        self._maps: Dict[str, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+        self._open()
+
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return (path / "header.json").exists()
+
+    def _open(self):
+        if not self.header_path.exists():
+            return
+        with open(self.header_path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+        self._count = header["count"]
+        self._next_id = header.get("next_id", 0)
+        self._removed = header.get("removed", 0)
+        self._sources = header["sources"]
+        self._source_codes = {s: i for i, s in enumerate(self._sources)}
+
+        # Columns added after a store was written start out all-missing,
+        # except vector ids, which were positional before they were stored.
+        for field in self.INT_FIELDS:
+            column_path = self.path / f"{field}.i64"
+            if column_path.exists():
+                continue
+            if field == "vector_id":
+                np.arange(self._count, dtype=np.int64).tofile(column_path)
+            else:
+                np.full(self._count, self.MISSING, dtype=np.int64).tofile(column_path)
+
+    def _column(self, name: str, dtype) -> np.ndarray:
+        """Memory-map the committed part of a column file."""
+        column = self._maps.get(name)
+        if column is None or len(column) < self._count:
+            column = np.memmap(
+                self.path / name, dtype=dtype, mode="r", shape=(self._count,)
+            )
+            self._maps[name] = column
+        return column
+
+    def _blob(self, name: str, row: int) -> bytes:
+        ends = self._column(f"{name}.end", np.int64)
+        start = int(ends[row - 1]) if row else 0
+        end = int(ends[row])
+        if end == start:
+            return b""
+        return self._blob_map(name)[start:end].tobytes()
+
+    def _blob_map(self, name: str) -> np.ndarray:
+        key = f"{name}.bin"
+        size = self._blob_size(name, self._count)
+        data = self._maps.get(key)
+        if data is None or len(data) < size:
+            data = np.memmap(self.path / key, dtype=np.uint8, mode="r", shape=(size,))
+            self._maps[key] = data
+        return data
+
+    def _read_row(self, row: int) -> dict:
+        record = json.loads(self._blob("extra", row) or b"{}")
+        for field in self.INT_FIELDS:
+            value = int(self._column(f"{field}.i64", np.int64)[row])
+            if value != self.MISSING:
+                record[field] = value
+        code = int(self._column("source.i32", np.int32)[row])
+        if code >= 0:
+            record["source"] = self._sources[code]
+        record["text"] = self._blob("text", row).decode("utf-8")
+        return record
+
+    # ------------------------------------------------------------------
+    # LIST INTERFACE
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._count + len(self._pending)
+
+    def __getitem__(self, row: int) -> dict:
+        with self._lock:
+            if row < 0:
+                row += len(self)
+            if row < self._count:
+                return self._read_row(row)
+            return self._pending[row - self._count]
+
+    def get_many(self, rows: List[int]) -> List[dict]:
+        return [self[row] for row in rows]
+
+    # ------------------------------------------------------------------
+    # VECTOR IDS
+    # ------------------------------------------------------------------
+
+    @property
+    def last_id(self) -> int:
+        """Vector id of the last record, or -1 when empty."""
+        with self._lock:
+            if self._pending:
+                return self._pending[-1]["vector_id"]
+            if self._count:
+                return int(self._column("vector_id.i64", np.int64)[self._count - 1])
+            return -1
+
+    @property
+    def next_id(self) -> int:
+        """Smallest id never handed out, including ids already removed."""
+        return max(self._next_id, self.last_id + 1)
+
+    @property
+    def removed(self) -> int:
+        """Records dropped by compaction or ``clear`` over the store's life."""
+        return self._removed
+
+    def find_rows(self, ids) -> np.ndarray:
+        """Row of each vector id, or -1 where the id is not stored."""
+        with self._lock:
+            ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+            rows = np.full(len(ids), -1, dtype=np.int64)
+            if self._count:
+                committed = self._column("vector_id.i64", np.int64)
+                pos = np.minimum(np.searchsorted(committed, ids), self._count - 1)
+                hit = committed[pos] == ids
+                rows[hit] = pos[hit]
+            if self._pending:
+                pending = np.fromiter(
+                    (r["vector_id"] for r in self._pending), dtype=np.int64
+                )
+                pos = np.minimum(np.searchsorted(pending, ids), len(pending) - 1)
+                hit = pending[pos] == ids
+                rows[hit] = pos[hit] + self._count
+            return rows
+
+    def vector_ids(self, rows) -> List[int]:
+        """Vector id stored at each row."""
+        with self._lock:
+            ids = []
+            for row in rows:
+                row = int(row)
+                if row < self._count:
+                    ids.append(int(self._column("vector_id.i64", np.int64)[row]))
+                else:
+                    ids.append(self._pending[row - self._count]["vector_id"])
+            return ids
+
+    def first_row_after(self, vector_id: int) -> int:
+        """First row whose vector id is greater than ``vector_id``."""
+        with self._lock:
+            if self._count:
+                committed = self._column("vector_id.i64", np.int64)
+                row = int(np.searchsorted(committed, vector_id, side="right"))
+                if row < self._count:
+                    return row
+            for i, record in enumerate(self._pending):
+                if record["vector_id"] > vector_id:
+                    return self._count + i
+            return len(self)
+
+    def rows_with_source(self, source: str) -> np.ndarray:
+        """Rows whose ``source`` equals ``source``."""
+        with self._lock:
+            rows = []
+            code = self._source_codes.get(source)
+            if code is not None and self._count:
+                column = self._column("source.i32", np.int32)
+                rows.append(np.flatnonzero(column == code))
+            rows.append(np.asarray(
+                [self._count + i for i, r in enumerate(self._pending)
+                 if r.get("source") == source],
+                dtype=np.int64,
+            ))
+            return np.concatenate(rows)
+
+    def append(self, record: dict):
+        with self._lock:
+            self._pending.append(record)
+
+    def extend(self, records: List[dict]):
+        with self._lock:
+            self._pending.extend(records)
+
+    # ------------------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------------------
+
+    def flush(self, count: Optional[int] = None):
+        """Append pending records up to position ``count`` and commit them."""
+        with self._lock:
+            committed = self._count
+            count = len(self) if count is None else count
+            records = self._pending[:max(0, count - committed)]
+            sources = list(self._sources)
+            codes = dict(self._source_codes)
+
+        if not records:
+            return
+
+        ensure_dir(self.path)
+        self._truncate_files(committed)
+
+        columns = {f: [] for f in self.INT_FIELDS}
+        source_col = []
+        blobs = {name: [] for name in self.BLOBS}
+        for record in records:
+            extra = {}
+            for key, value in record.items():
+                if key == "text":
+                    continue
+                if key in columns and isinstance(value, int) and not isinstance(value, bool):
+                    continue
+                if key == "source" and isinstance(value, str):
+                    continue
+                extra[key] = value
+            for field in self.INT_FIELDS:
+                value = record.get(field)
+                ok = isinstance(value, int) and not isinstance(value, bool)
+                columns[field].append(value if ok else self.MISSING)
+
+            source = record.get("source")
+            if isinstance(source, str):
+                if source not in codes:
+                    codes[source] = len(sources)
+                    sources.append(source)
+                source_col.append(codes[source])
+            else:
+                source_col.append(-1)
+
+            blobs["text"].append(str(record.get("text", "")).encode("utf-8"))
+            blobs["extra"].append(
+                json.dumps(extra, default=str).encode("utf-8") if extra else b""
+            )
+
+        for field, values in columns.items():
+            self._append_file(f"{field}.i64", np.asarray(values, dtype=np.int64))
+        self._append_file("source.i32", np.asarray(source_col, dtype=np.int32))
+
+        for name, chunks in blobs.items():
+            base = self._blob_size(name, committed)
+            ends = base + np.cumsum([len(c) for c in chunks], dtype=np.int64)
+            with open(self.path / f"{name}.bin", "ab") as f:
+                f.write(b"".join(chunks))
+            self._append_file(f"{name}.end", ends)
+
+        with self._lock:
+            ids = [i for i in columns["vector_id"] if i != self.MISSING]
+            if ids:
+                self._next_id = max(self._next_id, ids[-1] + 1)
+            self._write_header(committed + len(records), sources)
+            self._sources = sources
+            self._source_codes = codes
+            self._count = committed + len(records)
+            del self._pending[:len(records)]
+
+    def truncate(self, count: int):
+        """Drop every record at position ``count`` and beyond."""
+        with self._lock:
+            if count >= len(self):
+                return
+            if count >= self._count:
+                del self._pending[count - self._count:]
+                return
+            self._pending.clear()
+            self._write_header(count, self._sources)
+            self._count = count
+            self._maps.clear()
+        self._truncate_files(count)
+
+    def write_compacted(self, keep: np.ndarray, dest: Path):
+        """
+        Write the committed records selected by boolean mask ``keep`` as a
+        new store at ``dest``, preserving the next free vector id.
+
+        Pending records are left out. Committed rows never change, so only
+        the column maps are taken under the lock and appends go on meanwhile.
+        """
+        keep = np.asarray(keep, dtype=bool)
+        with self._lock:
+            if len(keep) != self._count:
+                raise ValueError("keep must cover exactly the committed records")
+            columns = {
+                f"{field}.i64": self._column(f"{field}.i64", np.int64)[:self._count]
+                for field in self.INT_FIELDS
+            }
+            columns["source.i32"] = self._column("source.i32", np.int32)[:self._count]
+            blobs = {}
+            for name in self.BLOBS:
+                ends = self._column(f"{name}.end", np.int64)[:self._count]
+                size = int(ends[-1]) if len(ends) else 0
+                blobs[name] = (ends, self._blob_map(name) if size else np.empty(0, np.uint8))
+            header = {
+                "count": int(keep.sum()),
+                "sources": list(self._sources),
+                "next_id": self.next_id,
+                "removed": self._removed + int((~keep).sum()),
+            }
+
+        ensure_dir(dest)
+        for name, column in columns.items():
+            np.asarray(column[keep]).tofile(dest / name)
+        for name, (ends, data) in blobs.items():
+            lengths = np.diff(ends, prepend=0)
+            np.asarray(data[np.repeat(keep, lengths)]).tofile(dest / f"{name}.bin")
+            np.cumsum(lengths[keep], dtype=np.int64).tofile(dest / f"{name}.end")
+        with open(dest / "header.json", "w", encoding="utf-8") as f:
+            json.dump(header, f)
+
+    def clear(self):
+        """Drop every record; ids already handed out are still never reused."""
+        with self._lock:
+            next_id, removed = self.next_id, self._removed + len(self)
+            self._maps.clear()
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._count = 0
+            self._sources = []
+            self._source_codes = {}
+            self._pending.clear()
+            self._next_id, self._removed = next_id, removed
+            if next_id:
+                self._write_header(0, [])
+
+    def _write_header(self, count: int, sources: List[str]):
+        ensure_dir(self.path)
+        tmp_path = self.header_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "count": count,
+                    "sources": sources,
+                    "next_id": self._next_id,
+                    "removed": self._removed,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.header_path)
+
+    def _blob_size(self, name: str, count: int) -> int:
+        if count == 0:
+            return 0
+        return int(self._column(f"{name}.end", np.int64)[count - 1])
+
+    def _truncate_files(self, count: int):
+        """Cut every file back to ``count`` rows, discarding uncommitted tails."""
+        sizes = {f"{field}.i64": count * 8 for field in self.INT_FIELDS}
+        sizes["source.i32"] = count * 4
+        for name in self.BLOBS:
+            sizes[f"{name}.end"] = count * 8
+            sizes[f"{name}.bin"] = self._blob_size(name, count)
+        for name, size in sizes.items():
+            file_path = self.path / name
+            if file_path.exists() and file_path.stat().st_size != size:
+                with open(file_path, "r+b") as f:
+                    f.truncate(size)
+
+    def _append_file(self, name: str, values: np.ndarray):
+        with open(self.path / name, "ab") as f:
+            f.write(values.tobytes())
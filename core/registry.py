@@ -0,0 +1,345 @@
+"""
+Content-hash registry of indexed documents and chunks.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from core.utils import ensure_dir, get_timestamp, load_json, save_json
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_key(text: str) -> int:
+    """64-bit content key for a chunk (leading bytes of its SHA-256)."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little", signed=True)
+
+
+class DocumentRegistry:
+    """
+    Which files and chunk texts are already in the PDF store.
+
+    State is a snapshot plus append-only logs, so ``save`` writes only what
+    changed since the last one:
+
+    - ``documents.json``: file hash -> filename, size, vector ids, plus the
+      owners of vectors reused by more than one document, and the snapshot
+      ``generation``
+    - ``chunk_keys.npy`` / ``chunk_ids.npy``: sorted 64-bit chunk hashes and
+      the vector id holding that text, searched with ``np.searchsorted``
+      (newer keys are looked up in a dict)
+    - ``documents.<generation>.log``: one JSON line per register / add_ids /
+      unregister since the snapshot, replayed on load
+    - ``chunks.<generation>.log``: (key, vector id) int64 pairs, id -1 for a
+      removed key
+
+    Once the logs outgrow the snapshot, ``save`` folds them into a new
+    generation, so rewrites stay proportional to the changes they absorb.
+    """
+
+    COMPACT_MIN_BYTES = 1 << 20
+
+    def __init__(self, path: Path = None):
+        self.path = path or Config.DOCUMENT_REGISTRY_DIR
+        self.documents_path = self.path / "documents.json"
+
+        self._lock = threading.RLock()
+        self._load()
+
+    def reload(self):
+        """Re-read the registry after another process changed it."""
+        with self._lock:
+            self._load()
+
+    def _files(self, generation: int) -> Dict[str, Path]:
+        suffix = f".{generation}" if generation else ""  # 0: the pre-log layout
+        return {
+            "keys": self.path / f"chunk_keys{suffix}.npy",
+            "ids": self.path / f"chunk_ids{suffix}.npy",
+            "documents_log": self.path / f"documents.{generation}.log",
+            "chunks_log": self.path / f"chunks.{generation}.log",
+        }
+
+    def _load(self):
+        data = load_json(self.documents_path) or {}
+        self.documents: Dict[str, dict] = data.get("documents", {})
+        self.shared: Dict[int, List[str]] = {
+            int(k): v for k, v in data.get("shared", {}).items()
+        }
+        self._generation = data.get("generation", 0)
+        files = self._files(self._generation)
+        self._by_filename: Dict[str, List[str]] = {}
+        for doc_hash, doc in self.documents.items():
+            self._by_filename.setdefault(doc["filename"], []).append(doc_hash)
+
+        self._keys = np.empty(0, dtype=np.int64)
+        self._ids = np.empty(0, dtype=np.int64)
+        if files["keys"].exists() and files["ids"].exists():
+            self._keys = np.load(files["keys"])
+            self._ids = np.load(files["ids"])
+        self._pending: Dict[int, int] = {}
+        self._removed: set = set()
+        self._document_ops: List[list] = []
+        self._chunk_ops: List[Tuple[int, int]] = []
+
+        if files["documents_log"].exists():
+            with open(files["documents_log"], "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # torn last line of an interrupted save
+                    getattr(self, "_apply_" + op[0])(*op[1:])
+        if files["chunks_log"].exists():
+            size = files["chunks_log"].stat().st_size // 16
+            ops = np.fromfile(files["chunks_log"], dtype=np.int64, count=size * 2)
+            for key, vector_id in ops.reshape(-1, 2).tolist():
+                self._apply_chunk(key, vector_id)
+
+    # ------------------------------------------------------------------
+    # DOCUMENTS
+    # ------------------------------------------------------------------
+
+    def get(self, doc_hash: str) -> Optional[dict]:
+        return self.documents.get(doc_hash)
+
+    def find_by_filename(self, filename: str) -> List[str]:
+        with self._lock:
+            return list(self._by_filename.get(filename, []))
+
+    def register(self, doc_hash: str, filename: str, size: int):
+        with self._lock:
+            self._log("register", doc_hash, filename, size, get_timestamp())
+
+    def _apply_register(self, doc_hash: str, filename: str, size: int, added: str):
+        self._unindex(doc_hash)
+        self.documents[doc_hash] = {
+            "filename": filename,
+            "size": size,
+            "added": added,
+            "ids": [],
+        }
+        self._by_filename.setdefault(filename, []).append(doc_hash)
+
+    def _unindex(self, doc_hash: str):
+        doc = self.documents.get(doc_hash)
+        if doc is None:
+            return
+        hashes = self._by_filename.get(doc["filename"], [])
+        if doc_hash in hashes:
+            hashes.remove(doc_hash)
+        if not hashes:
+            self._by_filename.pop(doc["filename"], None)
+
+    def add_ids(
+        self,
+        doc_hash: str,
+        ids: Iterable[int],
+        reused: Iterable[Tuple[int, Optional[str]]] = (),
+    ):
+        """
+        Record vectors a document created, and existing vectors it reuses.
+
+        ``reused`` holds (vector_id, creator_doc_hash) pairs.
+        """
+        with self._lock:
+            if doc_hash not in self.documents:
+                return
+            self._log(
+                "add_ids",
+                doc_hash,
+                [int(i) for i in ids],
+                [[int(vector_id), creator] for vector_id, creator in reused],
+            )
+
+    def _apply_add_ids(self, doc_hash: str, ids: List[int], reused: List[list]):
+        doc = self.documents.get(doc_hash)
+        if doc is None:
+            return
+        doc["ids"].extend(ids)
+        for vector_id, creator in reused:
+            doc["ids"].append(vector_id)
+            owners = self.shared.get(vector_id)
+            if owners is None:
+                owners = self.shared[vector_id] = []
+                if creator in self.documents and creator != doc_hash:
+                    owners.append(creator)
+            if doc_hash not in owners:
+                owners.append(doc_hash)
+
+    def unregister(self, doc_hash: str) -> List[int]:
+        """
+        Forget a document.
+
+        Returns:
+            vector ids no other document still uses (safe to delete)
+        """
+        with self._lock:
+            if doc_hash not in self.documents:
+                return []
+            return self._log("unregister", doc_hash)
+
+    def _apply_unregister(self, doc_hash: str) -> List[int]:
+        self._unindex(doc_hash)
+        doc = self.documents.pop(doc_hash, None)
+        if doc is None:
+            return []
+        orphaned = []
+        for vector_id in doc["ids"]:
+            owners = self.shared.get(vector_id)
+            if owners is None:
+                orphaned.append(vector_id)
+                continue
+            if doc_hash in owners:
+                owners.remove(doc_hash)
+            if not owners:
+                del self.shared[vector_id]
+                orphaned.append(vector_id)
+        return orphaned
+
+    def _log(self, op: str, *args):
+        """Apply a document change and queue it for the log."""
+        self._document_ops.append([op, *args])
+        return getattr(self, "_apply_" + op)(*args)
+
+    def display_source(self, vector_id: int, default: str) -> str:
+        """Filename to show for a vector that may be shared by documents."""
+        owners = self.shared.get(vector_id)
+        if owners and owners[0] in self.documents:
+            return self.documents[owners[0]]["filename"]
+        return default
+
+    # ------------------------------------------------------------------
+    # CHUNKS
+    # ------------------------------------------------------------------
+
+    def lookup_chunks(self, keys: List[int]) -> List[Optional[int]]:
+        """Vector id already holding each chunk key, or None."""
+        with self._lock:
+            found: List[Optional[int]] = [None] * len(keys)
+            if len(self._keys):
+                query = np.asarray(keys, dtype=np.int64)
+                pos = np.searchsorted(self._keys, query)
+                pos = np.minimum(pos, len(self._keys) - 1)
+                hit = self._keys[pos] == query
+                for i in np.flatnonzero(hit):
+                    if keys[i] not in self._removed:
+                        found[i] = int(self._ids[pos[i]])
+            for i, key in enumerate(keys):
+                if key in self._pending:
+                    found[i] = self._pending[key]
+            return found
+
+    def add_chunks(self, keys: List[int], ids: List[int]):
+        with self._lock:
+            for key, vector_id in zip(keys, ids):
+                self._chunk_ops.append((int(key), int(vector_id)))
+                self._apply_chunk(int(key), int(vector_id))
+
+    def remove_chunks(self, keys: Iterable[int]):
+        with self._lock:
+            for key in keys:
+                self._chunk_ops.append((int(key), -1))
+                self._apply_chunk(int(key), -1)
+
+    def _apply_chunk(self, key: int, vector_id: int):
+        if vector_id < 0:
+            self._pending.pop(key, None)
+            self._removed.add(key)
+        else:
+            self._pending[key] = vector_id
+            self._removed.discard(key)
+
+    # ------------------------------------------------------------------
+
+    def save(self):
+        """Append the changes since the last save; compact once logs are large."""
+        with self._lock:
+            ensure_dir(self.path)
+            files = self._files(self._generation)
+            if self._document_ops:
+                with open(files["documents_log"], "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(op) + "\n" for op in self._document_ops))
+                self._document_ops.clear()
+            if self._chunk_ops:
+                with open(files["chunks_log"], "ab") as f:
+                    f.write(np.asarray(self._chunk_ops, dtype=np.int64).tobytes())
+                self._chunk_ops.clear()
+
+            logged = sum(_size(files[name]) for name in ("documents_log", "chunks_log"))
+            snapshot = sum(_size(path) for path in (self.documents_path, files["keys"], files["ids"]))
+            if logged > max(snapshot, self.COMPACT_MIN_BYTES):
+                self._compact()
+
+    def _compact(self):
+        """Write the current state as the next generation; drop the old one."""
+        old = self._files(self._generation)
+        generation = self._generation + 1
+        files = self._files(generation)
+
+        keep = ~np.isin(self._keys, np.fromiter(self._removed, dtype=np.int64))
+        pending_keys = np.fromiter(self._pending.keys(), dtype=np.int64)
+        pending_ids = np.fromiter(self._pending.values(), dtype=np.int64)
+        keep &= ~np.isin(self._keys, pending_keys)
+        keys = np.concatenate([self._keys[keep], pending_keys])
+        ids = np.concatenate([self._ids[keep], pending_ids])
+        order = np.argsort(keys, kind="stable")
+        np.save(files["keys"], keys[order])
+        np.save(files["ids"], ids[order])
+
+        # documents.json names the generation, so replacing it commits.
+        tmp = self.documents_path.with_suffix(".tmp")
+        save_json(
+            {
+                "generation": generation,
+                "documents": self.documents,
+                "shared": {str(k): v for k, v in self.shared.items()},
+            },
+            tmp,
+        )
+        os.replace(tmp, self.documents_path)
+
+        self._generation = generation
+        self._keys, self._ids = keys[order], ids[order]
+        self._pending.clear()
+        self._removed.clear()
+        for path in old.values():
+            path.unlink(missing_ok=True)
+
+    def clear(self):
+        with self._lock:
+            self.documents_path.unlink(missing_ok=True)
+            if self.path.exists():
+                for path in self.path.glob("chunk*"):
+                    path.unlink()
+                for path in self.path.glob("documents.*.log"):
+                    path.unlink()
+            self._load()
+
+    def get_stats(self) -> dict:
+        return {
+            "documents": len(self.documents),
+            "unique_chunks": len(self._keys) + len(self._pending),
+            "shared_chunks": len(self.shared),
+        }
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
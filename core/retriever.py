@@ -1,27 +1,132 @@
 """
 Unified retrieval from PDF and memory stores.
 """
-from typing import List, Tuple
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
 from core.vectorstore import FAISSVectorStore
+from core.sharded_store import ShardedVectorStore
 from core.embeddings import EmbeddingGenerator
+from core.embedding_cache import CachedEmbeddingGenerator
+from core.registry import DocumentRegistry, chunk_key
+from core.lexical_index import BM25Index, reciprocal_rank_fusion
+from core.memory_retention import MemoryRetention, SUMMARY
+from core.shards import ShardPool, shard_dir
 from config import Config
 
 
 class UnifiedRetriever:
-    """Retrieve relevant content from PDF and conversation memory."""
+    """
+    Retrieve relevant content from PDF and conversation memory.
 
-    def __init__(self):
-        self.embeddings = EmbeddingGenerator()
+    One retriever serves one collection: the default one (``Config`` paths)
+    or a named one with its own indexes under ``Config.COLLECTIONS_DIR``.
+    Memory can further be split into namespaces (e.g. one per user), each
+    its own store, opened on first use and unloaded when idle; a query
+    only searches its namespace. Namespaces nothing was written to for
+    ``Config.MEMORY_NAMESPACE_IDLE_DAYS`` are deleted.
+    """
 
-        self.pdf_store = FAISSVectorStore(
-            index_path=Config.FAISS_INDEX_PATH,
-            metadata_path=Config.FAISS_METADATA_PATH,
-        )
+    def __init__(self, collection: str = None, embeddings=None):
+        """
+        Args:
+            collection: named collection, or None for the default one
+            embeddings: embedder shared with other collections' retrievers
+        """
+        self.collection = collection
+        if embeddings is None:
+            embeddings = EmbeddingGenerator()
+            if Config.ENABLE_EMBEDDING_CACHE:
+                embeddings = CachedEmbeddingGenerator(embeddings)
+        self.embeddings = embeddings
+        paths = self._paths(collection)
+
+        self.pdf_store = self._open_pdf_store(paths)
 
         self.memory_store = FAISSVectorStore(
-            index_path=Config.MEMORY_INDEX_PATH,
-            metadata_path=Config.MEMORY_METADATA_PATH,
+            index_path=paths["memory_index"],
+            metadata_path=paths["memory_metadata"],
+        )
+        self.memory_retention = MemoryRetention(self.memory_store, self.embeddings)
+        self.memory_namespaces: ShardPool[MemoryRetention] = ShardPool(
+            self._open_memory_namespace,
+            lambda retention: retention.store.close(),
+            base_dir=paths["memory_namespaces"],
         )
+        self._namespaces_expired_at = 0.0
+        self._expiry_lock = threading.Lock()
+
+        self.registry = DocumentRegistry(paths["registry"])
+
+        self.lexical = BM25Index(paths["lexical"])
+        self._sync_lexical()
+
+        # PDF and memory searches of one retrieve run side by side.
+        self._search_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search")
+
+    @staticmethod
+    def _paths(collection: Optional[str]) -> dict:
+        if collection is None:
+            return {
+                "pdf_index": Config.FAISS_INDEX_PATH,
+                "pdf_metadata": Config.FAISS_METADATA_PATH,
+                "pdf_shards": Config.PDF_SHARDS_DIR,
+                "memory_index": Config.MEMORY_INDEX_PATH,
+                "memory_metadata": Config.MEMORY_METADATA_PATH,
+                "memory_namespaces": Config.MEMORY_NAMESPACES_DIR,
+                "registry": Config.DOCUMENT_REGISTRY_DIR,
+                "lexical": Config.BM25_INDEX_DIR,
+            }
+        directory = shard_dir(Config.COLLECTIONS_DIR, collection)
+        return {
+            "pdf_index": directory / "pdf_index.faiss",
+            "pdf_metadata": directory / "pdf_metadata",
+            "pdf_shards": directory / "pdf_shards",
+            "memory_index": directory / "memory" / "memory_index.faiss",
+            "memory_metadata": directory / "memory" / "memory_metadata",
+            "memory_namespaces": directory / "memory" / "namespaces",
+            "registry": directory / "registry",
+            "lexical": directory / "pdf_lexical",
+        }
+
+    @staticmethod
+    def _open_pdf_store(paths: dict):
+        """Single store, or shards (seeded from the single store on first use)."""
+        shards_dir = paths["pdf_shards"]
+        if Config.PDF_SHARDS <= 1 and not (shards_dir / "shards.json").exists():
+            return FAISSVectorStore(
+                index_path=paths["pdf_index"], metadata_path=paths["pdf_metadata"]
+            )
+        legacy = None
+        if not (shards_dir / "shards.json").exists() and paths["pdf_index"].exists():
+            legacy = FAISSVectorStore(
+                index_path=paths["pdf_index"], metadata_path=paths["pdf_metadata"]
+            )
+        return ShardedVectorStore(shards_dir, import_from=legacy)
+
+    def _open_memory_namespace(self, namespace: str) -> MemoryRetention:
+        directory = shard_dir(self.memory_namespaces.base_dir, namespace)
+        store = FAISSVectorStore(
+            index_path=directory / "memory_index.faiss",
+            metadata_path=directory / "memory_metadata",
+        )
+        return MemoryRetention(store, self.embeddings)
+
+    @contextmanager
+    def _memory(self, namespace: Optional[str]) -> Iterator[MemoryRetention]:
+        """
+        Memory store (with its retention) of ``namespace``, leased so it is
+        not unloaded while in use; None is the shared one.
+        """
+        if namespace is None:
+            yield self.memory_retention
+            return
+        with self.memory_namespaces.lease(namespace) as memory:
+            yield memory
 
     # ------------------------------------------------------------------
     # RETRIEVAL
@@ -33,42 +138,137 @@ class UnifiedRetriever:
         top_k_pdf: int = Config.TOP_K_RETRIEVAL,
         top_k_memory: int = Config.MEMORY_TOP_K,
         threshold: float = Config.SIMILARITY_THRESHOLD,
+        namespace: str = None,
     ) -> Tuple[List[str], List[dict]]:
         """
         Retrieve relevant texts from both PDF and memory stores.
         """
-        query_embedding = self.embeddings.embed_query(query)
-        if not query_embedding:
-            return [], []
+        return self.retrieve_many([query], top_k_pdf, top_k_memory, threshold, namespace)[0]
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        top_k_pdf: int = Config.TOP_K_RETRIEVAL,
+        top_k_memory: int = Config.MEMORY_TOP_K,
+        threshold: float = Config.SIMILARITY_THRESHOLD,
+        namespace: str = None,
+    ) -> List[Tuple[List[str], List[dict]]]:
+        """
+        ``retrieve`` for a batch of queries.
 
-        pdf_results = self.pdf_store.search(query_embedding, k=top_k_pdf)
-        memory_results = self.memory_store.search(query_embedding, k=top_k_memory)
+        All queries are embedded as one matrix and each store gets a single
+        batched FAISS range search for hits above ``threshold`` (cosine
+        similarity); the PDF and memory searches run concurrently (FAISS
+        releases the GIL) while keyword search runs on this thread. Memory
+        is searched in ``namespace`` only.
 
+        Returns:
+            one (texts, metadata) pair per query, in order
+        """
+        results: List[Tuple[List[str], List[dict]]] = [([], []) for _ in queries]
+        rows = [i for i, query in enumerate(queries) if query and query.strip()]
+        if not rows:
+            return results
+        batch = [queries[i] for i in rows]
+        query_embeddings = self.embeddings.embed_texts(batch)
+
+        hybrid = Config.ENABLE_HYBRID_SEARCH
+        pdf_k = max(top_k_pdf, Config.HYBRID_CANDIDATES) if hybrid else top_k_pdf
+        pdf_search = self._search_pool.submit(
+            self.pdf_store.range_search_many, query_embeddings, threshold, pdf_k
+        )
+        with self._memory(namespace) as memory:
+            memory_search = self._search_pool.submit(
+                memory.store.range_search_many, query_embeddings, threshold, top_k_memory
+            )
+            lexical = [self.lexical.search(query, k=pdf_k) for query in batch] if hybrid else None
+            memory_results = memory_search.result()
+
+        pdf_results = pdf_search.result()
+        if hybrid:
+            pdf_results = self._fuse(pdf_results, lexical, top_k_pdf)
+
+        for row, pdf_hits, memory_hits in zip(rows, pdf_results, memory_results):
+            results[row] = self._format_hits(pdf_hits[:top_k_pdf], memory_hits)
+        return results
+
+    def _fuse(
+        self,
+        vector_results: List[List[Tuple[int, float, dict]]],
+        lexical_results: List[List[Tuple[int, float]]],
+        top_k: int,
+    ) -> List[List[Tuple[int, Optional[float], dict]]]:
+        """
+        Per query, fuse vector and BM25 hits by reciprocal rank.
+
+        Vector hits arrive already above the similarity threshold. Keyword
+        hits are not held to it (they have no cosine score); they take part
+        when their BM25 score reaches ``Config.BM25_MIN_SCORE`` and come back
+        with ``similarity`` None.
+        """
+        fused_ids, missing = [], set()
+        for vector_hits, lexical_hits in zip(vector_results, lexical_results):
+            by_id = {hit[0]: hit for hit in vector_hits}
+            keyword_ids = [
+                vector_id for vector_id, score in lexical_hits
+                if score >= Config.BM25_MIN_SCORE
+            ]
+            fused = reciprocal_rank_fusion([list(by_id), keyword_ids])[:top_k]
+            fused_ids.append((by_id, fused))
+            missing.update(vector_id for vector_id, _ in fused if vector_id not in by_id)
+
+        # get_metadata skips deleted ids the lexical index may not know about yet.
+        lexical_meta = {
+            meta["vector_id"]: meta for meta in self.pdf_store.get_metadata(sorted(missing))
+        }
+
+        results = []
+        for by_id, fused in fused_ids:
+            hits = []
+            for vector_id, _ in fused:
+                if vector_id in by_id:
+                    hits.append(by_id[vector_id])
+                elif vector_id in lexical_meta:
+                    hits.append((vector_id, None, lexical_meta[vector_id]))
+            results.append(hits)
+        return results
+
+    def _format_hits(
+        self,
+        pdf_hits: List[Tuple[int, Optional[float], dict]],
+        memory_hits: List[Tuple[int, float, dict]],
+    ) -> Tuple[List[str], List[dict]]:
         texts = []
         metadata = []
 
-        for _, similarity, meta in pdf_results:
-            if similarity >= threshold:
-                texts.append(meta.get("text", ""))
-                metadata.append(
-                    {
-                        "source": meta.get("source", "Unknown"),
-                        "type": "pdf",
-                        "similarity": float(similarity),
-                    }
-                )
+        for vector_id, similarity, meta in pdf_hits:
+            texts.append(meta.get("text", ""))
+            metadata.append(
+                {
+                    "source": self.registry.display_source(
+                        vector_id, meta.get("source", "Unknown")
+                    ),
+                    "type": "pdf",
+                    "vector_id": vector_id,
+                    # None for chunks found by keyword match alone
+                    "similarity": float(similarity) if similarity is not None else None,
+                    # Word span within the document, for merging overlapping hits
+                    "document": meta.get("doc_hash") or meta.get("source"),
+                    "chunk_start": meta.get("chunk_start"),
+                }
+            )
 
-        for _, similarity, meta in memory_results:
-            if similarity >= threshold:
-                texts.append(meta.get("text", ""))
-                metadata.append(
-                    {
-                        "source": "Memory",
-                        "type": "memory",
-                        "timestamp": meta.get("timestamp", ""),
-                        "similarity": float(similarity),
-                    }
-                )
+        for vector_id, similarity, meta in memory_hits:
+            texts.append(meta.get("text", ""))
+            metadata.append(
+                {
+                    "source": "Memory summary" if meta.get("kind") == SUMMARY else "Memory",
+                    "type": "memory",
+                    "vector_id": vector_id,
+                    "timestamp": meta.get("timestamp", ""),
+                    "similarity": float(similarity),
+                }
+            )
 
         return texts, metadata
 
@@ -89,61 +289,302 @@ class UnifiedRetriever:
             ...
         ]
         """
-        if not documents:
-            return 0
+        embeddings, metadata_list = self.embed_documents(documents)
+        added = self.add_embedded_documents(embeddings, metadata_list)
+        self.registry.save()
+        self.lexical.save()
+        return added
+
+    def embed_documents(self, documents: List[dict]) -> Tuple[np.ndarray, List[dict]]:
+        """
+        Embed PDF chunks without touching the store.
 
+        Returns:
+            (embeddings, metadata_list) ready for add_embedded_documents
+        """
         texts = []
         metadata_list = []
 
-        for doc in documents:
+        for doc in documents or []:
             text = doc.get("text")
             meta = doc.get("metadata", {})
 
             if text and text.strip():
                 texts.append(text)
-                meta["text"] = text  # store text for retrieval
+                # Kept in full even though char_start / char_end locate it:
+                # the offsets index the text extracted from the PDF, which
+                # is not stored, and hits, BM25 and the context packer all
+                # need it without re-parsing the PDF per query.
+                meta["text"] = text
                 metadata_list.append(meta)
 
         if not texts:
+            return np.empty((0, self.embeddings.dimension), dtype=np.float32), []
+
+        return self.embeddings.embed_texts(texts), metadata_list
+
+    def add_embedded_documents(
+        self, embeddings: np.ndarray, metadata_list: List[dict]
+    ) -> int:
+        """
+        Add already-embedded PDF chunks to the vector store.
+
+        Chunks whose exact text is already indexed reuse the existing
+        vector instead of adding a copy. Chunks carrying a ``doc_hash`` are
+        recorded against that document in the registry.
+
+        Returns:
+            Number of chunks now searchable for these documents
+        """
+        if len(embeddings) == 0:
             return 0
 
-        embeddings = self.embeddings.embed_texts(texts)
-        if not embeddings:
+        keys = [chunk_key(meta["text"]) for meta in metadata_list]
+        existing = self.registry.lookup_chunks(keys)
+
+        new_rows = []
+        first_row = {}
+        reused_rows = []
+        for row, (key, vector_id) in enumerate(zip(keys, existing)):
+            if vector_id is not None and self.pdf_store.contains(vector_id):
+                reused_rows.append((row, vector_id))
+            elif key in first_row:
+                reused_rows.append((row, None))  # repeated within this batch
+            else:
+                first_row[key] = row
+                new_rows.append(row)
+
+        ids = self.pdf_store.add(
+            embeddings[new_rows], [metadata_list[row] for row in new_rows]
+        )
+        self.registry.add_chunks([keys[row] for row in new_rows], ids)
+        self.lexical.add(ids, [metadata_list[row]["text"] for row in new_rows])
+        id_of_key = {keys[row]: vector_id for row, vector_id in zip(new_rows, ids)}
+
+        created: Dict[str, List[int]] = {}
+        reused: Dict[str, List[Tuple[int, Optional[str]]]] = {}
+        for row, vector_id in zip(new_rows, ids):
+            doc_hash = metadata_list[row].get("doc_hash")
+            created.setdefault(doc_hash, []).append(vector_id)
+        for row, vector_id in reused_rows:
+            doc_hash = metadata_list[row].get("doc_hash")
+            if vector_id is None:
+                vector_id = id_of_key[keys[row]]
+                creator = metadata_list[first_row[keys[row]]].get("doc_hash")
+            else:
+                creator = self.pdf_store.get_metadata([vector_id])[0].get("doc_hash")
+            if creator == doc_hash:
+                continue  # same text twice in one document
+            reused.setdefault(doc_hash, []).append((vector_id, creator))
+
+        for doc_hash in set(created) | set(reused):
+            if doc_hash is not None:
+                self.registry.add_ids(
+                    doc_hash, created.get(doc_hash, []), reused.get(doc_hash, [])
+                )
+
+        return len(new_rows) + len(reused_rows)
+
+    def remove_document_hash(self, doc_hash: str) -> int:
+        """
+        Remove a registered document's vectors from search.
+
+        Vectors still used by another document are kept.
+
+        Returns:
+            Number of vectors deleted
+        """
+        orphaned = self.registry.unregister(doc_hash)
+        records = self.pdf_store.get_metadata(orphaned)
+        self.registry.remove_chunks(chunk_key(meta["text"]) for meta in records)
+        deleted = self.pdf_store.delete(orphaned)
+        self.lexical.remove(orphaned)
+        self.registry.save()
+        self.lexical.save()
+        return deleted
+
+    def remove_document(self, source: str, keep: str = None) -> int:
+        """
+        Remove every copy of a PDF by filename, touching only its vectors.
+
+        ``keep`` spares the copy with that content hash (a new version that
+        was just indexed); vectors it shares with the old copies stay.
+
+        Returns:
+            Number of vectors deleted
+        """
+        doc_hashes = [h for h in self.registry.find_by_filename(source) if h != keep]
+        if not doc_hashes:
+            # Indexed before the registry existed; find it by source column.
+            ids = self.pdf_store.ids_for_source(source)
+            if keep is not None:
+                ids = [
+                    meta["vector_id"] for meta in self.pdf_store.get_metadata(ids)
+                    if meta.get("doc_hash") != keep
+                ]
+            self.lexical.remove(ids)
+            self.lexical.save()
+            return self.pdf_store.delete(ids)
+        return sum(self.remove_document_hash(h) for h in doc_hashes)
+
+    def replace_document(self, source: str, documents: List[dict]) -> int:
+        """
+        Re-index one PDF in place: add the new chunks, then drop the old ones.
+
+        The old version is only removed once the new one is indexed, so a
+        failure on the way leaves it searchable. New chunks without a
+        ``doc_hash`` get one from their text, to tell them from the old.
+
+        Returns:
+            Number of chunks indexed
+        """
+        embeddings, metadata_list = self.embed_documents(documents)
+        if not metadata_list:
             return 0
+        doc_hash = next((m["doc_hash"] for m in metadata_list if m.get("doc_hash")), None)
+        if doc_hash is None:
+            digest = hashlib.sha256()
+            for meta in metadata_list:
+                digest.update(meta["text"].encode("utf-8"))
+            doc_hash = digest.hexdigest()
+        for meta in metadata_list:
+            meta["doc_hash"] = doc_hash
+        registered = self.registry.get(doc_hash) is None
+        if registered:
+            self.registry.register(
+                doc_hash, source, sum(len(meta["text"]) for meta in metadata_list)
+            )
 
-        ids = self.pdf_store.add(embeddings, metadata_list)
-        return len(ids)
+        try:
+            added = self.add_embedded_documents(embeddings, metadata_list)
+        except BaseException:
+            if registered:
+                self.remove_document_hash(doc_hash)  # and any chunks it got
+            raise
+        self.remove_document(source, keep=doc_hash)
+        self.registry.save()
+        self.lexical.save()
+        return added
+
+    def list_documents(self) -> List[dict]:
+        """Registered PDFs, newest first."""
+        documents = [
+            {
+                "doc_hash": doc_hash,
+                "filename": doc["filename"],
+                "size": doc["size"],
+                "added": doc["added"],
+                "chunks": len(doc["ids"]),
+            }
+            for doc_hash, doc in self.registry.documents.items()
+        ]
+        return sorted(documents, key=lambda d: d["added"], reverse=True)
 
     # ------------------------------------------------------------------
     # MEMORY INDEXING
     # ------------------------------------------------------------------
 
-    def add_memory(self, text: str, timestamp: str) -> bool:
+    def add_memory(
+        self, text: str, timestamp: str, session: str = None, namespace: str = None
+    ) -> bool:
         """
-        Add conversation to memory store.
+        Add conversation to memory store (of ``namespace``, if given).
+
+        The store is kept bounded by its ``MemoryRetention``, which evicts
+        old turns into summary vectors every few additions.
         """
         embedding = self.embeddings.embed_text(text)
-        if not embedding:
+        if embedding is None:
             return False
 
         metadata = {
             "text": text,
             "timestamp": timestamp,
             "source": "conversation",
+            "session": session or Config.DEFAULT_SESSION,
         }
 
-        ids = self.memory_store.add([embedding], [metadata])
+        with self._memory(namespace) as memory:
+            ids = memory.store.add(embedding.reshape(1, -1), [metadata])
+            memory.record_added(len(ids))
+        if namespace is not None:
+            self._expire_memory_namespaces()
         return len(ids) > 0
 
+    def _expire_memory_namespaces(self):
+        """
+        Delete idle namespaces, at most once an hour: retention only runs
+        on namespaces that are written to, so abandoned ones would stay.
+        """
+        if Config.MEMORY_NAMESPACE_IDLE_DAYS is None:
+            return
+        with self._expiry_lock:
+            if self._namespaces_expired_at and time.monotonic() - self._namespaces_expired_at < 3600:
+                return
+            self._namespaces_expired_at = time.monotonic()
+        expired = self.memory_namespaces.expire(Config.MEMORY_NAMESPACE_IDLE_DAYS * 86400)
+        if expired:
+            print(f"🧹 Deleted {len(expired)} idle memory namespaces")
+
+    # ------------------------------------------------------------------
+    # SHARED-PROCESS SUPPORT
+    # ------------------------------------------------------------------
+
+    def refresh_if_changed(self) -> bool:
+        """Reload any store whose files were changed by another process."""
+        pdf_changed = self.pdf_store.refresh_if_changed()
+        memory_changed = self.memory_store.refresh_if_changed()
+        for _, memory in self.memory_namespaces.items():
+            memory_changed = memory.store.refresh_if_changed() or memory_changed
+        if pdf_changed:
+            self.registry.reload()
+            self.lexical.reload()
+            self._sync_lexical()
+        return pdf_changed or memory_changed
+
+    def _sync_lexical(self):
+        """Index PDF chunks the lexical index has not seen (new or legacy stores)."""
+        if self.lexical.last_id >= self.pdf_store.last_id:
+            return
+        indexed = 0
+        for records in self.pdf_store.iter_records(after_id=self.lexical.last_id):
+            self.lexical.add(
+                [meta["vector_id"] for meta in records], [meta["text"] for meta in records]
+            )
+            indexed += len(records)
+        self.lexical.save()
+        if indexed:
+            print(f"🔤 Keyword-indexed {indexed} PDF chunks")
+
     # ------------------------------------------------------------------
     # STATS
     # ------------------------------------------------------------------
 
-    def get_stats(self) -> dict:
-        """Get retriever statistics."""
-        return {
-            "pdf_vectors": self.pdf_store.get_size(),
-            "memory_vectors": self.memory_store.get_size(),
-            "total_vectors": self.pdf_store.get_size()
-            + self.memory_store.get_size(),
-        }
+    def get_stats(self, namespace: str = None) -> dict:
+        """Get retriever statistics; memory ones are for ``namespace``."""
+        with self._memory(namespace) as memory:
+            memory_vectors = memory.store.get_size()
+            stats = {
+                "pdf_vectors": self.pdf_store.get_size(),
+                "memory_vectors": memory_vectors,
+                "total_vectors": self.pdf_store.get_size() + memory_vectors,
+            }
+            stats["memory_index"] = memory.store.get_stats()
+            stats["memory_retention"] = memory.get_stats()
+        stats["pdf_index"] = self.pdf_store.get_stats()
+        stats["documents"] = self.registry.get_stats()["documents"]
+        stats["lexical"] = self.lexical.get_stats()
+        stats["memory_namespaces"] = self.memory_namespaces.get_stats()
+        if isinstance(self.embeddings, CachedEmbeddingGenerator):
+            stats["embedding_cache"] = self.embeddings.get_stats()
+        return stats
+
+    def close(self):
+        """
+        Settle background work before an idle collection is unloaded.
+
+        Stays usable: a session still holding the retriever keeps working.
+        """
+        self.memory_namespaces.close()
+        for store in (self.pdf_store, self.memory_store):
+            store.close()
@@ -0,0 +1,515 @@
+"""
+Vector store split across several FAISS indexes by document.
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from config import Config
+from core.utils import ensure_dir
+from core.vectorstore import FAISSVectorStore
+
+
+_HASH_SPACE = 1 << 64
+
+
+def document_hash(meta: dict) -> int:
+    """Position of a chunk's document in the 64-bit routing space."""
+    key = str(meta.get("doc_hash") or meta.get("source") or "")
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class ShardedVectorStore:
+    """
+    ``FAISSVectorStore`` API over N shard stores, one directory each.
+
+    Every document is routed by ``document_hash`` to the shard owning that
+    part of the hash space, so all chunks of a document live together and
+    a shard's size is bounded by its range, not by one process's RAM for
+    the whole corpus. ``shards.json`` (replaced atomically) lists the
+    shards and their ranges.
+
+    - vector ids are allocated globally and stay stable; each shard stores
+      them as given, so registry and keyword index ids remain valid
+    - searches fan out to every shard on a thread pool (FAISS releases the
+      GIL) and the per-shard top hits are merged with a heap
+    - a shard past ``max_shard_vectors`` is split in the background at
+      the median document hash: the upper half is copied to a new shard
+      while searches and writes go on; then, under the lock, writes made
+      meanwhile are caught up, the manifest switches over and the old
+      shard tombstones the moved vectors (redone on load if a crash
+      interrupted it)
+    - created empty, or from an existing single store's vectors
+      (``import_from``), whose ids are kept
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        num_shards: int = None,
+        max_shard_vectors: int = None,
+        index_type: str = None,
+        workers: int = None,
+        import_from: FAISSVectorStore = None,
+    ):
+        self.directory = directory
+        self.manifest_path = directory / "shards.json"
+        self.max_shard_vectors = max_shard_vectors or Config.SHARD_MAX_VECTORS
+        self.index_type = index_type
+        self.workers = workers or Config.SHARD_SEARCH_WORKERS
+
+        self._lock = threading.RLock()
+        self._shards: Dict[str, FAISSVectorStore] = {}
+        self._bounds: List[int] = []  # lower bound of each range, ascending
+        self._names: List[str] = []  # shard owning each range
+        self._next_shard = 0
+        self._cleanup: List[str] = []
+        self._unsplittable: Dict[str, int] = {}
+        self._manifest_mtime = None
+        self._splitter = None
+        self._split_requests: List[str] = []
+        self._splitting = None  # shard being filled by a running split
+        self._split_deleted = None  # ids deleted while it copies
+
+        ensure_dir(directory)
+        if self.manifest_path.exists():
+            self._load()
+        else:
+            self._create(num_shards or Config.PDF_SHARDS, import_from)
+
+        self._pool = self._make_pool()
+
+    # ------------------------------------------------------------------
+    # LAYOUT
+    # ------------------------------------------------------------------
+
+    def _make_pool(self) -> ThreadPoolExecutor:
+        # One thread per shard unless capped: FAISS searches a single query
+        # on one core, so shards are what spreads it over cores.
+        return ThreadPoolExecutor(
+            max_workers=self.workers or len(self._names), thread_name_prefix="shard"
+        )
+
+    def _open(self, name: str) -> FAISSVectorStore:
+        return FAISSVectorStore(
+            index_path=self.directory / name / "index.faiss",
+            metadata_path=self.directory / name / "metadata",
+            index_type=self.index_type,
+        )
+
+    def _new_name(self) -> str:
+        name = f"shard-{self._next_shard:04d}"
+        self._next_shard += 1
+        shutil.rmtree(self.directory / name, ignore_errors=True)  # left by a crash
+        return name
+
+    def _create(self, num_shards: int, import_from: FAISSVectorStore):
+        step = _HASH_SPACE // num_shards
+        for i in range(num_shards):
+            name = self._new_name()
+            self._shards[name] = self._open(name)
+            self._bounds.append(i * step)
+            self._names.append(name)
+
+        if import_from is not None and import_from.get_size():
+            imported = 0
+            for records in import_from.iter_records():
+                vectors, records = import_from.export([meta["vector_id"] for meta in records])
+                self._route_add(vectors, records, [meta["vector_id"] for meta in records])
+                imported += len(records)
+            for store in self._shards.values():
+                store.save()
+            print(f"🔀 Split {imported} vectors into {num_shards} shards")
+        self._write_manifest()
+
+    def _load(self):
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._bounds = [int(shard["start"]) for shard in manifest["shards"]]
+        self._names = [shard["name"] for shard in manifest["shards"]]
+        self._next_shard = manifest["next_shard"]
+        self._cleanup = manifest.get("cleanup", [])
+        self._manifest_mtime = self.manifest_path.stat().st_mtime_ns
+
+        for name in self._names:
+            if name not in self._shards:
+                self._shards[name] = self._open(name)
+        for name in list(self._shards):
+            if name not in self._names:
+                self._shards.pop(name).close()
+        for path in self.directory.iterdir():  # a split that never committed
+            if path.is_dir() and path.name not in self._shards and path.name != self._splitting:
+                shutil.rmtree(path, ignore_errors=True)
+        if self._cleanup:
+            self._finish_split()
+
+    def _write_manifest(self):
+        manifest = {
+            "shards": [
+                {"name": name, "start": start} for start, name in zip(self._bounds, self._names)
+            ],
+            "next_shard": self._next_shard,
+            "cleanup": self._cleanup,
+        }
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+        self._manifest_mtime = self.manifest_path.stat().st_mtime_ns
+
+    def _owner(self, position: int) -> str:
+        return self._names[bisect.bisect_right(self._bounds, position) - 1]
+
+    def _range(self, name: str) -> Tuple[int, int]:
+        i = self._names.index(name)
+        end = self._bounds[i + 1] if i + 1 < len(self._bounds) else _HASH_SPACE
+        return self._bounds[i], end
+
+    # ------------------------------------------------------------------
+    # WRITES
+    # ------------------------------------------------------------------
+
+    @property
+    def next_id(self) -> int:
+        with self._lock:
+            return max(store.next_id for store in self._shards.values())
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return max(store.last_id for store in self._shards.values())
+
+    def add(self, embeddings: np.ndarray, metadata_list: List[dict]) -> List[int]:
+        """Route each chunk to its document's shard; returns ids in input order."""
+        if len(embeddings) == 0 or not metadata_list:
+            return []
+        with self._lock:
+            # One consecutive id block per shard keeps each shard's WAL
+            # record a single ascending run.
+            groups: Dict[str, List[int]] = {}
+            for row, meta in enumerate(metadata_list):
+                groups.setdefault(self._owner(document_hash(meta)), []).append(row)
+            ids = [0] * len(metadata_list)
+            next_id = self.next_id
+            for name, rows in groups.items():
+                block = list(range(next_id, next_id + len(rows)))
+                next_id += len(rows)
+                self._shards[name].add(
+                    embeddings[rows], [metadata_list[row] for row in rows], ids=block
+                )
+                for row, vector_id in zip(rows, block):
+                    ids[row] = vector_id
+            for name in groups:
+                if self._needs_split(name):
+                    self._schedule_split(name)
+        return ids
+
+    def _route_add(self, vectors: np.ndarray, records: List[dict], ids: List[int]):
+        """Add records that already have (ascending) ids to their shards."""
+        groups: Dict[str, List[int]] = {}
+        for row, meta in enumerate(records):
+            groups.setdefault(self._owner(document_hash(meta)), []).append(row)
+        for name, rows in groups.items():
+            self._shards[name].add(
+                vectors[rows],
+                [{k: v for k, v in records[row].items() if k != "vector_id"} for row in rows],
+                ids=[ids[row] for row in rows],
+            )
+
+    def delete(self, ids: List[int]) -> int:
+        ids = list(ids)
+        with self._lock:
+            if self._split_deleted is not None:
+                self._split_deleted.extend(ids)
+            return sum(store.delete(ids) for store in self._shards.values())
+
+    def is_deleted(self, vector_id: int) -> bool:
+        return not self.contains(vector_id)
+
+    def contains(self, vector_id: int) -> bool:
+        with self._lock:
+            return any(store.contains(vector_id) for store in self._shards.values())
+
+    # ------------------------------------------------------------------
+    # REBALANCING
+    # ------------------------------------------------------------------
+
+    def _needs_split(self, name: str) -> bool:
+        size = self._shards[name].get_size()
+        return size > self.max_shard_vectors and size >= 2 * self._unsplittable.get(name, 0)
+
+    def _schedule_split(self, name: str):
+        with self._lock:
+            if name not in self._split_requests:
+                self._split_requests.append(name)
+            if self._splitter is not None and self._splitter.is_alive():
+                return
+            self._splitter = threading.Thread(
+                target=self._split_worker, name="shard-split", daemon=True
+            )
+            self._splitter.start()
+
+    def _split_worker(self):
+        while True:
+            with self._lock:
+                if not self._split_requests:
+                    return
+                name = self._split_requests.pop(0)
+            self._split(name)
+
+    def _split(self, name: str):
+        """
+        Move the upper half of shard ``name`` (by document hash) to a new one.
+
+        Only the switch holds the lock: the bulk copy runs while the shard
+        keeps serving, and the records added or deleted meanwhile are
+        reconciled right before the manifest changes.
+        """
+        with self._lock:
+            if name not in self._shards or not self._needs_split(name):
+                return
+            store = self._shards[name]
+            size = store.get_size()
+        positions = np.sort(np.fromiter(
+            (document_hash(meta) for records in store.iter_records() for meta in records),
+            dtype=np.uint64,
+        ))
+        split = int(positions[len(positions) // 2])
+        if split <= int(positions[0]):
+            # One document is most of the shard: retry once it has doubled.
+            with self._lock:
+                self._unsplittable[name] = size
+            return
+
+        with self._lock:
+            new_name = self._splitting = self._new_name()
+            self._split_deleted = []
+        try:
+            new_store = self._open(new_name)
+            moved, last_id = self._copy_upper(store, new_store, split)
+            new_store.save()
+        except BaseException:
+            with self._lock:
+                self._splitting = self._split_deleted = None
+            shutil.rmtree(self.directory / new_name, ignore_errors=True)
+            raise
+
+        with self._lock:
+            caught_up, _ = self._copy_upper(store, new_store, split, after_id=last_id)
+            moved += caught_up
+            new_store.delete(self._split_deleted)
+
+            # The manifest switch is the commit point; the old shard's copies
+            # are dropped right after (``cleanup`` replays this after a crash).
+            i = self._names.index(name)
+            self._bounds.insert(i + 1, split)
+            self._names.insert(i + 1, new_name)
+            self._shards[new_name] = new_store
+            self._cleanup = [name]
+            self._write_manifest()
+            store.delete(moved)
+            self._cleanup = []
+            self._write_manifest()
+            self._splitting = self._split_deleted = None
+            if not self.workers:
+                # Searches already running keep the old pool; it is not shut down.
+                self._pool = self._make_pool()
+        print(f"🔀 Split {name}: moved {len(moved)} vectors to {new_name}")
+
+    @staticmethod
+    def _copy_upper(
+        store: FAISSVectorStore, dest: FAISSVectorStore, split: int, after_id: int = -1
+    ) -> Tuple[List[int], int]:
+        """
+        Copy ``store``'s live records with an id above ``after_id`` and a
+        document hash at or above ``split`` into ``dest``.
+
+        Returns the copied ids and the last id looked at.
+        """
+        moved = []
+        for records in store.iter_records(after_id):
+            after_id = records[-1]["vector_id"] if records else after_id
+            ids = [meta["vector_id"] for meta in records if document_hash(meta) >= split]
+            vectors, records = store.export(ids)
+            if records:
+                dest.add(
+                    vectors,
+                    [{k: v for k, v in meta.items() if k != "vector_id"} for meta in records],
+                    ids=[meta["vector_id"] for meta in records],
+                )
+                moved.extend(meta["vector_id"] for meta in records)
+        return moved, after_id
+
+    def _finish_split(self):
+        """Drop vectors a shard still holds outside its range."""
+        for name in self._cleanup:
+            store = self._shards[name]
+            start, end = self._range(name)
+            stray = [
+                meta["vector_id"]
+                for records in store.iter_records()
+                for meta in records
+                if not start <= document_hash(meta) < end
+            ]
+            store.delete(stray)
+            store.save()
+        self._cleanup = []
+        self._write_manifest()
+
+    # ------------------------------------------------------------------
+    # SEARCH
+    # ------------------------------------------------------------------
+
+    def _fan_out(self, method: str, *args) -> List[List[List[Tuple[int, float, dict]]]]:
+        with self._lock:
+            stores = list(self._shards.values())
+            pool = self._pool
+        if len(stores) == 1:
+            return [getattr(stores[0], method)(*args)]
+        futures = [pool.submit(getattr(store, method), *args) for store in stores]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _merge(per_shard, k: int) -> List[List[Tuple[int, float, dict]]]:
+        """Top ``k`` hits per query across shards, best first."""
+        return [
+            heapq.nlargest(k, (hit for hits in query_hits for hit in hits), key=lambda h: h[1])
+            for query_hits in zip(*per_shard)
+        ]
+
+    def search(self, query_embedding: np.ndarray, k: int = 5) -> List[Tuple[int, float, dict]]:
+        return self.search_many(np.asarray(query_embedding).reshape(1, -1), k)[0]
+
+    def search_many(
+        self, query_embeddings: np.ndarray, k: int = 5
+    ) -> List[List[Tuple[int, float, dict]]]:
+        return self._merge(self._fan_out("search_many", query_embeddings, k), k)
+
+    def range_search_many(
+        self, query_embeddings: np.ndarray, threshold: float, max_results: int = 100
+    ) -> List[List[Tuple[int, float, dict]]]:
+        return self._merge(
+            self._fan_out("range_search_many", query_embeddings, threshold, max_results),
+            max_results,
+        )
+
+    # ------------------------------------------------------------------
+    # RECORDS
+    # ------------------------------------------------------------------
+
+    def get_metadata(self, ids: List[int]) -> List[dict]:
+        ids = [int(i) for i in ids]
+        with self._lock:
+            found = {
+                meta["vector_id"]: meta
+                for store in self._shards.values()
+                for meta in store.get_metadata(ids)
+            }
+        return [found[i] for i in ids if i in found]
+
+    def iter_records(self, after_id: int = -1, batch_size: int = 4096) -> Iterator[List[dict]]:
+        """Live records above ``after_id`` from every shard, merged in id order."""
+        with self._lock:
+            stores = list(self._shards.values())
+        streams = [
+            (meta for records in store.iter_records(after_id, batch_size) for meta in records)
+            for store in stores
+        ]
+        batch = []
+        for meta in heapq.merge(*streams, key=lambda meta: meta["vector_id"]):
+            batch.append(meta)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def ids_for_source(self, source: str) -> List[int]:
+        with self._lock:
+            return sorted(
+                i for store in self._shards.values() for i in store.ids_for_source(source)
+            )
+
+    def remove_document(self, source: str) -> int:
+        return self.delete(self.ids_for_source(source))
+
+    def replace_document(
+        self, source: str, embeddings: np.ndarray, metadata_list: List[dict]
+    ) -> List[int]:
+        with self._lock:
+            old_ids = self.ids_for_source(source)  # removed once the new ones are in
+            ids = self.add(embeddings, metadata_list)
+            self.delete(old_ids)
+            return ids
+
+    # ------------------------------------------------------------------
+
+    def save(self):
+        with self._lock:
+            for store in self._shards.values():
+                store.save()
+
+    def refresh_if_changed(self) -> bool:
+        with self._lock:
+            changed = False
+            if self.manifest_path.stat().st_mtime_ns != self._manifest_mtime:
+                self._load()
+                changed = True
+            for store in self._shards.values():
+                changed = store.refresh_if_changed() or changed
+            return changed
+
+    def clear(self):
+        with self._lock:
+            for store in self._shards.values():
+                store.clear()
+
+    def close(self):
+        """Wait for a running split, then for each shard's compaction."""
+        splitter = self._splitter
+        if splitter is not None:
+            splitter.join()
+        with self._lock:
+            for store in self._shards.values():
+                store.close()
+
+    @property
+    def index_kind(self) -> str:
+        with self._lock:
+            kinds = sorted({store.index_kind for store in self._shards.values()})
+            return f"{len(self._shards)} shards of {'/'.join(kinds)}"
+
+    @property
+    def version(self) -> str:
+        with self._lock:
+            return "|".join(self._shards[name].version for name in self._names)
+
+    def get_size(self) -> int:
+        with self._lock:
+            return sum(store.get_size() for store in self._shards.values())
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            shards = {name: self._shards[name].get_stats() for name in self._names}
+        index_bytes = sum(stats["index_bytes"] for stats in shards.values())
+        indexed = sum(stats["indexed"] for stats in shards.values())
+        return {
+            "shards": len(shards),
+            "sizes": {name: stats["vectors"] for name, stats in shards.items()},
+            "vectors": sum(stats["vectors"] for stats in shards.values()),
+            "indexed": indexed,
+            "index_kinds": sorted({stats["index_kind"] for stats in shards.values()}),
+            "encodings": sorted({stats["encoding"] for stats in shards.values()}),
+            "index_bytes": index_bytes,
+            "bytes_per_vector": index_bytes / indexed if indexed else 0.0,
+            "raw_vector_bytes": sum(stats["raw_vector_bytes"] for stats in shards.values()),
+        }
@@ -0,0 +1,211 @@
+"""
+Named shards (collections, namespaces) opened on demand, idle ones unloaded.
+"""
+import re
+import shutil
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Generic, List, Tuple, TypeVar
+
+from config import Config
+
+
+T = TypeVar("T")
+
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def shard_dir(base_dir: Path, name: str) -> Path:
+    """Directory of shard ``name`` under ``base_dir``; rejects unsafe names."""
+    if not _NAME.match(name or "") or name.endswith("."):
+        raise ValueError(f"Invalid collection or namespace name: {name!r}")
+    return base_dir / name
+
+
+class ShardPool(Generic[T]):
+    """
+    Lazily opened shards, keyed by name, with LRU unloading.
+
+    ``open_shard(name)`` opens (or creates) a shard the first time it is
+    asked for; past ``max_loaded`` open shards, the least recently used one
+    is passed to ``close_shard`` and dropped. Its files stay on disk, so it
+    is simply reopened the next time it is needed (``expire`` deletes ones
+    left unused for good). Shards are independent:
+    a query against one never touches the others' indexes.
+
+    A shard held by a ``lease`` is never unloaded, so whoever holds it
+    cannot end up with a second instance open on the same files; the pool
+    may exceed ``max_loaded`` until leases are released. ``get`` does not
+    lease: use it only where the shard is not kept.
+    """
+
+    def __init__(
+        self,
+        open_shard: Callable[[str], T],
+        close_shard: Callable[[T], None] = None,
+        max_loaded: int = Config.MAX_LOADED_SHARDS,
+        base_dir: Path = None,
+    ):
+        self.open_shard = open_shard
+        self.close_shard = close_shard
+        self.max_loaded = max_loaded
+        self.base_dir = base_dir
+
+        self._shards: "OrderedDict[str, T]" = OrderedDict()
+        self._leases: Dict[str, int] = {}
+        self._opening: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.unloads = 0
+        self.open_seconds = 0.0
+
+    def get(self, name: str) -> T:
+        """The shard ``name``, opening it (and unloading an idle one) if needed."""
+        return self._get(name, lease=False)
+
+    def lease(self, name: str) -> "ShardLease[T]":
+        """
+        The shard ``name``, pinned until the lease is released.
+
+        Use as a context manager, or keep the lease and call ``release``;
+        a lease that is garbage collected releases itself.
+        """
+        return ShardLease(self, name)
+
+    def _get(self, name: str, lease: bool) -> T:
+        with self._lock:
+            shard = self._shards.get(name)
+            if shard is not None:
+                return self._touch(name, lease)
+            opening = self._opening.setdefault(name, threading.Lock())
+
+        # Open outside the pool lock, so other shards stay usable meanwhile.
+        with opening:
+            with self._lock:
+                if name in self._shards:
+                    return self._touch(name, lease)
+            start = time.perf_counter()
+            shard = self.open_shard(name)
+            with self._lock:
+                self.opens += 1
+                self.open_seconds += time.perf_counter() - start
+                self._shards[name] = shard
+                self._opening.pop(name, None)
+                self._touch(name, lease)
+                evicted = self._evict_idle()
+        self._close(evicted)
+        return shard
+
+    def _touch(self, name: str, lease: bool) -> T:
+        """Mark ``name`` most recently used (and leased); pool lock held."""
+        self._shards.move_to_end(name)
+        if lease:
+            self._leases[name] = self._leases.get(name, 0) + 1
+        return self._shards[name]
+
+    def _release(self, name: str):
+        with self._lock:
+            count = self._leases.pop(name, 0) - 1
+            if count > 0:
+                self._leases[name] = count
+            evicted = self._evict_idle()
+        self._close(evicted)
+
+    def _evict_idle(self) -> List[T]:
+        """Drop least recently used unleased shards past ``max_loaded``; pool lock held."""
+        excess = len(self._shards) - self.max_loaded
+        idle = [name for name in self._shards if name not in self._leases][:max(0, excess)]
+        self.unloads += len(idle)
+        return [self._shards.pop(name) for name in idle]
+
+    def _close(self, shards: List[T]):
+        if self.close_shard is not None:
+            for shard in shards:
+                self.close_shard(shard)
+
+    def loaded(self) -> List[str]:
+        """Names of the open shards, least recently used first."""
+        with self._lock:
+            return list(self._shards)
+
+    def items(self) -> List[Tuple[str, T]]:
+        """The open shards as (name, shard), without touching their recency."""
+        with self._lock:
+            return list(self._shards.items())
+
+    def names(self) -> List[str]:
+        """Every shard on disk under ``base_dir`` plus any open ones."""
+        names = set(self.loaded())
+        if self.base_dir is not None and self.base_dir.exists():
+            names.update(p.name for p in self.base_dir.iterdir() if p.is_dir())
+        return sorted(names)
+
+    def expire(self, max_idle: float) -> List[str]:
+        """
+        Delete shards on disk that are not open and whose files were last
+        written over ``max_idle`` seconds ago; returns their names.
+        """
+        if self.base_dir is None or not self.base_dir.exists():
+            return []
+        cutoff = time.time() - max_idle
+        expired = []
+        for directory in self.base_dir.iterdir():
+            if not directory.is_dir() or directory.name in self.loaded():
+                continue
+            mtimes = [path.stat().st_mtime for path in directory.rglob("*")]
+            if max(mtimes, default=directory.stat().st_mtime) >= cutoff:
+                continue
+            with self._lock:
+                # Not opened meanwhile; opening waits for the pool lock.
+                if directory.name in self._shards or directory.name in self._opening:
+                    continue
+                shutil.rmtree(directory, ignore_errors=True)
+            expired.append(directory.name)
+        return expired
+
+    def unload(self, name: str) -> bool:
+        """Close and drop shard ``name``, unless it is leased."""
+        with self._lock:
+            if name in self._leases:
+                return False
+            shard = self._shards.pop(name, None)
+            if shard is None:
+                return False
+            self.unloads += 1
+        self._close([shard])
+        return True
+
+    def close(self):
+        for name in self.loaded():
+            self.unload(name)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": len(self._shards),
+                "leased": len(self._leases),
+                "opens": self.opens,
+                "unloads": self.unloads,
+                "avg_open_ms": self.open_seconds / self.opens * 1000 if self.opens else 0.0,
+            }
+
+
+class ShardLease(Generic[T]):
+    """A shard pinned in its ``ShardPool`` until ``release``."""
+
+    def __init__(self, pool: ShardPool[T], name: str):
+        self.name = name
+        self.shard = pool._get(name, lease=True)
+        self._release = weakref.finalize(self, pool._release, name)
+
+    def release(self):
+        self._release()  # runs at most once
+
+    def __enter__(self) -> T:
+        return self.shard
+
+    def __exit__(self, *exc):
+        self.release()
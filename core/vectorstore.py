@@ -1,94 +1,1118 @@
 """
 FAISS vector store for persistent document embeddings.
 """
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import pickle
+import shutil
+import struct
+import threading
 import faiss
 import numpy as np
 from pathlib import Path
 from config import Config
-from core.utils import save_pickle, load_pickle, ensure_dir
+from core.metadata_store import ColumnarMetadataStore
+from core.utils import load_pickle, ensure_dir
+
+
+# WAL record header: id of the first vector, vector count, metadata bytes.
+# Ids within a record are ascending (consecutive unless given to ``add``).
+_WAL_HEADER = struct.Struct("<QII")
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "auto")
+ENCODINGS = ("float32", "fp16", "int8", "pq")
+
+_SQ_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
 
 
 class FAISSVectorStore:
-    """Persistent FAISS vector store for document embeddings."""
+    """
+    Persistent FAISS vector store for document embeddings.
+
+    Persistence is a full snapshot (index + columnar metadata) plus an
+    append-only write-ahead log holding the vectors and metadata added since.
+    ``add`` only appends to the log; the log is replayed on load and folded
+    into a new snapshot in the background once it grows past
+    ``Config.WAL_MAX_RECORDS`` / ``Config.WAL_MAX_BYTES``.
+
+    ``index_type`` selects the FAISS structure (see ``INDEX_TYPES``). IVF
+    types need training data, so the store stays flat until enough vectors
+    exist and then migrates in place; ``auto`` also picks the type from the
+    corpus size as it crosses ``Config.ANN_AUTO_*_THRESHOLD``.
+
+    Snapshots are opened memory-mapped and metadata is read per hit from
+    ``ColumnarMetadataStore``, so startup does not scale with corpus size.
+
+    Vectors are L2-normalized and indexed by inner product, so scores are
+    cosine similarities in [-1, 1] whatever the embedding scale; indexes
+    written by older releases (L2 over raw vectors) are converted on load.
+    ``range_search_many`` returns every hit above a similarity threshold.
+
+    ``encoding`` picks how flat, HNSW and IVF indexes store vectors:
+    float32, fp16 / int8 scalar quantization (2x / 4x smaller) or product
+    quantization (``Config.PQ_M`` bytes each; HNSW uses int8 instead).
+    int8 and PQ train on the corpus, so they start out as float32 like IVF
+    does. With ``rerank``,
+    exact unit vectors are also kept on disk (``.vectors``, memory-mapped,
+    row-aligned with the index) and used to re-score the compressed
+    index's top candidates; ``get_stats`` reports the resulting footprint.
+
+    Every vector gets a stable 64-bit id that never changes or gets reused.
+    FAISS positions stay internal: metadata rows are kept aligned with index
+    positions and the ascending ``vector_id`` column maps ids to rows.
+    ``delete`` only tombstones ids (search skips them); once
+    ``Config.TOMBSTONE_COMPACT_RATIO`` of the index is dead, compaction
+    rebuilds index and metadata without them.
+    """
 
     def __init__(
         self,
         index_path: Path = None,
         metadata_path: Path = None,
         dimension: int = Config.EMBEDDING_DIMENSION,
+        index_type: str = None,
+        nprobe: int = None,
+        ef_search: int = None,
+        encoding: str = None,
+        rerank: bool = None,
     ):
         self.index_path = index_path or Config.FAISS_INDEX_PATH
         self.metadata_path = metadata_path or Config.FAISS_METADATA_PATH
+        if self.metadata_path.suffix == ".pkl":
+            self.metadata_path = self.metadata_path.with_suffix("")
+        self.wal_path = self.index_path.with_suffix(".wal")
+        self.deleted_path = self.index_path.with_suffix(".deleted")
+        self.purge_path = self.index_path.with_suffix(".purge")
+        self.staging_path = self.metadata_path.with_name(
+            self.metadata_path.name + ".compact"
+        )
+        self.vectors_path = self.index_path.with_suffix(".vectors")
+        self.vectors_staging_path = self.index_path.with_suffix(".vectors.compact")
         self.dimension = dimension
 
+        self.index_type = index_type or Config.INDEX_TYPE
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {self.index_type}")
+        self.nprobe = nprobe or Config.IVF_NPROBE
+        self.ef_search = ef_search or Config.HNSW_EF_SEARCH
+        self.encoding = encoding or Config.VECTOR_ENCODING
+        if self.encoding not in ENCODINGS:
+            raise ValueError(f"Unknown vector encoding: {self.encoding}")
+        self.rerank = Config.RERANK_EXACT if rerank is None else rerank
+
         self.index = None
-        self.metadata: List[dict] = []
+        self.metadata = None
+        self._mmapped = False
+        self._deleted = set()
+        self._search_params = None
+        self._raw = None  # memory map of the exact vectors (rerank)
 
-        self._load_index()
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._wal_records = 0
+        self._compactor = None
+        self._compaction_requested = False
+        self._signature = None
+
+        with self._lock:
+            self._load_index()
 
     # ------------------------------------------------------------------
 
     def _load_index(self):
+        """Open snapshot and WAL; callers hold ``self._lock``."""
         ensure_dir(self.index_path.parent)
+        self._recover_purge()
+        self.metadata = ColumnarMetadataStore(self.metadata_path)
+        self._migrate_legacy_metadata()
 
-        if self.index_path.exists() and self.metadata_path.exists():
+        loaded = False
+        if self.index_path.exists() and ColumnarMetadataStore.exists(self.metadata_path):
             try:
-                self.index = faiss.read_index(str(self.index_path))
-                self.metadata = load_pickle(self.metadata_path) or []
-                print(f"✅ Loaded FAISS index with {len(self.metadata)} vectors")
-                return
+                self.index = self._read_index()
             except Exception as e:
-                print(f"⚠️ Failed loading index: {e}")
+                # Starting empty instead would drop every record's metadata
+                # with the index; leave the files for a retry or a repair.
+                raise RuntimeError(f"Failed loading index {self.index_path}: {e}") from e
+            # Metadata is written before the index, so after a crash
+            # mid-snapshot it may run ahead; the WAL still has the rest.
+            self.metadata.truncate(self.index.ntotal)
+            loaded = True
+
+        if not loaded:
+            self._create_index()
+            # With no snapshot, metadata on disk is left by a first snapshot
+            # cut short: the WAL replays those records.
+            self.metadata.clear()
+
+        self._configure_index()
+        self._replay_wal()
+        if loaded:
+            # Only once the WAL is replayed: the compaction it schedules
+            # snapshots the index and trims the WAL.
+            self._migrate_metric()
+        self._sync_raw_vectors()
+        self._load_tombstones()
+        self._signature = self._disk_signature()
+        if loaded or self.index.ntotal:
+            print(f"✅ Loaded FAISS index with {len(self.metadata)} vectors")
+
+    def _disk_signature(self) -> tuple:
+        paths = (
+            self.index_path, self.metadata.header_path, self.wal_path, self.deleted_path
+        )
+        signature = []
+        for path in paths:
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
 
-        self._create_index()
+    def refresh_if_changed(self) -> bool:
+        """
+        Reload from disk if another process changed the snapshot or WAL.
+
+        Cheap enough (a few ``stat`` calls) to run on every request.
+        """
+        if self._snapshot_lock.locked():
+            return False  # our own compaction is rewriting the files
+        with self._lock:
+            if self._disk_signature() == self._signature:
+                return False
+            self._load_index()
+            return True
+
+    def _read_index(self):
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if Config.MMAP_INDEX and mmap_flag is not None:
+            index = faiss.read_index(str(self.index_path), mmap_flag)
+            self._mmapped = True
+            return index
+        index = faiss.read_index(str(self.index_path))
+        self._mmapped = False
+        return index
+
+    def _ensure_writable(self):
+        """Copy a memory-mapped index into RAM; FAISS cannot grow mapped storage."""
+        if self._mmapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self._mmapped = False
+            self._configure_index()
+
+    def _migrate_legacy_metadata(self):
+        """Convert a pickled metadata list from older releases, once."""
+        legacy_path = self.metadata_path.with_suffix(".pkl")
+        if not legacy_path.exists() or ColumnarMetadataStore.exists(self.metadata_path):
+            return
+        records = load_pickle(legacy_path) or []
+        self.metadata.extend(
+            [dict(record, vector_id=i) for i, record in enumerate(records)]
+        )
+        self.metadata.flush()
+        legacy_path.rename(legacy_path.with_suffix(".pkl.bak"))
+        print(f"🔁 Converted {legacy_path.name} to columnar metadata ({len(records)} records)")
+
+    def _migrate_metric(self):
+        """Convert an L2 index over raw vectors to inner product over unit vectors."""
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return
+        self._ensure_writable()
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.make_direct_map()
+        vectors = _normalized(self.index.reconstruct_n(0, self.index.ntotal))
+        index = self._build_index(self.index_kind, vectors, self.index_encoding)
+        index.add(vectors)
+        self.index = index
+        self._configure_index()
+        print(f"🔁 Converted {self.index_path.name} to cosine similarity ({index.ntotal} vectors)")
+
+        # The snapshot still holds the L2 index.
+        self._schedule_compaction()
 
     def _create_index(self):
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.metadata = []
+        kind = "hnsw" if self.index_type == "hnsw" else "flat"
+        self.index = self._build_index(
+            kind, np.empty((0, self.dimension), np.float32), self._target(0)[1]
+        )
+        self._mmapped = False
+
+    # ------------------------------------------------------------------
+    # INDEX TYPES
+    # ------------------------------------------------------------------
+
+    @property
+    def index_kind(self) -> str:
+        """Type of the live FAISS index (one of ``INDEX_TYPES`` minus auto)."""
+        if isinstance(self.index, faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(self.index, faiss.IndexIVFPQ):
+            return "ivf_pq"
+        if isinstance(self.index, faiss.IndexIVF):
+            return "ivf_flat"
+        return "flat"
+
+    @property
+    def index_encoding(self) -> str:
+        """How the live index stores vectors (one of ``ENCODINGS``)."""
+        return _encoding_of(self.index)
+
+    def _target_kind(self, ntotal: int) -> str:
+        if self.index_type == "auto":
+            if ntotal >= Config.ANN_AUTO_PQ_THRESHOLD:
+                return "ivf_pq"
+            if ntotal >= Config.ANN_AUTO_IVF_THRESHOLD:
+                return "ivf_flat"
+            return "flat"
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            return self.index_type if ntotal >= Config.ANN_MIN_TRAIN_SIZE else "flat"
+        return self.index_type
+
+    def _target(self, ntotal: int) -> Tuple[str, str]:
+        """(kind, encoding) the index should have at ``ntotal`` vectors."""
+        kind = self._target_kind(ntotal)
+        encoding = self.encoding
+        if kind == "hnsw" and encoding == "pq":
+            encoding = "int8"  # a graph built on PQ distances loses most of its recall
+        if encoding == "pq" and ntotal < max(Config.ANN_MIN_TRAIN_SIZE, 39 << Config.PQ_NBITS):
+            encoding = "float32"  # too few vectors to train full codebooks
+        if encoding == "int8" and ntotal < Config.ANN_MIN_TRAIN_SIZE:
+            encoding = "float32"
+        if kind == "ivf_flat" and encoding == "pq":
+            kind = "ivf_pq"
+        if kind == "ivf_pq":
+            encoding = "pq"
+        return kind, encoding
+
+    @staticmethod
+    def _nlist(n: int) -> int:
+        """IVF lists for ``n`` training vectors: ~4*sqrt(n), >= 39 points each."""
+        return max(1, min(int(4 * np.sqrt(n)), n // 39, 65536))
+
+    def _needs_retrain(self) -> bool:
+        """True once the corpus has outgrown what the index was trained on."""
+        n = self.index.ntotal
+        if isinstance(self.index, faiss.IndexIVF):
+            if self._nlist(n) >= Config.ANN_RETRAIN_GROWTH * self.index.nlist:
+                return True
+        if isinstance(self.index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+            return self._pq_shape(n)[1] > self.index.pq.nbits
+        return False
+
+    def _pq_shape(self, n: int) -> Tuple[int, int]:
+        """Sub-quantizers and bits per code for PQ trained on ``n`` vectors."""
+        m = max(d for d in range(1, Config.PQ_M + 1) if self.dimension % d == 0)
+        nbits = min(Config.PQ_NBITS, max(1, int(np.log2(max(n // 39, 2)))))
+        return m, nbits
+
+    def _build_index(self, kind: str, vectors: np.ndarray, encoding: str = "float32"):
+        """Create (and train, if the type needs it) an empty index of ``kind``."""
+        n = len(vectors)
+        metric = faiss.METRIC_INNER_PRODUCT
+        max_train = 65536
+        if kind == "flat":
+            if encoding in _SQ_TYPES:
+                index = faiss.IndexScalarQuantizer(self.dimension, _SQ_TYPES[encoding], metric)
+            elif encoding == "pq":
+                index = faiss.IndexPQ(self.dimension, *self._pq_shape(n), metric)
+            else:
+                index = faiss.IndexFlatIP(self.dimension)
+
+        elif kind == "hnsw":
+            if encoding in _SQ_TYPES:
+                index = faiss.IndexHNSWSQ(
+                    self.dimension, _SQ_TYPES[encoding], Config.HNSW_M, metric
+                )
+            elif encoding == "pq":
+                m, nbits = self._pq_shape(n)
+                index = faiss.IndexHNSWPQ(self.dimension, m, Config.HNSW_M, nbits, metric)
+            else:
+                index = faiss.IndexHNSWFlat(self.dimension, Config.HNSW_M, metric)
+            index.hnsw.efConstruction = Config.HNSW_EF_CONSTRUCTION
+
+        else:
+            nlist = self._nlist(n)
+            max_train = nlist * 256
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            if kind == "ivf_pq":
+                index = faiss.IndexIVFPQ(
+                    quantizer, self.dimension, nlist, *self._pq_shape(n), metric
+                )
+            elif encoding in _SQ_TYPES:
+                index = faiss.IndexIVFScalarQuantizer(
+                    quantizer, self.dimension, nlist, _SQ_TYPES[encoding], metric
+                )
+            else:
+                index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, metric)
+
+        if not index.is_trained:
+            sample = vectors
+            if n > max_train:
+                rng = np.random.default_rng(0)
+                sample = vectors[np.sort(rng.choice(n, max_train, replace=False))]
+            index.train(np.ascontiguousarray(sample, dtype=np.float32))
+        return index
+
+    def _configure_index(self):
+        """Apply query-time parameters to the live index."""
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.nprobe = self.nprobe
+        elif isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = self.ef_search
+        self._search_params = None
+
+    # ------------------------------------------------------------------
+    # TOMBSTONES
+    # ------------------------------------------------------------------
+
+    def _load_tombstones(self):
+        self._deleted = set()
+        self._search_params = None
+        if self.deleted_path.exists():
+            ids = np.unique(np.fromfile(self.deleted_path, dtype=np.int64))
+            self._deleted = {int(i) for i in ids[self.metadata.find_rows(ids) >= 0]}
+
+    def _get_search_params(self):
+        """FAISS search parameters that exclude deleted ids (None if none)."""
+        if not self._deleted:
+            return None
+        if self._search_params is None:
+            rows = self.metadata.find_rows(sorted(self._deleted))
+            batch = faiss.IDSelectorBatch(rows[rows >= 0])
+            selector = faiss.IDSelectorNot(batch)
+            if isinstance(self.index, faiss.IndexIVF):
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+            elif isinstance(self.index, faiss.IndexHNSW):
+                params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+            else:
+                params = faiss.SearchParameters(sel=selector)
+            # The parameter objects hold raw pointers; keep the owners alive.
+            self._search_params = (params, selector, batch)
+        return self._search_params[0]
+
+    def delete(self, ids: List[int]) -> int:
+        """
+        Tombstone vectors so search never returns them.
+
+        Costs O(len(ids)); the vectors are dropped for good by the next
+        compaction past ``Config.TOMBSTONE_COMPACT_RATIO``. Returns the
+        number of newly deleted ids.
+        """
+        with self._lock:
+            ids = np.unique(np.asarray(list(ids), dtype=np.int64))
+            ids = ids[self.metadata.find_rows(ids) >= 0]
+            new_ids = [int(i) for i in ids if int(i) not in self._deleted]
+            if not new_ids:
+                return 0
+            with open(self.deleted_path, "ab") as f:
+                f.write(np.asarray(new_ids, dtype=np.int64).tobytes())
+            self._deleted.update(new_ids)
+            self._search_params = None
+            self._signature = self._disk_signature()
+
+            if self._needs_purge():
+                self._schedule_compaction()
+            return len(new_ids)
+
+    def is_deleted(self, vector_id: int) -> bool:
+        return vector_id in self._deleted
+
+    def contains(self, vector_id: int) -> bool:
+        """True if ``vector_id`` is stored and not deleted."""
+        with self._lock:
+            if vector_id in self._deleted:
+                return False
+            return bool(self.metadata.find_rows([vector_id])[0] >= 0)
+
+    def _needs_purge(self) -> bool:
+        if not self._deleted:
+            return False
+        return len(self._deleted) >= Config.TOMBSTONE_COMPACT_RATIO * self.index.ntotal
+
+    def _purge_tombstones(self, index_bytes: np.ndarray, count: int, deleted: List[int]):
+        """
+        Rebuild index and metadata without the ``deleted`` vectors.
+
+        Works on the snapshot ``_compact`` just wrote (index bytes, first
+        ``count`` rows), so searches and adds go on while it rebuilds; the
+        store is locked only to swap the result in. Rows added since are
+        carried over and tombstones set since are kept. The new index is
+        committed before the metadata, with ``.purge`` recording its size,
+        so ``_recover_purge`` can finish or roll back after a crash.
+        """
+        index = faiss.deserialize_index(index_bytes)
+        rows = self.metadata.find_rows(deleted)
+        rows = rows[(rows >= 0) & (rows < count)]
+        keep = np.ones(count, dtype=bool)
+        keep[rows] = False
+
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+        self.metadata.write_compacted(keep, self.staging_path)
+        vectors = None
+        if self.rerank or isinstance(index, (faiss.IndexIVF, faiss.IndexHNSW)):
+            vectors = self._stored_vectors(index)[keep]
+        if self.rerank:
+            self._write_raw_compacted(vectors)
+
+        if isinstance(index, faiss.IndexIVF):
+            index.reset()  # keeps the trained quantizer
+            index.add(vectors)
+        elif isinstance(index, faiss.IndexHNSW):
+            index = self._build_index("hnsw", vectors, _encoding_of(index))
+            index.add(vectors)
+        else:
+            index.remove_ids(faiss.IDSelectorBatch(rows))
+
+        index_tmp = self.index_path.with_suffix(".tmp")
+        faiss.write_index(index, str(index_tmp))
+
+        with self._lock:
+            ntotal, added = self.index.ntotal, None
+            if ntotal > count:
+                raw = self._raw_vectors()
+                added = (
+                    np.array(raw[count:ntotal]) if raw is not None
+                    else self._reconstruct(np.arange(count, ntotal))
+                )
+            pending = self.metadata.get_many(range(count, len(self.metadata)))
+
+            with open(self.purge_path, "w", encoding="utf-8") as f:
+                json.dump({"count": int(index.ntotal)}, f)
+            os.replace(index_tmp, self.index_path)
+            self._finish_purge()
+
+            if added is not None:
+                if self.rerank:
+                    self._write_raw(index.ntotal, added)
+                index.add(added)
+            self.index = index
+            self._mmapped = False
+            self._raw = None
+            self.metadata = ColumnarMetadataStore(self.metadata_path)
+            self.metadata.extend(pending)
+            self._deleted.difference_update(deleted)
+            self._write_tombstones()
+            self._configure_index()
+            print(f"🧹 Compacted {self.index_path.name}: removed {len(rows)} deleted vectors")
+            self._signature = self._disk_signature()
+
+    def _write_tombstones(self):
+        """Rewrite ``.deleted`` with just the current tombstones."""
+        if not self._deleted:
+            self.deleted_path.unlink(missing_ok=True)
+            return
+        tmp_path = self.deleted_path.with_suffix(".deleted.tmp")
+        np.asarray(sorted(self._deleted), dtype=np.int64).tofile(tmp_path)
+        os.replace(tmp_path, self.deleted_path)
+
+    def _finish_purge(self):
+        """Swap in the compacted metadata and drop the tombstones it removed."""
+        old_path = self.metadata_path.with_name(self.metadata_path.name + ".old")
+        if self.staging_path.exists():
+            shutil.rmtree(old_path, ignore_errors=True)
+            if self.metadata_path.exists():
+                os.rename(self.metadata_path, old_path)
+            os.rename(self.staging_path, self.metadata_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        if self.vectors_staging_path.exists():
+            os.replace(self.vectors_staging_path, self.vectors_path)
+        # Tombstones of purged ids stay in ``.deleted`` until the next
+        # rewrite; ``_load_tombstones`` skips ids no longer stored.
+        self.purge_path.unlink(missing_ok=True)
+
+    def _recover_purge(self):
+        """Complete or roll back a compaction interrupted by a crash."""
+        if not self.purge_path.exists():
+            shutil.rmtree(self.staging_path, ignore_errors=True)
+            self.vectors_staging_path.unlink(missing_ok=True)
+            return
+        with open(self.purge_path, "r", encoding="utf-8") as f:
+            expected = json.load(f)["count"]
+        committed = False
+        if self.index_path.exists():
+            try:
+                committed = self._read_index().ntotal == expected
+            except Exception:
+                committed = False
+        if committed:
+            self._finish_purge()
+        else:
+            shutil.rmtree(self.staging_path, ignore_errors=True)
+            self.vectors_staging_path.unlink(missing_ok=True)
+            self.purge_path.unlink()
+
+    def _needs_migration(self) -> bool:
+        """
+        True once the corpus crossed a threshold to another index type, or
+        IVF lists / PQ codebooks are sized for a much smaller corpus
+        (``Config.ANN_RETRAIN_GROWTH``).
+        """
+        if self._target(self.index.ntotal) != (self.index_kind, self.index_encoding):
+            return True
+        return self._needs_retrain()
+
+    def _migrate(self):
+        """
+        Rebuild into the target index type (or retrain it) on the compactor.
+
+        Like a purge, the index is trained and filled from a copy, so
+        searches and adds go on; the store is locked to copy it and to swap
+        the result in, carrying over rows added meanwhile (rows keep their
+        order, so metadata and tombstones stay valid).
+        """
+        with self._lock:
+            if not self._needs_migration():
+                return
+            kind, encoding = self._target(self.index.ntotal)
+            retrain = (kind, encoding) == (self.index_kind, self.index_encoding)
+            source = faiss.clone_index(self.index)
+            count = source.ntotal
+
+        vectors = self._stored_vectors(source)
+        index = self._build_index(kind, vectors, encoding)
+        index.add(vectors)
+        del source, vectors
+
+        with self._lock:
+            if self.index.ntotal > count:
+                raw = self._raw_vectors()
+                index.add(
+                    np.array(raw[count:self.index.ntotal]) if raw is not None
+                    else self._reconstruct(np.arange(count, self.index.ntotal))
+                )
+            self.index = index
+            self._mmapped = False
+            self._configure_index()
+        print(
+            f"🔁 {'Retrained' if retrain else 'Migrated'} {self.index_path.name} "
+            f"to {kind}/{encoding} ({index.ntotal} vectors)"
+        )
+
+    # ------------------------------------------------------------------
+    # EXACT VECTORS (RERANK)
+    # ------------------------------------------------------------------
+
+    def _reconstruct(self, rows) -> np.ndarray:
+        """Vectors at index ``rows`` as the index stores them (lossy if compressed)."""
+        if isinstance(self.index, faiss.IndexIVF):
+            self._ensure_writable()
+            self.index.make_direct_map()
+        return self.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+    def _stored_vectors(self, index=None) -> np.ndarray:
+        """
+        Every vector of ``index`` (default: the live one), exact if kept on
+        disk; used to rebuild the index.
+        """
+        n = (self.index if index is None else index).ntotal
+        if self.rerank and n and self._raw_rows(self.vectors_path) >= n:
+            return np.fromfile(
+                self.vectors_path, dtype=np.float32, count=n * self.dimension
+            ).reshape(n, self.dimension)
+        if index is None:
+            return self._reconstruct(np.arange(n))
+        if isinstance(index, faiss.IndexIVF):
+            index.make_direct_map()
+        return index.reconstruct_n(0, n)
+
+    def _raw_rows(self, path: Path) -> int:
+        try:
+            return path.stat().st_size // (4 * self.dimension)
+        except FileNotFoundError:
+            return 0
+
+    def _raw_vectors(self) -> Optional[np.ndarray]:
+        """Memory map of the exact vectors, row-aligned with the index, or None."""
+        if not self.rerank:
+            return None
+        ntotal = self.index.ntotal
+        if self._raw is None or len(self._raw) < ntotal:
+            rows = self._raw_rows(self.vectors_path)
+            if rows == 0 or rows < ntotal:
+                return None
+            self._raw = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension)
+            )
+        return self._raw
+
+    def _write_raw(self, row: int, vectors: np.ndarray):
+        """
+        Store exact vectors from index position ``row`` on.
+
+        Called before the vectors reach the index and WAL, so the file never
+        lags behind them; rows past ``ntotal`` left by a crash are overwritten.
+        """
+        mode = "r+b" if self.vectors_path.exists() else "wb"
+        with open(self.vectors_path, mode) as f:
+            f.seek(row * 4 * self.dimension)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+    def _write_raw_compacted(self, vectors: np.ndarray):
+        """Stage the exact vectors of the rows a purge keeps (see ``_finish_purge``)."""
+        np.ascontiguousarray(vectors, dtype=np.float32).tofile(str(self.vectors_staging_path))
+
+    def _sync_raw_vectors(self):
+        """Drop the exact vectors when rerank is off, or fill in rows they miss."""
+        self._raw = None
+        if not self.rerank:
+            self.vectors_path.unlink(missing_ok=True)
+            return
+        start = self._raw_rows(self.vectors_path)
+        if start >= self.index.ntotal:
+            return
+        if self.index_encoding != "float32":
+            print(
+                f"⚠️ {self.index_path.name}: {self.index.ntotal - start} vectors "
+                f"for re-ranking rebuilt from {self.index_encoding} codes"
+            )
+        self._write_raw(start, self._reconstruct(np.arange(start, self.index.ntotal)))
+
+    def _reranks(self) -> bool:
+        """True if searches should re-score a compressed index's candidates."""
+        return self.index_encoding != "float32" and self._raw_vectors() is not None
+
+    def _rescore(self, query_vectors: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Exact similarities of each query to its candidate ``rows`` (-1 = none)."""
+        raw = self._raw_vectors()
+        valid = rows >= 0
+        vectors = np.zeros(rows.shape + (self.dimension,), dtype=np.float32)
+        vectors[valid] = raw[rows[valid]]
+        scores = np.einsum("qkd,qd->qk", vectors, query_vectors)
+        scores[~valid] = -np.inf
+        return scores
+
+    # ------------------------------------------------------------------
+    # WRITE-AHEAD LOG
+    # ------------------------------------------------------------------
+
+    def _replay_wal(self):
+        self._wal_records = 0
+        if not self.wal_path.exists():
+            return
+
+        row_bytes = self.dimension * 4
+        valid_end = 0
+        with open(self.wal_path, "rb") as f:
+            while True:
+                header = f.read(_WAL_HEADER.size)
+                if len(header) < _WAL_HEADER.size:
+                    break
+                start_id, count, meta_len = _WAL_HEADER.unpack(header)
+                payload = f.read(count * row_bytes + meta_len)
+                if len(payload) < count * row_bytes + meta_len:
+                    break  # torn tail from an interrupted append
+                valid_end = f.tell()
+                self._wal_records += 1
+
+                if start_id <= self.metadata.last_id:
+                    continue  # already folded into the snapshot
+
+                # Records from older releases hold raw vectors.
+                vectors = _normalized(np.frombuffer(
+                    payload, dtype=np.float32, count=count * self.dimension
+                ).reshape(count, self.dimension))
+                self._ensure_writable()
+                if self.rerank:
+                    self._write_raw(self.index.ntotal, vectors)
+                self.index.add(vectors)
+                self.metadata.extend(pickle.loads(payload[count * row_bytes:]))
+
+        if valid_end < self.wal_path.stat().st_size:
+            with open(self.wal_path, "r+b") as f:
+                f.truncate(valid_end)
+
+    def _append_wal(self, start_id: int, vectors: np.ndarray, metadata_list: List[dict]):
+        meta_bytes = pickle.dumps(metadata_list, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self.wal_path, "ab") as f:
+            f.write(_WAL_HEADER.pack(start_id, len(vectors), len(meta_bytes)))
+            f.write(vectors.tobytes())
+            f.write(meta_bytes)
+        self._wal_records += 1
+        self._signature = self._disk_signature()
+
+    def _needs_compaction(self) -> bool:
+        if self._wal_records >= Config.WAL_MAX_RECORDS:
+            return True
+        return (
+            self.wal_path.exists()
+            and self.wal_path.stat().st_size >= Config.WAL_MAX_BYTES
+        )
+
+    def _schedule_compaction(self):
+        with self._lock:
+            self._compaction_requested = True
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(
+                target=self._compaction_worker,
+                name=f"wal-compact-{self.index_path.stem}",
+                daemon=True,
+            )
+            self._compactor.start()
+
+    def _compaction_worker(self):
+        while True:
+            with self._lock:
+                if not self._compaction_requested:
+                    return
+                self._compaction_requested = False
+            self._compact()
+
+    def _compact(self):
+        """
+        Write a snapshot, then drop the WAL prefix it covers; purge and
+        migrate the index first if they are due.
+        """
+        with self._snapshot_lock:
+            self._migrate()  # the snapshot below then holds the new index
+            with self._lock:
+                deleted = sorted(self._deleted) if self._needs_purge() else None
+                index_bytes = faiss.serialize_index(self.index)
+                count = len(self.metadata)
+                wal_offset = self.wal_path.stat().st_size if self.wal_path.exists() else 0
+                records = self._wal_records
+
+            self._write_snapshot(index_bytes, count)
+
+            with self._lock:
+                if self.wal_path.exists():
+                    self._trim_wal(wal_offset)
+                    self._wal_records -= records
+                self._signature = self._disk_signature()
+
+            if deleted:
+                self._purge_tombstones(index_bytes, count, deleted)
+
+    def _trim_wal(self, offset: int):
+        with open(self.wal_path, "rb") as f:
+            f.seek(offset)
+            tail = f.read()
+        if tail:
+            tmp_path = self.wal_path.with_suffix(".wal.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(tail)
+            os.replace(tmp_path, self.wal_path)
+        else:
+            self.wal_path.unlink()
+
+    def _write_snapshot(self, index_bytes: np.ndarray, count: int):
+        ensure_dir(self.index_path.parent)
+        self.metadata.flush(count)
+
+        # serialize_index produces the same bytes as faiss.write_index.
+        index_tmp = self.index_path.with_suffix(".tmp")
+        index_bytes.tofile(str(index_tmp))
+        os.replace(index_tmp, self.index_path)
 
     # ------------------------------------------------------------------
 
-    def add(self, embeddings: List[List[float]], metadata_list: List[dict]) -> List[int]:
-        if not embeddings or not metadata_list:
+    def add(
+        self, embeddings: np.ndarray, metadata_list: List[dict], ids: List[int] = None
+    ) -> List[int]:
+        """
+        Append vectors; returns their new ids.
+
+        ``ids`` assigns the ids instead (a sharded store allocates them
+        globally); they must ascend and start at or after ``next_id``.
+        """
+        if len(embeddings) == 0 or not metadata_list:
             return []
 
-        vectors = np.array(embeddings, dtype=np.float32)
-        self.index.add(vectors)
+        vectors = _normalized(embeddings)
+        with self._lock:
+            self._ensure_writable()
+            if ids is None:
+                ids = range(self.metadata.next_id, self.metadata.next_id + len(metadata_list))
+            ids = [int(i) for i in ids]
+            if ids[0] < self.metadata.next_id or any(a >= b for a, b in zip(ids, ids[1:])):
+                raise ValueError("Vector ids must ascend past the store's last id")
+            records = [dict(meta, vector_id=i) for i, meta in zip(ids, metadata_list)]
+            if self.rerank:
+                self._write_raw(self.index.ntotal, vectors)
+            self.index.add(vectors)
+            self.metadata.extend(records)
+            self._append_wal(ids[0], vectors, records)
 
-        start_id = len(self.metadata)
-        self.metadata.extend(metadata_list)
-        self.save()
+            # Migrating rebuilds the whole index, so the compactor does it.
+            if self._needs_compaction() or self._needs_migration():
+                self._schedule_compaction()
+
+        return ids
 
-        return list(range(start_id, start_id + len(metadata_list)))
+    def export(self, ids: List[int]) -> Tuple[np.ndarray, List[dict]]:
+        """
+        Stored (unit-length) vectors and metadata of the live ``ids``, in id
+        order, e.g. to move them to another store. Without ``rerank``, vectors
+        of compressed indexes are their quantized approximations.
+        """
+        with self._lock:
+            ids = sorted(int(i) for i in ids if int(i) not in self._deleted)
+            rows = self.metadata.find_rows(ids)
+            rows = rows[rows >= 0]
+            if not len(rows):
+                return np.empty((0, self.dimension), dtype=np.float32), []
+            raw = self._raw_vectors()
+            vectors = np.array(raw[rows]) if raw is not None else self._reconstruct(rows)
+            return vectors, self.metadata.get_many([int(r) for r in rows])
 
     # ------------------------------------------------------------------
 
-    def search(self, query_embedding: List[float], k: int = 5) -> List[Tuple[int, float, dict]]:
-        if self.index.ntotal == 0:
+    def search(self, query_embedding: np.ndarray, k: int = 5) -> List[Tuple[int, float, dict]]:
+        return self.search_many(np.asarray(query_embedding).reshape(1, -1), k)[0]
+
+    def search_many(
+        self, query_embeddings: np.ndarray, k: int = 5
+    ) -> List[List[Tuple[int, float, dict]]]:
+        """
+        ``search`` for a matrix of queries in one FAISS call.
+
+        Returns one (vector_id, cosine similarity, metadata) list per query
+        row, best first.
+        """
+        query_vectors = _normalized(query_embeddings)
+        if len(query_vectors) == 0:
             return []
 
-        query_vector = np.array([query_embedding], dtype=np.float32)
-        distances, indices = self.index.search(query_vector, min(k, self.index.ntotal))
+        # FAISS indexes are not safe to search while another thread adds.
+        with self._lock:
+            live = self.index.ntotal - len(self._deleted)
+            if live <= 0:
+                return [[] for _ in range(len(query_vectors))]
+            k = min(k, live)
+            rerank = self._reranks()
+            fetch = min(k * Config.RERANK_FACTOR, live) if rerank else k
+            scores, indices = self.index.search(
+                query_vectors, fetch, params=self._get_search_params()
+            )
+            if rerank:  # over-fetched; the exact vectors pick the top k
+                exact = self._rescore(query_vectors, indices)
+                order = np.argsort(-exact, axis=1, kind="stable")[:, :k]
+                indices = np.take_along_axis(indices, order, axis=1)
+                scores = np.take_along_axis(exact, order, axis=1)
+            return self._resolve_hits([
+                [(int(row), float(score)) for row, score in zip(row_indices, row_scores)]
+                for row_indices, row_scores in zip(indices, scores)
+            ])
 
-        results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx < len(self.metadata):
-                similarity = 1.0 / (1.0 + distance)
-                results.append((idx, similarity, self.metadata[idx]))
+    def range_search_many(
+        self, query_embeddings: np.ndarray, threshold: float, max_results: int = 100
+    ) -> List[List[Tuple[int, float, dict]]]:
+        """
+        Every hit with cosine similarity above ``threshold``, per query row.
+
+        At most ``max_results`` hits per query are kept, best first. The
+        threshold is applied inside FAISS, so weak matches are never
+        materialized (HNSW and IVF still only visit part of the corpus).
+        When re-ranking, FAISS uses ``threshold - Config.RERANK_MARGIN`` so
+        quantization error does not drop true hits, and the exact score decides.
+        """
+        query_vectors = _normalized(query_embeddings)
+        if len(query_vectors) == 0:
+            return []
 
-        return results
+        with self._lock:
+            if self.index.ntotal - len(self._deleted) <= 0:
+                return [[] for _ in range(len(query_vectors))]
+            rerank = self._reranks()
+            margin = Config.RERANK_MARGIN if rerank else 0.0
+            lims, scores, indices = self.index.range_search(
+                query_vectors, float(threshold) - margin, params=self._get_search_params()
+            )
+            hits = []
+            for query, start, end in zip(query_vectors, lims[:-1], lims[1:]):
+                row_scores, rows = scores[start:end], indices[start:end]
+                if rerank and len(rows):
+                    row_scores = self._rescore(query[None], rows[None])[0]
+                    passed = row_scores > threshold
+                    row_scores, rows = row_scores[passed], rows[passed]
+                if len(rows) > max_results:
+                    top = np.argpartition(-row_scores, max_results - 1)[:max_results]
+                    row_scores, rows = row_scores[top], rows[top]
+                order = np.argsort(-row_scores, kind="stable")
+                hits.append([(int(rows[i]), float(row_scores[i])) for i in order])
+            return self._resolve_hits(hits)
+
+    def _resolve_hits(
+        self, hits: List[List[Tuple[int, float]]]
+    ) -> List[List[Tuple[int, float, dict]]]:
+        """Turn per-query (row, score) lists into (vector_id, score, metadata)."""
+        hits = [
+            [(row, score) for row, score in query_hits if 0 <= row < len(self.metadata)]
+            for query_hits in hits
+        ]
+        # Each row is read once even when many queries hit it.
+        unique_rows = sorted({row for query_hits in hits for row, _ in query_hits})
+        records = dict(zip(unique_rows, self.metadata.get_many(unique_rows)))
+        return [
+            [(records[row]["vector_id"], score, records[row]) for row, score in query_hits]
+            for query_hits in hits
+        ]
+
+    def get_metadata(self, ids: List[int]) -> List[dict]:
+        """Metadata of each live vector id (missing or deleted ids are skipped)."""
+        with self._lock:
+            ids = [int(i) for i in ids if int(i) not in self._deleted]
+            rows = self.metadata.find_rows(ids)
+            return self.metadata.get_many([int(r) for r in rows if r >= 0])
+
+    def iter_records(self, after_id: int = -1, batch_size: int = 4096) -> Iterator[List[dict]]:
+        """Live records with a vector id above ``after_id``, in id order, in batches."""
+        while True:
+            # Re-seek by id each batch: compaction may move rows in between.
+            with self._lock:
+                row = self.metadata.first_row_after(after_id)
+                records = self.metadata.get_many(
+                    range(row, min(row + batch_size, len(self.metadata)))
+                )
+                if not records:
+                    return
+                after_id = records[-1]["vector_id"]
+                batch = [meta for meta in records if meta["vector_id"] not in self._deleted]
+            yield batch
+
+    # ------------------------------------------------------------------
+    # DOCUMENTS
+    # ------------------------------------------------------------------
+
+    def ids_for_source(self, source: str) -> List[int]:
+        """Live vector ids whose metadata ``source`` is ``source``."""
+        with self._lock:
+            ids = self.metadata.vector_ids(self.metadata.rows_with_source(source))
+            return [i for i in ids if i not in self._deleted]
+
+    def remove_document(self, source: str) -> int:
+        """Delete every vector of one source document; returns the count."""
+        return self.delete(self.ids_for_source(source))
+
+    def replace_document(
+        self, source: str, embeddings: np.ndarray, metadata_list: List[dict]
+    ) -> List[int]:
+        """
+        Swap a document's vectors for new ones; returns the new ids.
+
+        The new vectors are added before the old ones are deleted, so a
+        failed add leaves the old version in place.
+        """
+        with self._lock:
+            old_ids = self.ids_for_source(source)
+            ids = self.add(embeddings, metadata_list)
+            self.delete(old_ids)
+            return ids
 
     # ------------------------------------------------------------------
 
     def save(self):
-        ensure_dir(self.index_path.parent)
-        faiss.write_index(self.index, str(self.index_path))
-        save_pickle(self.metadata, self.metadata_path)
+        """Write a full snapshot synchronously and empty the WAL."""
+        self._compact()
+
+    def close(self):
+        """
+        Wait for a running background compaction before the store is dropped.
+
+        Nothing else needs flushing: every add is already in the WAL.
+        """
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
 
     def clear(self):
-        self._create_index()
+        with self._snapshot_lock:
+            with self._lock:
+                self._create_index()
+                self.metadata.clear()
+                for path in (
+                    self.index_path, self.wal_path, self.deleted_path, self.purge_path,
+                    self.vectors_path, self.vectors_staging_path,
+                ):
+                    path.unlink(missing_ok=True)
+                self._raw = None
+                shutil.rmtree(self.staging_path, ignore_errors=True)
+                self._wal_records = 0
+                self._deleted = set()
         self.save()
 
+    @property
+    def version(self) -> str:
+        """
+        Changes whenever vectors are added or deleted, in any process.
+
+        Compaction alone does not change it, since search results stay the same.
+        """
+        with self._lock:
+            removed = self.metadata.removed + len(self._deleted)
+            return f"{self.metadata.next_id}.{removed}"
+
+    @property
+    def next_id(self) -> int:
+        """Smallest vector id never handed out."""
+        with self._lock:
+            return self.metadata.next_id
+
+    @property
+    def last_id(self) -> int:
+        """Largest vector id stored (deleted or not), or -1."""
+        with self._lock:
+            return self.metadata.last_id
+
     def get_size(self) -> int:
-        return self.index.ntotal
+        """Number of live (non-deleted) vectors."""
+        with self._lock:
+            return self.index.ntotal - len(self._deleted)
+
+    def get_stats(self) -> Dict:
+        """Index type, encoding and memory footprint."""
+        with self._lock:
+            ntotal = self.index.ntotal
+            index_bytes = _index_bytes(self.index)
+            return {
+                "vectors": ntotal - len(self._deleted),
+                "indexed": ntotal,  # includes tombstoned vectors until a purge
+                "index_kind": self.index_kind,
+                "encoding": self.index_encoding,
+                "index_bytes": index_bytes,
+                "bytes_per_vector": index_bytes / ntotal if ntotal else 0.0,
+                "rerank": self.rerank,
+                "raw_vector_bytes": (
+                    min(self._raw_rows(self.vectors_path), ntotal) * 4 * self.dimension
+                    if self.rerank else 0
+                ),
+            }
+
+
+def _encoding_of(index) -> str:
+    """Vector encoding of a FAISS index (one of ``ENCODINGS``)."""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        for name, qtype in _SQ_TYPES.items():
+            if index.sq.qtype == qtype:
+                return name
+    return "float32"
+
+
+def _index_bytes(index) -> int:
+    """Approximate RAM held by a FAISS index: codes plus graph / list overhead."""
+    if isinstance(index, faiss.IndexHNSW):
+        links = index.hnsw.neighbors.size() * 4 + index.hnsw.offsets.size() * 8
+        return links + _index_bytes(faiss.downcast_index(index.storage))
+    if isinstance(index, faiss.IndexIVF):
+        # Codes plus one 64-bit id each in the inverted lists.
+        codes = index.ntotal * (index.code_size + 8)
+        return codes + _index_bytes(faiss.downcast_index(index.quantizer))
+    return index.ntotal * index.code_size
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    """Float32 copy of ``vectors`` scaled to unit length (zero rows stay zero)."""
+    out = np.array(vectors, dtype=np.float32, copy=True, order="C").reshape(
+        -1, np.shape(vectors)[-1]
+    )
+    faiss.normalize_L2(out)
+    return out